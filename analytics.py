@@ -0,0 +1,214 @@
+import time
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from visitors import STATUS_FILTERS
+
+
+# --- Settings ---
+ROLLUP_COLLECTION = "visitor_daily"
+# One document per (day, location, contact_person), missing values as ""; counters are
+# $inc'ed as visitors move along
+ROLLUP_COUNTERS = ("registered", "approved", "declined", "checked_in", "checked_out", "dwell_seconds")
+ROLLUP_GROUPS = ("location", "contact_person")
+DEFAULT_ANALYTICS_DAYS = 30
+MAX_ANALYTICS_DAYS = 366
+DEFAULT_ON_SITE_LIMIT = 200
+
+# Served by the (check_out, check_in, _id) visitor index: open check-ins only
+ON_SITE_QUERY = STATUS_FILTERS["checked-in"]
+ON_SITE_PROJECTION = {"name": 1, "company": 1, "location": 1, "contact_person": 1,
+                      "badge_number": 1, "check_in": 1}
+# What the rollup needs from a visitor's pre-update document
+ROLLUP_PROJECTION = {"location": 1, "contact_person": 1, "approved": 1, "approved_at": 1,
+                     "check_in": 1, "check_out": 1}
+
+
+def ensure_rollup_indexes(rollup):
+    rollup.create_index([("day", ASCENDING), ("location", ASCENDING), ("contact_person", ASCENDING)],
+                        unique=True)
+
+
+def day_key(when) -> str:
+    return when.strftime("%Y-%m-%d")
+
+
+def _registered_at(visitor):
+    """Registration time from the ObjectId, in local time like check_in/check_out."""
+    return visitor["_id"].generation_time.astimezone().replace(tzinfo=None)
+
+
+# --- Incremental maintenance ---
+def rollup_deltas(before, fields, now=None):
+    """
+    Counter changes for one visitor update, as {day: {counter: delta}}.
+    `before` is the document as it was (None for a new registration), `fields` what was $set.
+    Repeated approvals/check-ins change nothing; a reversed decision moves its count.
+    """
+    now = now or datetime.now()
+    deltas = {}
+
+    def add(when, counter, value=1):
+        day = deltas.setdefault(day_key(when), {})
+        day[counter] = day.get(counter, 0) + value
+
+    if before is None:
+        add(now, "registered")
+        return deltas
+
+    if "approved" in fields and fields["approved"] != before.get("approved"):
+        decided_at = before.get("approved_at") or _registered_at(before)
+        if before.get("approved") is True:
+            add(decided_at, "approved", -1)
+        elif before.get("approved") is False:
+            add(decided_at, "declined", -1)
+        if fields["approved"] is True:
+            add(now, "approved")
+        elif fields["approved"] is False:
+            add(now, "declined")
+
+    if fields.get("check_in") and not before.get("check_in"):
+        add(fields["check_in"], "checked_in")
+
+    # Visits and dwell time both count on the check-in day, so averages stay per visit
+    if fields.get("check_out") and not before.get("check_out") and before.get("check_in"):
+        add(before["check_in"], "checked_out")
+        add(before["check_in"], "dwell_seconds", (fields["check_out"] - before["check_in"]).total_seconds())
+    return {day: counters for day, counters in deltas.items() if any(counters.values())}
+
+
+def apply_rollup(rollup, visitor, deltas):
+    """Upsert the counter changes into the rollup documents of the visitor's location/contact."""
+    apply_rollups(rollup, [(visitor, deltas)])
+
+
+def apply_rollups(rollup, changes):
+    """
+    Fold several visitors' (visitor, deltas) into one $inc per rollup document
+    and write them with a single bulk_write.
+    """
+    merged = {}
+    for visitor, deltas in changes:
+        for day, counters in deltas.items():
+            key = (day, visitor.get("location") or "", visitor.get("contact_person") or "")
+            total = merged.setdefault(key, {})
+            for counter, value in counters.items():
+                total[counter] = total.get(counter, 0) + value
+    ops = [UpdateOne({"day": day, "location": location, "contact_person": contact},
+                     {"$inc": counters}, upsert=True)
+           for (day, location, contact), counters in merged.items()]
+    if ops:
+        rollup.bulk_write(ops, ordered=False)
+
+
+# --- Queries ---
+def parse_range(args, today=None):
+    """(from_day, to_day) as YYYY-MM-DD strings; defaults to the last DEFAULT_ANALYTICS_DAYS days."""
+    today = today or datetime.now()
+    try:
+        date_to = datetime.strptime(args["to"], "%Y-%m-%d") if args.get("to") else today
+        date_from = (datetime.strptime(args["from"], "%Y-%m-%d") if args.get("from")
+                     else date_to - timedelta(days=DEFAULT_ANALYTICS_DAYS - 1))
+    except ValueError:
+        raise ValueError("Invalid date, expected YYYY-MM-DD")
+    if date_from > date_to:
+        raise ValueError("'from' is after 'to'")
+    if (date_to - date_from).days >= MAX_ANALYTICS_DAYS:
+        raise ValueError(f"Date range is limited to {MAX_ANALYTICS_DAYS} days")
+    return day_key(date_from), day_key(date_to)
+
+
+def traffic(rollup, date_from, date_to, group_by=None, per_day=True):
+    """
+    Visits and average dwell time from the rollup, per day and/or per location or
+    contact person. Reads O(days x groups) rollup documents, never the visitors.
+    """
+    if group_by and group_by not in ROLLUP_GROUPS:
+        raise ValueError(f"group_by must be one of {', '.join(ROLLUP_GROUPS)}")
+    key = {}
+    if per_day:
+        key["day"] = "$day"
+    if group_by:
+        key[group_by] = f"${group_by}"
+    pipeline = [
+        {"$match": {"day": {"$gte": date_from, "$lte": date_to}}},
+        {"$group": {"_id": key or None, **{c: {"$sum": f"${c}"} for c in ROLLUP_COUNTERS}}},
+        {"$sort": {f"_id.{k}": ASCENDING for k in key} or {"_id": ASCENDING}},
+    ]
+    rows = []
+    for doc in rollup.aggregate(pipeline):
+        row = dict(doc.pop("_id") or {})
+        row.update({c: doc.get(c, 0) for c in ROLLUP_COUNTERS})
+        row["avg_dwell_minutes"] = (round(row["dwell_seconds"] / row["checked_out"] / 60, 1)
+                                    if row["checked_out"] else None)
+        rows.append(row)
+    return rows
+
+
+def on_site_now(collection, limit=DEFAULT_ON_SITE_LIMIT):
+    """Visitors checked in and not yet out, newest first, with per-location counts."""
+    visitors = list(collection.find(ON_SITE_QUERY, ON_SITE_PROJECTION)
+                    .sort([("check_in", DESCENDING), ("_id", DESCENDING)]).limit(limit))
+    by_location = list(collection.aggregate([
+        {"$match": ON_SITE_QUERY},
+        {"$group": {"_id": "$location", "count": {"$sum": 1}}},
+        {"$sort": {"count": DESCENDING}},
+    ]))
+    return {
+        "total": sum(g["count"] for g in by_location),
+        "by_location": [{"location": g["_id"], "count": g["count"]} for g in by_location],
+        "visitors": visitors,
+    }
+
+
+# --- Rebuild ---
+def _utc_offset() -> str:
+    """The server's UTC offset as +hhmm, for $dateToString over ObjectId timestamps."""
+    return time.strftime("%z") or "+0000"
+
+
+def rebuild_rollup(collection, rollup):
+    """
+    Recompute the rollup from the visitors collection with aggregation pipelines:
+    registrations, decisions, check-ins and check-outs/dwell, each grouped by
+    (day, location, contact_person) and $merge'd into a fresh rollup collection.
+    check_in/check_out are stored as local times, registration days come from _id.
+    Decisions without approved_at are counted on the registration day. Needs MongoDB 4.2+.
+    """
+    registered_day = {"$dateToString": {"format": "%Y-%m-%d", "date": {"$toDate": "$_id"},
+                                        "timezone": _utc_offset()}}
+    decided_day = {"$cond": [{"$ifNull": ["$approved_at", False]},
+                             {"$dateToString": {"format": "%Y-%m-%d", "date": "$approved_at"}},
+                             registered_day]}
+    checked_in_day = {"$dateToString": {"format": "%Y-%m-%d", "date": "$check_in"}}
+
+    def stage(match, day, counters):
+        return [
+            {"$match": match},
+            {"$group": {"_id": {"day": day, "location": {"$ifNull": ["$location", ""]},
+                                "contact_person": {"$ifNull": ["$contact_person", ""]}},
+                        **counters}},
+            {"$project": {"_id": 0, "day": "$_id.day", "location": "$_id.location",
+                          "contact_person": "$_id.contact_person", **{c: 1 for c in counters}}},
+            {"$merge": {"into": rollup.name, "on": ["day", "location", "contact_person"],
+                        "whenMatched": "merge", "whenNotMatched": "insert"}},
+        ]
+
+    rollup.drop()
+    ensure_rollup_indexes(rollup)
+    collection.aggregate(stage({}, registered_day, {"registered": {"$sum": 1}}))
+    collection.aggregate(stage({"approved": {"$in": [True, False]}}, decided_day, {
+        "approved": {"$sum": {"$cond": [{"$eq": ["$approved", True]}, 1, 0]}},
+        "declined": {"$sum": {"$cond": [{"$eq": ["$approved", False]}, 1, 0]}},
+    }))
+    collection.aggregate(stage({"check_in": {"$ne": None}}, checked_in_day, {
+        "checked_in": {"$sum": 1},
+        "checked_out": {"$sum": {"$cond": [{"$ifNull": ["$check_out", False]}, 1, 0]}},
+        "dwell_seconds": {"$sum": {"$cond": [
+            {"$ifNull": ["$check_out", False]},
+            {"$divide": [{"$subtract": ["$check_out", "$check_in"]}, 1000]},
+            0,
+        ]}},
+    }))
+    return rollup.count_documents({})
@@ -1,30 +1,161 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_pymongo import PyMongo
 from bson.objectid import ObjectId
-from datetime import datetime
-from authlib.integrations.flask_client import OAuth
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from datetime import datetime, timedelta
 from sqlalchemy import func, inspect, text
-import pandas as pd
-from werkzeug.security import generate_password_hash, check_password_hash
 from config import MYSQL_HOST, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB, MYSQL_PORT, GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, MONGO_URI, SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, SMTP_MAIL
-from datetime import datetime
 from flask_dance.contrib.google import make_google_blueprint, google
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
-import requests
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-import smtplib
-from urllib.parse import quote_plus
+from ingest import ingest_rows, IngestResult, DEFAULT_BATCH_SIZE, DEFAULT_LOAD_DATA_THRESHOLD
+from readers import (iter_row_batches, expand_sources, sheet_names, parse_sheets, iter_spool, sheet_label,
+                     unique_names, spool_batches, DEFAULT_CHUNK_SIZE, DEFAULT_PARSE_WORKERS, DEFAULT_MAX_ZIP_BYTES,
+                     DEFAULT_MAX_ZIP_MEMBERS)
+from jobs import JobQueue, Heartbeat, new_job_id, DEFAULT_WORKERS, DEFAULT_HEARTBEAT, DEFAULT_LEASE, DEFAULT_JOB_ATTEMPTS
+from schema import (SchemaCache, add_missing_columns, sync_column_types, widen_type, alter_table,
+                    DEFAULT_SCHEMA_TTL)
+from grid import fetch_page, DEFAULT_PAGE_SIZE
+from export import iter_export, available_formats, EXPORT_FORMATS, DEFAULT_EXPORT_CHUNK
+from mailer import MailQueue
+from visitors import (ensure_visitor_indexes, fetch_visitor_page, parse_bulk_items, bulk_fields, STATUS_FILTERS,
+                      DEFAULT_VISITOR_PAGE, LIST_PROJECTION, BULK_ACTIONS, BULK_PRECONDITIONS, BULK_STAMPS)
+from events import EventBroker, visitor_delta
+from analytics import (ensure_rollup_indexes, rollup_deltas, apply_rollup, apply_rollups, parse_range, traffic, on_site_now,
+                       rebuild_rollup, ROLLUP_COLLECTION, ROLLUP_PROJECTION, DEFAULT_ON_SITE_LIMIT)
+from cache import AppCache, make_backend, DEFAULT_TTL
+from metrics import Instrumentation, DEFAULT_SLOW_QUERY_MS
+from assets import StaticAssets, build_assets
+from compress import ResponseCompressor, DEFAULT_MIN_SIZE, DEFAULT_GZIP_LEVEL
+from dedupe import (file_digest, ensure_row_hash_column, new_rows, delete_batch, ON_DUPLICATE_MODES,
+                    ROW_HASH_COL)
+from purge import delete_in_chunks, count_rows, drop_table, DEFAULT_DELETE_CHUNK, DEFAULT_DELETE_PAUSE
+from search import (ensure_search_column, with_search_documents, backfill_search_text, drop_search_index, search_rows,
+                    SEARCH_COL, DEFAULT_SEARCH_LIMIT)
+from auth import (PasswordHasher, LoginRateLimiter, HasherBusy, DEFAULT_HASH_METHOD, DEFAULT_HASH_WORKERS,
+                  DEFAULT_HASH_QUEUE, DEFAULT_MAX_ATTEMPTS, DEFAULT_MAX_ATTEMPTS_PER_IP, DEFAULT_WINDOW)
+import functools
+import hashlib
+import json
+import re
+import shutil
+from collections import Counter
+import tempfile
+import threading
+import time
 
 
 app = Flask(__name__)
 app.secret_key = "super_secret_key"
-app.config["TEMPLATES_AUTO_RELOAD"] = True
+# "development" (default) or "production"; see wsgi.py / gunicorn.conf.py for the production entry point
+app.config["APP_ENV"] = os.environ.get("APP_ENV", "development")
+app.config["TEMPLATES_AUTO_RELOAD"] = app.config["APP_ENV"] != "production"
 
 app.config['PREFERRED_URL_SCHEME'] = 'https'
-app.config["MONGO_URI"] = MONGO_URI
-mongo = PyMongo(app)
+
+# --- Reverse proxy ---
+# Number of proxies in front of the app (nginx, a load balancer) whose X-Forwarded-For/-Proto/-Host
+# are trusted; 0 (default) uses the socket peer. Login limits per IP need the real client address.
+app.config["TRUSTED_PROXY_COUNT"] = int(os.environ.get("TRUSTED_PROXY_COUNT", 0))
+if app.config["TRUSTED_PROXY_COUNT"]:
+    proxies = app.config["TRUSTED_PROXY_COUNT"]
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies)
+
+# --- Instrumentation ---
+# Off by default; when on: Server-Timing headers, /metrics and a slow-query log
+app.config["INSTRUMENTATION"] = os.environ.get("INSTRUMENTATION", "0") == "1"
+app.config["SLOW_QUERY_MS"] = int(os.environ.get("SLOW_QUERY_MS", DEFAULT_SLOW_QUERY_MS))
+instrumentation = Instrumentation(app.config["INSTRUMENTATION"], app.config["SLOW_QUERY_MS"])
+instrumentation.init_app(app)
+
+# --- Static assets and compression ---
+# Fingerprinted, precompressed static files from `flask build-assets` (on by default in production,
+# where static files do not change under a running app)
+app.config["STATIC_FINGERPRINTS"] = os.environ.get(
+    "STATIC_FINGERPRINTS", "1" if app.config["APP_ENV"] == "production" else "0") == "1"
+static_assets = StaticAssets(app.static_folder, app.config["STATIC_FINGERPRINTS"])
+static_assets.init_app(app)
+# gzip/brotli for buffered HTML/JSON responses of at least COMPRESS_MIN_SIZE bytes
+app.config["COMPRESS_RESPONSES"] = os.environ.get("COMPRESS_RESPONSES", "1") == "1"
+app.config["COMPRESS_MIN_SIZE"] = int(os.environ.get("COMPRESS_MIN_SIZE", DEFAULT_MIN_SIZE))
+app.config["COMPRESS_LEVEL"] = int(os.environ.get("COMPRESS_LEVEL", DEFAULT_GZIP_LEVEL))
+compressor = ResponseCompressor(app.config["COMPRESS_RESPONSES"], app.config["COMPRESS_MIN_SIZE"],
+                                app.config["COMPRESS_LEVEL"])
+compressor.init_app(app)
+
+app.config["MONGO_URI"] = os.environ.get("MONGO_URI", MONGO_URI)
+# Per worker process; gthread workers share one client across their threads
+app.config["MONGO_MAX_POOL_SIZE"] = int(os.environ.get("MONGO_MAX_POOL_SIZE", 50))
+# connect=False: no sockets or monitor threads until the first query, so a gunicorn
+# master that preloads the app forks a client with nothing to share
+mongo = PyMongo(app, maxPoolSize=app.config["MONGO_MAX_POOL_SIZE"], connect=False,
+                event_listeners=instrumentation.mongo_listeners())
+
+app.config["VISITOR_CHANGE_STREAMS"] = os.environ.get("VISITOR_CHANGE_STREAMS", "1") == "1"
+visitor_events = EventBroker()
+_visitor_indexes_ready = False
+_visitor_indexes_lock = threading.Lock()
+
+
+@app.before_request
+def _ensure_visitor_indexes():
+    """Create the visitor indexes and start the change stream once per process, on its first request."""
+    global _visitor_indexes_ready
+    if _visitor_indexes_ready:
+        return
+    with _visitor_indexes_lock:
+        if not _visitor_indexes_ready:
+            try:
+                ensure_visitor_indexes(mongo.db.visitors)
+                ensure_rollup_indexes(mongo.db[ROLLUP_COLLECTION])
+            except Exception:
+                app.logger.exception("Could not create visitor indexes")
+            if app.config["VISITOR_CHANGE_STREAMS"]:
+                visitor_events.watch_collection(mongo.db.visitors)
+            _visitor_indexes_ready = True
+
+# --- Outbound mail ---
+def _record_email_status(mail, status, error):
+    """Keep the send state of visitor notifications on the visitor document."""
+    visitor_id = mail.meta.get("visitor_id")
+    if not visitor_id:
+        return
+    fields = {"email_status": status, "email_attempts": mail.attempts, "email_error": error}
+    if status == "sent":
+        fields["email_sent_at"] = datetime.now()
+    mongo.db.visitors.update_one({"_id": ObjectId(visitor_id)}, {"$set": fields})
+
+
+def update_visitor(visitor_id, fields, where=None):
+    """
+    $set fields on a visitor and fold the change into the daily rollup, which is
+    diffed against the pre-update document. `where` adds conditions to the filter
+    (see BULK_PRECONDITIONS). Returns that document (None if missing or not matched).
+    """
+    before = mongo.db.visitors.find_one_and_update(
+        {"_id": ObjectId(visitor_id), **(where or {})}, {"$set": fields}, projection=ROLLUP_PROJECTION
+    )
+    if before:
+        record_visitor_rollup(before, fields)
+    return before
+
+
+def record_visitor_rollup(before, fields):
+    # Analytics are best-effort; a rollup write must never fail the visitor update
+    try:
+        apply_rollup(mongo.db[ROLLUP_COLLECTION], before or fields, rollup_deltas(before, fields))
+    except Exception:
+        app.logger.exception("Could not update the visitor rollup")
+
+
+mail_queue = MailQueue(
+    SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD,
+    use_tls=os.environ.get("SMTP_USE_TLS", "1") == "1",
+    on_status=_record_email_status,
+)
 
 # Add Google OAuth config
 os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'  # For HTTP (development only)
@@ -42,11 +173,102 @@ app.register_blueprint(google_bp, url_prefix="/login")
 
 
 # --- SQLAlchemy / MySQL ---
-app.config["SQLALCHEMY_DATABASE_URI"] = (
-    f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}"
+# DATABASE_URL overrides config.py, e.g. a local MySQL container or SQLite for the benchmarks
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+    "DATABASE_URL", f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}"
 )
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# Per worker process: size DB_POOL_SIZE to the gunicorn thread count
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+    "pool_size": int(os.environ.get("DB_POOL_SIZE", 10)),
+    "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 5)),
+    # Below MySQL's wait_timeout, so idle connections are replaced before the server drops them
+    "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+    "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "1") == "1",
+}
+
+# --- Bulk ingestion ---
+app.config["INGEST_CHUNK_SIZE"] = int(os.environ.get("INGEST_CHUNK_SIZE", DEFAULT_CHUNK_SIZE))
+app.config["INGEST_BATCH_SIZE"] = int(os.environ.get("INGEST_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+app.config["INGEST_LOAD_DATA_THRESHOLD"] = int(os.environ.get("INGEST_LOAD_DATA_THRESHOLD", DEFAULT_LOAD_DATA_THRESHOLD))
+if app.config["INGEST_LOAD_DATA_THRESHOLD"]:
+    # LOAD DATA LOCAL INFILE must be allowed on the client side as well
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"]["connect_args"] = {"local_infile": True}
 db = SQLAlchemy(app)
+with app.app_context():
+    instrumentation.watch_engine(db.engine)
+schema_cache = SchemaCache(int(os.environ.get("SCHEMA_CACHE_TTL", DEFAULT_SCHEMA_TTL)))
+# "text": every Excel column is TEXT (default); "typed": infer BIGINT/DOUBLE/DATETIME/VARCHAR per column
+app.config["PROJECT_SCHEMA_MODE"] = os.environ.get("PROJECT_SCHEMA_MODE", "text")
+
+# --- Upload jobs ---
+app.config["UPLOAD_DIR"] = os.environ.get("UPLOAD_DIR", os.path.join(app.instance_path, "uploads"))
+# Jobs run on a process pool by default: parsing and inserts stay off the web workers' GIL
+app.config["UPLOAD_JOB_EXECUTOR"] = os.environ.get("UPLOAD_JOB_EXECUTOR", "process")
+app.config["UPLOAD_JOB_WORKERS"] = int(os.environ.get("UPLOAD_JOB_WORKERS", DEFAULT_WORKERS))
+app.config["UPLOAD_JOB_START_METHOD"] = os.environ.get("UPLOAD_JOB_START_METHOD", "spawn")
+# Running jobs refresh heartbeat_at; ones silent for the lease are requeued (see recover_stale_jobs)
+app.config["JOB_HEARTBEAT_SECONDS"] = int(os.environ.get("JOB_HEARTBEAT_SECONDS", DEFAULT_HEARTBEAT))
+app.config["JOB_LEASE_SECONDS"] = int(os.environ.get("JOB_LEASE_SECONDS", DEFAULT_LEASE))
+app.config["JOB_MAX_ATTEMPTS"] = int(os.environ.get("JOB_MAX_ATTEMPTS", DEFAULT_JOB_ATTEMPTS))
+# Sheets/files of one multi-sheet or multi-file upload are parsed on a process pool of this size
+app.config["UPLOAD_PARSE_WORKERS"] = int(os.environ.get("UPLOAD_PARSE_WORKERS", DEFAULT_PARSE_WORKERS))
+app.config["UPLOAD_PARSE_START_METHOD"] = os.environ.get("UPLOAD_PARSE_START_METHOD", "spawn")
+# Zip archives in an upload fail once they list or expand to more than this
+app.config["MAX_ZIP_EXTRACT_BYTES"] = int(os.environ.get("MAX_ZIP_EXTRACT_BYTES", DEFAULT_MAX_ZIP_BYTES))
+app.config["MAX_ZIP_MEMBERS"] = int(os.environ.get("MAX_ZIP_MEMBERS", DEFAULT_MAX_ZIP_MEMBERS))
+# Batch deletes / project purges remove this many rows per transaction, pausing in between
+app.config["DELETE_CHUNK_SIZE"] = int(os.environ.get("DELETE_CHUNK_SIZE", DEFAULT_DELETE_CHUNK))
+app.config["DELETE_CHUNK_PAUSE"] = float(os.environ.get("DELETE_CHUNK_PAUSE", DEFAULT_DELETE_PAUSE))
+# /api/search and the search box; tables get their full-text index from `flask build-search-index` only
+app.config["SEARCH_INDEX"] = os.environ.get("SEARCH_INDEX", "0") == "1"
+
+
+def _reset_db_pool():
+    """Process-pool initializer: never reuse connections inherited from the parent (fork start method)."""
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+job_queue = JobQueue(app.config["UPLOAD_JOB_EXECUTOR"], app.config["UPLOAD_JOB_WORKERS"], initializer=_reset_db_pool,
+                     start_method=app.config["UPLOAD_JOB_START_METHOD"])
+
+
+def submit_job(fn, job_id, table_name):
+    """
+    Queue a job. A process pool runs its DDL in another process, so this process's
+    schema cache forgets the job's table once the job finishes.
+    """
+    future = job_queue.submit(fn, job_id)
+    if future is not None:
+        future.add_done_callback(lambda _: schema_cache.invalidate(table_name))
+    return future
+
+# --- Lookup cache ---
+# "filesystem" (default): cachelib FileSystemCache shared by every worker on the host, namespace
+# versions included, so an invalidation reaches them all; "lru": per-process, single-worker setups only
+app.config["CACHE_BACKEND"] = os.environ.get("CACHE_BACKEND", "filesystem")
+app.config["CACHE_DIR"] = os.environ.get("CACHE_DIR", os.path.join(app.instance_path, "cache"))
+app.config["CACHE_TTL"] = int(os.environ.get("CACHE_TTL", DEFAULT_TTL))
+app_cache = AppCache(make_backend(app.config["CACHE_BACKEND"], app.config["CACHE_DIR"]), app.config["CACHE_TTL"])
+
+# --- Passwords and login limits ---
+app.config["PASSWORD_HASH_METHOD"] = os.environ.get("PASSWORD_HASH_METHOD", DEFAULT_HASH_METHOD)
+app.config["PASSWORD_HASH_WORKERS"] = int(os.environ.get("PASSWORD_HASH_WORKERS", DEFAULT_HASH_WORKERS))
+app.config["PASSWORD_HASH_QUEUE"] = int(os.environ.get("PASSWORD_HASH_QUEUE", DEFAULT_HASH_QUEUE))
+app.config["LOGIN_MAX_ATTEMPTS"] = int(os.environ.get("LOGIN_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS))
+app.config["LOGIN_MAX_ATTEMPTS_PER_IP"] = int(os.environ.get("LOGIN_MAX_ATTEMPTS_PER_IP", DEFAULT_MAX_ATTEMPTS_PER_IP))
+app.config["LOGIN_WINDOW"] = int(os.environ.get("LOGIN_WINDOW", DEFAULT_WINDOW))
+# Failure counters are shared by every worker on the host whatever CACHE_BACKEND is;
+# per-process counters would multiply the limits by the number of workers
+app.config["LOGIN_LIMIT_BACKEND"] = os.environ.get("LOGIN_LIMIT_BACKEND", "filesystem")
+password_hasher = PasswordHasher(app.config["PASSWORD_HASH_METHOD"], app.config["PASSWORD_HASH_WORKERS"],
+                                 app.config["PASSWORD_HASH_QUEUE"])
+# Own backend so lookup-cache churn never evicts failure counters
+login_limiter = LoginRateLimiter(
+    make_backend(app.config["LOGIN_LIMIT_BACKEND"], os.path.join(app.config["CACHE_DIR"], "login")),
+    app.config["LOGIN_MAX_ATTEMPTS"], app.config["LOGIN_MAX_ATTEMPTS_PER_IP"], app.config["LOGIN_WINDOW"],
+)
 
 
 # --- Models ---
@@ -63,16 +285,106 @@ class Project(db.Model):
     name = db.Column(db.String(255), nullable=False)
 
 
+# --- Cached lookups ---
+# Invalidate "projects" / "users" / "contacts" wherever those tables are written.
+def all_projects():
+    """[{"id", "name"}] sorted by name."""
+    return app_cache.get_or_set("projects", "all", lambda: [
+        {"id": p.id, "name": p.name} for p in Project.query.order_by(Project.name).all()
+    ])
+
+
+def first_project_name():
+    projects = all_projects()
+    return projects[0]["name"] if projects else ""
+
+
+def all_users():
+    """[{"username", "role"}] sorted by username, without passwords."""
+    return app_cache.get_or_set("users", "all", lambda: [
+        {"username": u.username, "role": u.role} for u in User.query.order_by(User.username).all()
+    ])
+
+
+def contacts_for_dept(dept):
+    return app_cache.get_or_set("contacts", dept, lambda: [
+        {"username": u["username"], "email": u["email"]}
+        for u in db.session.execute(
+            text("SELECT username, email FROM contact_person WHERE dept = :dept"),
+            {"dept": dept}
+        ).mappings().all()
+    ])
+
+
+class UploadJob(db.Model):
+    """A background job: an upload, or a batch delete / project purge (see CLEANUP_JOBS)."""
+    __tablename__ = "upload_jobs"
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(20), default="upload")  # "upload", "delete_batch" or "purge_project"
+    project_name = db.Column(db.String(255), nullable=False)
+    table_name = db.Column(db.String(255), nullable=False)
+    file_name = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(1024), nullable=False)
+    file_size = db.Column(db.BigInteger, default=0)
+    uploaded_by = db.Column(db.String(100), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default="queued", index=True)
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)  # last sign of life from the worker running it
+    attempts = db.Column(db.Integer, default=0)  # times a worker has started it
+    finished_at = db.Column(db.DateTime)
+    report = db.Column(db.Text)  # JSON: [{"file_name", "sheet", "rows"}] once the job is done
+    options = db.Column(db.Text)  # JSON: upload options (see enqueue_upload) or the batch to delete
+
+    def to_dict(self):
+        end = self.finished_at or datetime.now()
+        elapsed = (end - self.started_at).total_seconds() if self.started_at else 0.0
+        return {
+            "job_id": self.id,
+            "kind": self.kind or "upload",
+            "project_name": self.project_name,
+            "file_name": self.file_name,
+            "status": self.status,
+            "rows_processed": self.rows_processed,
+            "elapsed": round(elapsed, 2),
+            "rows_per_sec": round(self.rows_processed / elapsed, 1) if elapsed else 0.0,
+            "error": self.error,
+            "sheets": json.loads(self.report) if self.report else [],
+        }
+
+
+class UploadBatch(db.Model):
+    """One row per ingested file; the /data summary reads this instead of GROUP BY over the project table."""
+    __tablename__ = "upload_batches"
+    __table_args__ = (db.Index("idx_batches_table_user_time", "table_name", "uploaded_by", "upload_time"),
+                      db.Index("idx_batches_content_hash", "table_name", "uploaded_by", "content_hash"))
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    project_name = db.Column(db.String(255), nullable=False)
+    table_name = db.Column(db.String(255), nullable=False)
+    uploaded_by = db.Column(db.String(100), nullable=False)
+    file_name = db.Column(db.String(255), nullable=False)
+    upload_time = db.Column(db.String(20), nullable=False)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    byte_size = db.Column(db.BigInteger)
+    duration = db.Column(db.Float)
+    content_hash = db.Column(db.String(64))  # sha256 of the source file; shared by the sheets of one file
+
+
 # --- Utilities ---
+_UNSAFE_IDENT_CHARS = re.compile(r"[^0-9a-zA-Z_]")
+
+@functools.lru_cache(maxsize=8192)
 def safe_colname(col: str) -> str:
     """
     Sanitize a column name for MySQL identifiers.
     Converts spaces/dashes to underscores and strips weird chars.
+    Memoized: every chunk of a sheet maps the same headers again.
     """
     name = col.strip().replace(" ", "_").replace("-", "_")
     # optional: keep only alnum + underscore
-    import re
-    name = re.sub(r"[^0-9a-zA-Z_]", "", name)
+    name = _UNSAFE_IDENT_CHARS.sub("", name)
     if not name:
         name = "col"
     # avoid starting with digit
@@ -82,25 +394,554 @@ def safe_colname(col: str) -> str:
 
 def safe_table_name(name: str) -> str:
     """Sanitize project name for a MySQL table name."""
-    import re
     tbl = name.strip().replace(" ", "_").replace("-", "_")
-    tbl = re.sub(r"[^0-9a-zA-Z_]", "", tbl)
+    tbl = _UNSAFE_IDENT_CHARS.sub("", tbl)
     if tbl[0].isdigit():
         tbl = f"t_{tbl}"
     return tbl.lower()
 
+PROJECT_META_COLS = {"id", "uploaded_by", "upload_time", "file_name", ROW_HASH_COL, SEARCH_COL}
+# Backs the per-user grid pages (sorted by upload_time) and batch lookups
+PROJECT_INDEXES = ["INDEX `idx_uploaded_by_time` (`uploaded_by`, `upload_time`)",
+                   "INDEX `idx_batch` (`file_name`, `upload_time`)"]
+
+def display_columns(table_cols):
+    """Column order used on /data and in exports: upload_time, file_name, then data columns A-Z."""
+    meta_cols = ["upload_time", "file_name"]
+    data_cols = sorted([c for c in table_cols if c not in PROJECT_META_COLS])
+    return meta_cols + data_cols
+
+def ensure_project_table(table_name):
+    """CREATE TABLE IF NOT EXISTS for a project table, skipped when the schema cache knows it."""
+    if schema_cache.has_table(db.engine, table_name):
+        return
+    typed = app.config["PROJECT_SCHEMA_MODE"] == "typed"
+    sqlite = db.engine.dialect.name == "sqlite"
+    base_cols = ["id INTEGER PRIMARY KEY AUTOINCREMENT" if sqlite else "id INT AUTO_INCREMENT PRIMARY KEY",
+                 "uploaded_by VARCHAR(100)",
+                 "upload_time DATETIME" if typed else "upload_time VARCHAR(20)",
+                 "file_name VARCHAR(255)",
+                 *([] if sqlite else PROJECT_INDEXES)]
+    db.session.execute(text(f"CREATE TABLE IF NOT EXISTS `{table_name}` ({', '.join(base_cols)})"))
+    if sqlite:
+        # No inline INDEX on SQLite (local benchmarks), and index names are per database there
+        for ix in PROJECT_INDEXES:
+            name, cols = ix.split("`")[1], ix[ix.index("("):]
+            db.session.execute(text(f"CREATE INDEX IF NOT EXISTS `{table_name}_{name}` ON `{table_name}` {cols}"))
+    db.session.commit()
+    schema_cache.invalidate(table_name)
+
+def ingest_upload(stream, file_name, table_name, email, file_size, progress=None, project_name=None,
+                  content_hash=None):
+    """
+    Stream an uploaded spreadsheet into its project table: parse it once into a spool
+    file on disk, run every schema change the whole file needs (DDL commits, and on
+    MySQL ALTER commits implicitly), then insert the spooled chunks and record the
+    batch in upload_batches in one transaction, so a failed upload leaves no rows.
+    `progress(result)` is called after every inserted chunk.
+    """
+    started = time.perf_counter()
+    upload_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    typed = app.config["PROJECT_SCHEMA_MODE"] == "typed"
+    threshold = app.config["INGEST_LOAD_DATA_THRESHOLD"]
+    ensure_project_table(table_name)
+    result = IngestResult()
+
+    os.makedirs(app.config["UPLOAD_DIR"], exist_ok=True)
+    fd, spool_path = tempfile.mkstemp(dir=app.config["UPLOAD_DIR"], prefix="spool_", suffix=".pkl")
+    os.close(fd)
+    try:
+        # A sheet column named (or sanitized to) a meta column is stored as e.g. file_name_1
+        batches = iter_row_batches(stream, file_name, safe_colname, app.config["INGEST_CHUNK_SIZE"],
+                                   reserved=PROJECT_META_COLS)
+        columns, types, _ = spool_batches(instrumentation.timed_iter(batches, "parse"), spool_path, typed)
+
+        # One schema change for the whole file, before the first row goes in
+        with instrumentation.stage("ddl"):
+            if typed:
+                sync_column_types(db.session, schema_cache, table_name, types, reserved=PROJECT_META_COLS)
+            else:
+                add_missing_columns(db.session, schema_cache, table_name, columns, reserved=PROJECT_META_COLS)
+            # Tables indexed by build-search-index get search_text with every row; nothing here adds it
+            search = SEARCH_COL in schema_cache.columns(db.engine, table_name)
+
+        for columns, rows in iter_spool(spool_path):
+            # Insert the chunk with one compiled statement
+            insert_cols = columns + ["uploaded_by", "upload_time", "file_name"]
+            rows = (row + (email, upload_time, file_name) for row in rows)
+            if search:
+                insert_cols.append(SEARCH_COL)
+                rows = with_search_documents(rows, len(columns))
+            with instrumentation.stage("insert"):
+                result.add(ingest_rows(
+                    db.session, table_name, insert_cols, rows,
+                    batch_size=app.config["INGEST_BATCH_SIZE"],
+                    use_load_data=bool(threshold) and file_size >= threshold
+                ))
+            if progress:
+                progress(result)
+
+        with instrumentation.stage("commit"):
+            db.session.add(UploadBatch(
+                project_name=project_name or table_name,
+                table_name=table_name,
+                uploaded_by=email,
+                file_name=file_name,
+                upload_time=upload_time,
+                row_count=result.rows,
+                byte_size=file_size,
+                duration=round(time.perf_counter() - started, 3),
+                content_hash=content_hash,
+            ))
+            db.session.commit()
+        return result
+    finally:
+        os.remove(spool_path)
+
+def enqueue_upload(files, project_name, email, options=None):
+    """
+    Stream the uploaded file(s) to a job directory on local disk, record a queued job
+    and hand it to the job queue. Zip archives are expanded when the job runs.
+    options: on_duplicate ("skip" | "replace" | "append") for files already ingested,
+    dedupe_rows (skip rows already stored) and replace ([file_name, upload_time] of a
+    batch to swap out atomically).
+    """
+    job_id = new_job_id()
+    job_dir = os.path.join(app.config["UPLOAD_DIR"], job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    names, total_size = [], 0
+    for i, file in enumerate(files):
+        # Numbered, so two files with the same name never overwrite each other
+        file_path = os.path.join(job_dir, f"{i:03d}_{os.path.basename(file.filename or 'upload')}")
+        file.save(file_path)
+        names.append(file.filename)
+        total_size += os.path.getsize(file_path)
+
+    label = names[0] if len(names) == 1 else f"{names[0]} (+{len(names) - 1} more)"
+    job = UploadJob(
+        id=job_id,
+        project_name=project_name,
+        table_name=safe_table_name(project_name),
+        file_name=label[:255],
+        file_path=job_dir,
+        file_size=total_size,
+        uploaded_by=email,
+        options=json.dumps(options or {}),
+    )
+    db.session.add(job)
+    db.session.commit()
+    submit_job(run_upload_job, job_id, job.table_name)
+    return job
+
+def _update_job(job_id, **values):
+    """Write job progress on its own connection, outside the ingestion transaction."""
+    with db.engine.begin() as conn:
+        conn.execute(UploadJob.__table__.update().where(UploadJob.id == job_id).values(**values))
+
+def _report_progress(job_id, rows):
+    # Progress is best-effort; a failed update must not abort the job
+    try:
+        _update_job(job_id, rows_processed=rows, heartbeat_at=datetime.now())
+    except Exception:
+        app.logger.warning("Could not record progress for job %s", job_id)
+
+def _touch_job(job_id):
+    try:
+        _update_job(job_id, heartbeat_at=datetime.now())
+    except Exception:
+        app.logger.warning("Could not record a heartbeat for job %s", job_id)
+
+def _start_job(job_id):
+    """
+    Atomically move a queued or claimed job to running; False when another worker already
+    started it (a job can be handed out twice after recover_stale_jobs).
+    """
+    now = datetime.now()
+    with db.engine.begin() as conn:
+        return conn.execute(
+            UploadJob.__table__.update()
+            .where(UploadJob.id == job_id, UploadJob.status.in_(("queued", "claimed")))
+            .values(status="running", started_at=now, heartbeat_at=now, finished_at=None,
+                    attempts=func.coalesce(UploadJob.attempts, 0) + 1)
+        ).rowcount == 1
+
+def run_upload_job(job_id):
+    """Run the parse/DDL/insert pipeline for one queued upload."""
+    with app.app_context():
+        job = db.session.get(UploadJob, job_id)
+        if not job or not _start_job(job_id):
+            return None
+        # SQLite has a single writer: a second connection would wait out the ingestion
+        sqlite = db.engine.dialect.name == "sqlite"
+        progress = None if sqlite else lambda r: _report_progress(job_id, r.rows)
+        heartbeat = Heartbeat(lambda: _touch_job(job_id), 0 if sqlite else app.config["JOB_HEARTBEAT_SECONDS"])
+        try:
+            with heartbeat:
+                result, report = ingest_job_files(job, progress)
+            _update_job(job_id, status="done", rows_processed=result.rows, finished_at=datetime.now(),
+                        report=json.dumps(report))
+            app.logger.info("Job %s ingested %d rows from %d sheet(s) into %s (%.0f rows/s)",
+                            job_id, result.rows, len(report), job.table_name, result.rows_per_sec)
+            return result.rows
+        except Exception as e:
+            db.session.rollback()
+            app.logger.exception("Upload job %s failed", job_id)
+            _update_job(job_id, status="failed", error=str(e), finished_at=datetime.now())
+        finally:
+            if os.path.isdir(job.file_path):
+                shutil.rmtree(job.file_path, ignore_errors=True)
+            elif os.path.exists(job.file_path):
+                os.remove(job.file_path)
+
+def ingest_job_files(job, progress=None):
+    """
+    Ingest everything a job uploaded: a single one-sheet file streams straight through
+    ingest_upload; several files, zip archives or multi-sheet workbooks go through
+    ingest_sheets. Returns (IngestResult, per-sheet report).
+    """
+    if os.path.isdir(job.file_path):
+        # Stored as "<index>_<original name>"; the index keeps same-named files apart and in upload order
+        stored = sorted(os.listdir(job.file_path), key=lambda f: int(f.split("_", 1)[0]))
+        uploads = [(os.path.join(job.file_path, f), f.split("_", 1)[1]) for f in stored]
+    else:
+        # Jobs queued before uploads got a directory
+        uploads = [(job.file_path, job.file_name)]
+
+    options = json.loads(job.options) if job.options else {}
+    on_duplicate = options.get("on_duplicate", "skip")
+    replace = [tuple(options["replace"])] if options.get("replace") else []
+
+    extract_dir = tempfile.mkdtemp(dir=app.config["UPLOAD_DIR"], prefix="extract_")
+    try:
+        sources = []
+        for i, (path, name) in enumerate(uploads):
+            # One directory per archive, so members of same-named archives never overwrite each other
+            target_dir = os.path.join(extract_dir, str(i))
+            os.makedirs(target_dir)
+            sources += expand_sources(path, name, target_dir, app.config["MAX_ZIP_EXTRACT_BYTES"],
+                                      app.config["MAX_ZIP_MEMBERS"])
+        if not sources:
+            raise ValueError("No .xlsx, .xls or .csv files found in the upload")
+
+        # Content-addressed: the same bytes uploaded again are skipped or replace the earlier batch.
+        # Keyed by source path: two files of one upload may share a name
+        hashes, skipped = {}, []
+        for path, name in sources:
+            digest = file_digest(path)
+            previous = [] if on_duplicate == "append" else (
+                UploadBatch.query.filter_by(table_name=job.table_name, uploaded_by=job.uploaded_by,
+                                            content_hash=digest).all())
+            if previous and on_duplicate == "skip":
+                skipped.append({"file_name": name, "sheet": None, "rows": 0,
+                                "skipped": f"already uploaded as {previous[0].file_name} at {previous[0].upload_time}"})
+                continue
+            replace += [(b.file_name, b.upload_time) for b in previous]
+            hashes[path] = digest
+        sources = [(path, name) for path, name in sources if path in hashes]
+        units = [(path, name, sheet) for path, name in sources for sheet in sheet_names(path, name)]
+        if not units:
+            return IngestResult(), skipped
+
+        if len(units) == 1 and not replace and not options.get("dedupe_rows"):
+            path, name, _ = units[0]
+            with open(path, "rb") as fh:
+                result = ingest_upload(fh, name, job.table_name, job.uploaded_by, os.path.getsize(path),
+                                       progress=progress, project_name=job.project_name, content_hash=hashes[path])
+            return result, skipped + [{"file_name": name, "sheet": units[0][2], "rows": result.rows}]
+        result, report = ingest_sheets(units, job.table_name, job.uploaded_by, progress, job.project_name,
+                                       content_hashes=hashes, replace=replace,
+                                       dedupe_rows=bool(options.get("dedupe_rows")))
+        return result, skipped + report
+    finally:
+        shutil.rmtree(extract_dir, ignore_errors=True)
+
+def ingest_sheets(units, table_name, email, progress=None, project_name=None,
+                  content_hashes=None, replace=(), dedupe_rows=False):
+    """
+    Multi-sheet / multi-file ingestion: parse every (path, file_name, sheet) unit in
+    parallel on a process pool, merge all their schema changes into one ALTER, then
+    insert every sheet and record one ledger row per sheet in a single transaction.
+    The batches in `replace` ([(file_name, upload_time)]) are deleted in that same
+    transaction; `dedupe_rows` skips rows this user already has in the table.
+    `content_hashes` maps unit paths to digests. Same-named files are stored as
+    "name (2)", "name (3)", ... since a batch is identified by its name and time.
+    Returns (IngestResult, [{"file_name", "sheet", "rows"}]).
+    """
+    content_hashes = content_hashes or {}
+    upload_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    typed = app.config["PROJECT_SCHEMA_MODE"] == "typed"
+    threshold = app.config["INGEST_LOAD_DATA_THRESHOLD"]
+    sheet_counts = Counter(path for path, _, _ in units)
+    file_labels = {}
+    for path, name, _ in units:
+        if path not in file_labels:
+            label, n = name, 1
+            while label in file_labels.values():
+                n += 1
+                label = f"{name} ({n})"
+            file_labels[path] = label
+    ensure_project_table(table_name)
+
+    spool_dir = tempfile.mkdtemp(dir=app.config["UPLOAD_DIR"], prefix="spool_")
+    try:
+        with instrumentation.stage("parse"):
+            parsed = parse_sheets(units, spool_dir, app.config["UPLOAD_PARSE_WORKERS"],
+                                  app.config["INGEST_CHUNK_SIZE"], infer_types=typed,
+                                  start_method=app.config["UPLOAD_PARSE_START_METHOD"])
+
+        # Spooled columns are as read; name them per sheet, away from the meta columns
+        for sheet in parsed:
+            sheet["names"] = dict(zip(sheet["columns"], unique_names(
+                [safe_colname(c) for c in sheet["columns"]], PROJECT_META_COLS)))
+
+        # One schema change for the whole upload
+        with instrumentation.stage("ddl"):
+            if typed:
+                merged = {}
+                for sheet in parsed:
+                    for col, col_type in sheet["types"].items():
+                        col = sheet["names"][col]
+                        merged[col] = widen_type(merged[col], col_type) if col in merged else col_type
+                sync_column_types(db.session, schema_cache, table_name, merged, reserved=PROJECT_META_COLS)
+            else:
+                columns = list(dict.fromkeys(sheet["names"][c] for sheet in parsed for c in sheet["columns"]))
+                add_missing_columns(db.session, schema_cache, table_name, columns, reserved=PROJECT_META_COLS)
+            if dedupe_rows:
+                ensure_row_hash_column(db.session, schema_cache, table_name)
+            search = SEARCH_COL in schema_cache.columns(db.engine, table_name)
+
+        # Everything from here to the commit is one transaction: old batches out, new rows in
+        for file_name, old_time in dict.fromkeys(replace):
+            delete_batch(db.session, table_name, email, file_name, old_time)
+            UploadBatch.query.filter_by(table_name=table_name, uploaded_by=email, file_name=file_name,
+                                        upload_time=old_time).delete()
+
+        result, report, sized, seen = IngestResult(), [], set(), set()
+        # parse_sheets returns the sheets in unit order
+        for (path, _, _), sheet in zip(units, parsed):
+            started = time.perf_counter()
+            # Sheets of one workbook are told apart in the ledger and in file_name
+            file_label = file_labels[path]
+            label = sheet_label(file_label, sheet["sheet"]) if sheet_counts[path] > 1 else file_label
+            label = label[:255]
+            sheet_result, duplicates = IngestResult(), 0
+            for columns, rows in iter_spool(sheet["spool"]):
+                columns = [sheet["names"][c] for c in columns]
+                insert_cols = columns + ["uploaded_by", "upload_time", "file_name"]
+                if dedupe_rows:
+                    with instrumentation.stage("dedupe"):
+                        unique = new_rows(db.session, table_name, email, columns, rows, seen)
+                    duplicates += len(rows) - len(unique)
+                    # new_rows appends the hash; it goes after the meta values
+                    insert_cols.append(ROW_HASH_COL)
+                    rows = [row[:-1] + (email, upload_time, label, row[-1]) for row in unique]
+                else:
+                    rows = [row + (email, upload_time, label) for row in rows]
+                if search:
+                    insert_cols.append(SEARCH_COL)
+                    rows = with_search_documents(rows, len(columns))
+                with instrumentation.stage("insert"):
+                    sheet_result.add(ingest_rows(
+                        db.session, table_name, insert_cols, rows,
+                        batch_size=app.config["INGEST_BATCH_SIZE"],
+                        use_load_data=bool(threshold) and sheet["rows"] >= threshold
+                    ))
+                if progress:
+                    progress(IngestResult(result.rows + sheet_result.rows))
+            result.add(sheet_result)
+            report.append({"file_name": file_label, "sheet": sheet["sheet"], "rows": sheet_result.rows})
+            if dedupe_rows:
+                report[-1]["duplicates"] = duplicates
+            if not sheet_result.rows:
+                continue
+            db.session.add(UploadBatch(
+                project_name=project_name or table_name,
+                table_name=table_name,
+                uploaded_by=email,
+                file_name=label,
+                upload_time=upload_time,
+                row_count=sheet_result.rows,
+                # File size counted once, on its first sheet, so ledger totals stay right
+                byte_size=os.path.getsize(path) if path not in sized else 0,
+                duration=round(sheet["seconds"] + time.perf_counter() - started, 3),
+                content_hash=content_hashes.get(path),
+            ))
+            sized.add(path)
+
+        with instrumentation.stage("commit"):
+            db.session.commit()
+        return result, report
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+CLEANUP_JOBS = ("delete_batch", "purge_project")
+
+def enqueue_cleanup(kind, project_name, email, options=None):
+    """Record a queued delete_batch / purge_project job and hand it to the job queue."""
+    job_id = new_job_id()
+    label = options["file_name"] if kind == "delete_batch" else project_name
+    job = UploadJob(
+        id=job_id,
+        kind=kind,
+        project_name=project_name,
+        table_name=safe_table_name(project_name),
+        file_name=label[:255],
+        file_path="",
+        uploaded_by=email,
+        options=json.dumps(options or {}),
+    )
+    db.session.add(job)
+    db.session.commit()
+    submit_job(run_cleanup_job, job_id, job.table_name)
+    return job
+
+def run_cleanup_job(job_id):
+    """Run one queued batch delete or project purge."""
+    with app.app_context():
+        job = db.session.get(UploadJob, job_id)
+        if not job or not _start_job(job_id):
+            return None
+        options = json.loads(job.options or "{}")
+        # Every chunk commits on its own, so progress can be written even on SQLite
+        progress = lambda rows: _report_progress(job_id, rows)
+        try:
+            with Heartbeat(lambda: _touch_job(job_id), app.config["JOB_HEARTBEAT_SECONDS"]):
+                if job.kind == "purge_project":
+                    rows = purge_project_data(job.project_name, job.table_name, progress)
+                else:
+                    rows = delete_upload_batch(job.table_name, job.uploaded_by, options["file_name"],
+                                               options["upload_time"], progress)
+            _update_job(job_id, status="done", rows_processed=rows, finished_at=datetime.now())
+            app.logger.info("Job %s (%s) removed %d rows from %s", job_id, job.kind, rows, job.table_name)
+            return rows
+        except Exception as e:
+            db.session.rollback()
+            app.logger.exception("Cleanup job %s failed", job_id)
+            _update_job(job_id, status="failed", error=str(e), finished_at=datetime.now())
+
+def run_job(job_id):
+    """Run a claimed job of any kind (the upload-worker entry point)."""
+    with app.app_context():
+        job = db.session.get(UploadJob, job_id)
+        kind = job.kind if job else None
+    if kind in CLEANUP_JOBS:
+        return run_cleanup_job(job_id)
+    return run_upload_job(job_id)
+
+def delete_upload_batch(table_name, email, file_name, upload_time, progress=None):
+    """
+    Delete one upload batch in bounded primary-key chunks (idx_batch finds them), each its
+    own short transaction, so /data readers are never queued behind one huge DELETE.
+    Never TRUNCATE here, even for the last batch: an upload committing meanwhile would go too.
+    The ledger entry goes last, once the rows are gone.
+    """
+    if not schema_cache.has_table(db.engine, table_name):
+        return 0
+    where = "`file_name` = :file_name AND `upload_time` = :upload_time AND `uploaded_by` = :user"
+    params = {"file_name": file_name, "upload_time": upload_time, "user": email}
+    deleted = delete_in_chunks(db.engine, table_name, where, params,
+                               app.config["DELETE_CHUNK_SIZE"], app.config["DELETE_CHUNK_PAUSE"], progress)
+    UploadBatch.query.filter_by(table_name=table_name, uploaded_by=email,
+                                file_name=file_name, upload_time=upload_time).delete()
+    db.session.commit()
+    return deleted
+
+def purge_project_data(project_name, table_name, progress=None):
+    """
+    Remove everything a project stored: DROP its table (no per-row work at all), delete
+    its legacy excel_data rows in chunks and clear its ledger entries.
+    """
+    removed = 0
+    if schema_cache.has_table(db.engine, table_name):
+        removed = count_rows(db.engine, table_name)
+        drop_table(db.engine, table_name)
+        drop_search_index(db.engine, table_name)
+        schema_cache.invalidate(table_name)
+        if progress:
+            progress(removed)
+    if schema_cache.has_table(db.engine, "excel_data"):
+        removed += delete_in_chunks(
+            db.engine, "excel_data", "`project_name` = :project", {"project": project_name},
+            app.config["DELETE_CHUNK_SIZE"], app.config["DELETE_CHUNK_PAUSE"],
+            (lambda n: progress(removed + n)) if progress else None,
+        )
+    UploadBatch.query.filter_by(table_name=table_name).delete()
+    db.session.commit()
+    return removed
+
+def recover_stale_jobs():
+    """
+    Requeue claimed/running jobs whose heartbeat is older than JOB_LEASE_SECONDS: their
+    worker died (a deploy, gunicorn's max_requests recycling or graceful_timeout kill).
+    Jobs already started JOB_MAX_ATTEMPTS times are failed instead. A rerun is safe: an
+    upload runs its DDL first and then commits its rows and ledger entries in one
+    transaction, so an interrupted one left no rows; deletes/purges just carry on.
+    Returns (requeued, failed).
+    """
+    now = datetime.now()
+    last_seen = func.coalesce(UploadJob.heartbeat_at, UploadJob.started_at, UploadJob.created_at)
+    stale = (UploadJob.status.in_(("claimed", "running")),
+             last_seen < now - timedelta(seconds=app.config["JOB_LEASE_SECONDS"]))
+    table = UploadJob.__table__
+    requeued, failed = [], []
+    with db.engine.begin() as conn:
+        jobs = conn.execute(db.select(UploadJob.id, UploadJob.attempts, UploadJob.file_path).where(*stale)).all()
+        for job_id, attempts, file_path in jobs:
+            if (attempts or 0) >= app.config["JOB_MAX_ATTEMPTS"]:
+                values = {"status": "failed", "finished_at": now,
+                          "error": f"Interrupted {attempts} times; the worker running it stopped"}
+                target = failed
+            else:
+                values = {"status": "queued", "heartbeat_at": None, "rows_processed": 0}
+                target = requeued
+            if conn.execute(table.update().where(UploadJob.id == job_id, *stale).values(**values)).rowcount:
+                target.append((job_id, file_path))
+    for job_id, file_path in failed:
+        if file_path and os.path.isdir(file_path):
+            shutil.rmtree(file_path, ignore_errors=True)
+    if requeued or failed:
+        app.logger.warning("Recovered stale jobs: %d requeued, %d failed", len(requeued), len(failed))
+    return len(requeued), len(failed)
+
+def claim_next_job():
+    """
+    Recover stale jobs, then atomically mark the oldest queued job claimed;
+    returns its id or None.
+    """
+    recover_stale_jobs()
+    job = UploadJob.query.filter_by(status="queued").order_by(UploadJob.created_at).first()
+    if not job:
+        return None
+    with db.engine.begin() as conn:
+        claimed = conn.execute(
+            UploadJob.__table__.update()
+            .where(UploadJob.id == job.id, UploadJob.status == "queued")
+            .values(status="claimed", heartbeat_at=datetime.now())
+        ).rowcount
+    return job.id if claimed else None
+
+def resume_jobs():
+    """
+    Hand queued and recovered jobs to this process's pool (thread/process executors).
+    gunicorn calls it after every fork, so jobs lost with a recycled worker run again.
+    """
+    if job_queue.mode not in ("thread", "process"):
+        return 0
+    resumed = 0
+    while (job_id := claim_next_job()):
+        submit_job(run_job, job_id, db.session.get(UploadJob, job_id).table_name)
+        resumed += 1
+    db.session.remove()
+    return resumed
+
 def ensure_columns_exist(new_columns):
     """
     ALTER TABLE excel_data ADD COLUMN `<col>` TEXT for any missing Excel columns.
     """
-    inspector = inspect(db.engine)
-    existing = {c["name"] for c in inspector.get_columns("excel_data")}
-    for col in new_columns:
-        c = safe_colname(col)
-        if c not in existing and c not in {"id", "project_name", "uploaded_by", "upload_time", "file_name"}:
-            db.session.execute(text(f"ALTER TABLE `excel_data` ADD COLUMN `{c}` TEXT"))
-            db.session.commit()
-            existing.add(c)
+    add_missing_columns(
+        db.session, schema_cache, "excel_data", [safe_colname(col) for col in new_columns],
+        reserved={"id", "project_name", "uploaded_by", "upload_time", "file_name"}
+    )
 
 
 # --- Routes ---
@@ -128,13 +969,13 @@ def google_login():
             user = User(username=email, password="", role="User")  # No password for SSO users
             db.session.add(user)
             db.session.commit()
+            app_cache.invalidate("users")
 
         # ✅ Create session
         session["username"] = email
         session["role"] = user.role
 
-        first_project = Project.query.order_by(Project.name).first()
-        project_name = first_project.name if first_project else ""
+        project_name = first_project_name()
         session["selected_project"] = project_name
 
         return render_template("landing.html")
@@ -149,15 +990,35 @@ def login():
     if request.method == "POST":
         username = request.form["username"]
         password = request.form["password"]
+        client_ip = request.remote_addr or ""
+
+        retry_after = login_limiter.retry_after(username, client_ip)
+        if retry_after:
+            flash(f"❌ Too many failed logins. Try again in {retry_after} seconds.", "danger")
+            return render_template("login.html"), 429, {"Retry-After": str(retry_after)}
 
         user = User.query.filter_by(username=username).first()
-        if user and check_password_hash(user.password, password):
+        try:
+            valid = password_hasher.verify(user.password if user else None, password)
+        except HasherBusy:
+            flash("Login is busy right now, please try again in a moment.", "warning")
+            return render_template("login.html"), 503, {"Retry-After": "2"}
+
+        if valid:
+            login_limiter.succeeded(username, client_ip)
+            if password_hasher.needs_rehash(user.password):
+                # Upgrade to the current hash parameters while the plain password is at hand
+                try:
+                    user.password = password_hasher.hash(password)
+                    db.session.commit()
+                except HasherBusy:
+                    pass
+
             session["username"] = username
             session["role"] = user.role or "User"
 
             # ✅ Find the first project name alphabetically
-            first_project = Project.query.order_by(Project.name).first()
-            project_name = first_project.name if first_project else ""
+            project_name = first_project_name()
 
             # ✅ Save in session
             session["selected_project"] = project_name
@@ -167,6 +1028,7 @@ def login():
             #return redirect(url_for("upload_file", project_name=project_name))
 
         else:
+            login_limiter.failed(username, client_ip)
             flash("❌ Invalid username or password!", "danger")
 
     return render_template("login.html")
@@ -185,9 +1047,9 @@ def upload_file():
         return redirect(url_for("login"))
 
     error_msg = None
-    uploaded_data = []
     columns = []
     grouped_data = []
+    searchable = False
 
     # ✅ Capture project_name from URL, form, or session
     project_name = request.args.get("project_name") or request.form.get("project_name") or session.get("selected_project")
@@ -197,117 +1059,241 @@ def upload_file():
         project_name = ""
     selected_project = session.get('selected_project')
     # ✅ Handle file upload if POST request
-    if request.method == "POST" and request.files.get("file"):
-        file = request.files.get("file")
+    files = [f for f in request.files.getlist("file") if f.filename] if request.method == "POST" else []
+    if files:
         email = session["username"]
-        table_name = safe_table_name(project_name)
 
-        try:
-            # Read Excel
-            df = pd.read_excel(file)
-            df.columns = df.columns.str.strip()
-            col_map = {col: safe_colname(col) for col in df.columns}
-            df.rename(columns=col_map, inplace=True)
-            df = df.where(pd.notnull(df), None)
-            df.dropna(how="all", inplace=True)
-            df.dropna(axis=1, how="all", inplace=True)
-            upload_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            file_name = file.filename
-
-            # Ensure table exists
-            base_cols = ["id INT AUTO_INCREMENT PRIMARY KEY",
-                         "uploaded_by VARCHAR(100)",
-                         "upload_time VARCHAR(20)",
-                         "file_name VARCHAR(255)"]
-            db.session.execute(text(f"CREATE TABLE IF NOT EXISTS `{table_name}` ({', '.join(base_cols)})"))
-            db.session.commit()
+        options = {
+            "on_duplicate": request.form.get("on_duplicate", "skip"),
+            "dedupe_rows": request.form.get("dedupe_rows") == "1",
+        }
+        if request.form.get("replace_file_name") and request.form.get("replace_upload_time"):
+            options["replace"] = [request.form["replace_file_name"], request.form["replace_upload_time"]]
 
-            # Ensure columns exist
-            insp = inspect(db.engine)
-            existing = {c["name"] for c in insp.get_columns(table_name)}
-            for col in df.columns:
-                if col not in existing and col not in {"id", "uploaded_by", "upload_time", "file_name"}:
-                    db.session.execute(text(f"ALTER TABLE `{table_name}` ADD COLUMN `{col}` TEXT"))
-                    db.session.commit()
-
-            # Insert rows
-            for row_dict in df.to_dict(orient="records"):
-                row_dict.update({
-                    "uploaded_by": email,
-                    "upload_time": upload_time,
-                    "file_name": file_name
-                })
-                cols = ", ".join(f"`{c}`" for c in row_dict.keys())
-                placeholders = ", ".join(f":{c}" for c in row_dict.keys())
-                stmt = text(f"INSERT INTO `{table_name}` ({cols}) VALUES ({placeholders})")
-                db.session.execute(stmt, row_dict)
-
-            db.session.commit()
-            flash(f"File '{file_name}' uploaded successfully into '{project_name}'!", "success")
+        try:
+            if options["on_duplicate"] not in ON_DUPLICATE_MODES:
+                raise ValueError(f"on_duplicate must be one of {', '.join(ON_DUPLICATE_MODES)}")
+            with instrumentation.stage("save_upload"):
+                job = enqueue_upload(files, project_name, email, options)
+            if request.accept_mimetypes.best == "application/json":
+                return jsonify(job.to_dict()), 202
+            flash(f"File '{job.file_name}' queued for upload into '{project_name}' (job {job.id}).", "info")
 
         except Exception as e:
             db.session.rollback()
             error_msg = str(e)
+            if request.accept_mimetypes.best == "application/json":
+                return jsonify({"error": error_msg}), 400
 
     # ✅ Always fetch data if project_name is set
     if project_name:
         try:
             table_name = safe_table_name(project_name)
-            insp = inspect(db.engine)
-            # ✅ Check if the table exists first
-            if table_name in insp.get_table_names():
-                table_cols = [c["name"] for c in insp.get_columns(table_name)]
-
-                if table_cols:
-                    rows = db.session.execute(
-                        text(f"SELECT * FROM `{table_name}` WHERE uploaded_by = :user"),
-                        {"user": session["username"]}
-                    ).mappings().all()
-                else:
-                    # Table exists but no columns yet (new empty table)
-                    table_cols = ["upload_time", "file_name"]
-                    rows = []
-            else:
-                table_cols = []
-                rows = []
-
-            uploaded_data = [dict(r) for r in rows]
-            meta_cols = ["upload_time", "file_name"]
-            data_cols = sorted([c for c in table_cols if c not in {"id", "uploaded_by", *meta_cols}])
-            columns = meta_cols + data_cols
-
-            grouped_rows = db.session.execute(text(f"""
-                SELECT uploaded_by, upload_time, file_name, COUNT(id) AS count
-                FROM `{table_name}`
-                WHERE uploaded_by = :user
-                GROUP BY uploaded_by, upload_time, file_name
-                ORDER BY upload_time DESC
-            """), {"user": session["username"]}).mappings().all()
-
-            grouped_data = []
-            for row in grouped_rows:
-                row_dict = dict(row)
-                row_dict["project_name"] = project_name
-                row_dict["table_name"] = table_name
-                grouped_data.append(row_dict)
+            # ✅ Rows are fetched page by page from /api/data; only the column list is needed here
+            with instrumentation.stage("columns"):
+                table_cols = schema_cache.columns(db.engine, table_name)
+                columns = display_columns(table_cols)
+                searchable = app.config["SEARCH_INDEX"] and SEARCH_COL in table_cols
+
+            # ✅ Upload summary comes from the batch ledger, O(batches) rather than O(rows)
+            with instrumentation.stage("batches"):
+                batches = (UploadBatch.query
+                           .filter_by(table_name=table_name, uploaded_by=session["username"])
+                           .order_by(UploadBatch.upload_time.desc())
+                           .all())
+
+            grouped_data = [{
+                "uploaded_by": b.uploaded_by,
+                "upload_time": b.upload_time,
+                "file_name": b.file_name,
+                "count": b.row_count,
+                "byte_size": b.byte_size,
+                "duration": b.duration,
+                "project_name": project_name,
+                "table_name": table_name,
+            } for b in batches]
         except Exception:
             pass
 
     # ✅ List all projects
-    projects_list = [p.name for p in Project.query.order_by(Project.name).all()]
+    projects_list = [p["name"] for p in all_projects()]
     selected_project = session.get("selected_project")  # removes it from session
-    return render_template(
-        "data.html",
-        email=session["username"],
-        uploaded_data=uploaded_data,
-        columns=columns,
-        grouped_data=grouped_data,
-        projects=projects_list,
-        error_msg=error_msg,
-        selected_project=selected_project
+    with instrumentation.stage("render"):
+        return render_template(
+            "data.html",
+            email=session["username"],
+            columns=columns,
+            grouped_data=grouped_data,
+            projects=projects_list,
+            error_msg=error_msg,
+            selected_project=selected_project,
+            searchable=searchable,
+            export_formats=available_formats()
+        )
+
+
+@app.route("/api/data/<project_name>")
+def project_data_api(project_name):
+    """
+    One keyset page of the user's rows in a project table.
+    Query args: columns=a,b  sort=<col>  order=asc|desc  limit=<n>  cursor=<next_cursor>
+    and per-column contains filters as f_<col>=<text>.
+    """
+    if "username" not in session:
+        return jsonify({"error": "Login required"}), 401
+
+    table_name = safe_table_name(project_name)
+    table_cols = schema_cache.columns(db.engine, table_name)
+    if not table_cols:
+        return jsonify({"columns": [], "rows": [], "next_cursor": None, "limit": 0})
+
+    # search_text is index fodder, never sent unless asked for
+    columns = ([c for c in request.args.get("columns", "").split(",") if c]
+               or [c for c in table_cols if c != SEARCH_COL])
+    filters = {k[2:]: v for k, v in request.args.items() if k.startswith("f_") and v}
+    try:
+        page = fetch_page(
+            db.session, table_name, table_cols, session["username"],
+            columns=columns,
+            sort=request.args.get("sort", "upload_time"),
+            desc=request.args.get("order", "desc").lower() != "asc",
+            filters=filters,
+            cursor=request.args.get("cursor"),
+            limit=request.args.get("limit", DEFAULT_PAGE_SIZE, type=int),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(page)
+
+
+@app.route("/api/search/<project_name>")
+def project_search_api(project_name):
+    """
+    Full-text search over the user's rows in a project table, best matches first, each
+    with the batch (file_name, upload_time) it came from.
+    Query args: q=<words> (all must match, as prefixes)  limit=<n>  offset=<next_offset>.
+    """
+    if "username" not in session:
+        return jsonify({"error": "Login required"}), 401
+    if not app.config["SEARCH_INDEX"]:
+        return jsonify({"error": "Search is not enabled"}), 404
+
+    table_name = safe_table_name(project_name)
+    table_cols = schema_cache.columns(db.engine, table_name)
+    if not table_cols:
+        return jsonify({"columns": [], "rows": [], "next_offset": None, "limit": 0})
+    if SEARCH_COL not in table_cols:
+        # Never built here: on MySQL adding the FULLTEXT index rebuilds the table
+        return jsonify({"error": "Search index not built for this project (flask build-search-index)"}), 409
+
+    try:
+        results = search_rows(
+            db.session, table_name, table_cols, session["username"],
+            columns=display_columns(table_cols),
+            query=request.args.get("q", ""),
+            limit=request.args.get("limit", DEFAULT_SEARCH_LIMIT, type=int),
+            offset=request.args.get("offset", 0, type=int),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(results)
+
+
+@app.route("/export/<project_name>")
+def export_project_data(project_name):
+    """
+    Stream the user's rows of a project (or of one upload batch when file_name and
+    upload_time are given) as csv, xlsx, parquet or arrow, reading through a server-side cursor.
+    """
+    if "username" not in session:
+        return redirect(url_for("login"))
+
+    fmt = request.args.get("format", "csv").lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unknown export format '{fmt}'"}), 400
+
+    table_name = safe_table_name(project_name)
+    table_cols = schema_cache.columns(db.engine, table_name)
+    if not table_cols:
+        return jsonify({"error": "Project has no data"}), 404
+
+    where = ["`uploaded_by` = :user"]
+    params = {"user": session["username"]}
+    file_name = request.args.get("file_name")
+    upload_time = request.args.get("upload_time")
+    download_name = table_name
+    if file_name and upload_time:
+        batch = UploadBatch.query.filter_by(
+            table_name=table_name, uploaded_by=session["username"],
+            file_name=file_name, upload_time=upload_time
+        ).first()
+        if not batch:
+            return jsonify({"error": "Upload batch not found"}), 404
+        where += ["`file_name` = :file_name", "`upload_time` = :upload_time"]
+        params.update(file_name=file_name, upload_time=upload_time)
+        download_name = f"{table_name}_{safe_colname(os.path.splitext(file_name)[0])}"
+
+    columns = display_columns(table_cols)
+    stmt = text(f"SELECT {', '.join(f'`{c}`' for c in columns)} FROM `{table_name}` WHERE {' AND '.join(where)}")
+
+    def chunks():
+        result = db.session.execute(
+            stmt, params, execution_options={"stream_results": True, "yield_per": DEFAULT_EXPORT_CHUNK}
+        )
+        for part in result.partitions():
+            yield [tuple(r) for r in part]
+
+    try:
+        body = iter_export(fmt, columns, chunks(), schema_cache.column_types(db.engine, table_name))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    mimetype, ext = EXPORT_FORMATS[fmt]
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{download_name}.{ext}"'}
     )
 
 
+@app.route("/data/jobs/<job_id>")
+def upload_job_status(job_id):
+    if "username" not in session:
+        return jsonify({"error": "Login required"}), 401
+
+    job = db.session.get(UploadJob, job_id)
+    if not job or job.uploaded_by != session["username"]:
+        return jsonify({"error": "Job not found"}), 404
+    if job.status in ("done", "failed"):
+        # The job may have changed the table's columns in another process or worker
+        schema_cache.invalidate(job.table_name)
+    return jsonify(job.to_dict())
+
+
+@app.route("/data/batches/delete", methods=["POST"])
+def delete_upload_batch_route():
+    """Queue deletion of one of the user's upload batches; poll /data/jobs/<job_id> for progress."""
+    if "username" not in session:
+        return jsonify({"error": "Login required"}), 401
+
+    project_name = request.form.get("project_name", "")
+    file_name = request.form.get("file_name", "")
+    upload_time = request.form.get("upload_time", "")
+    wants_json = request.accept_mimetypes.best == "application/json"
+    if not (project_name and file_name and upload_time):
+        if wants_json:
+            return jsonify({"error": "project_name, file_name and upload_time are required"}), 400
+        flash("Nothing to delete.", "warning")
+        return redirect(url_for("upload_file"))
+
+    job = enqueue_cleanup("delete_batch", project_name, session["username"],
+                          {"file_name": file_name, "upload_time": upload_time})
+    if wants_json:
+        return jsonify(job.to_dict()), 202
+    flash(f"Deleting '{file_name}' ({upload_time}) in the background (job {job.id}).", "info")
+    return redirect(url_for("upload_file", project_name=project_name))
+
+
 @app.route('/vms_demo')
 def vms_demo():
     return render_template('vms.html')
@@ -332,18 +1318,19 @@ def superadmin():
         if User.query.filter_by(username=username).first():
             flash("Username already exists", "warning")
         else:
-            hashed_pw = generate_password_hash(password)
+            try:
+                hashed_pw = password_hasher.hash(password)
+            except HasherBusy:
+                flash("Server busy, please try again.", "warning")
+                return redirect(url_for("superadmin"))
             new_user = User(username=username, password=hashed_pw, role=role)
             db.session.add(new_user)
             db.session.commit()
+            app_cache.invalidate("users")
             flash("User added successfully", "success")
 
     # Provide data to template similar to your Mongo shape (but without password)
-    all_users = [{"username": u.username, "role": u.role} for u in User.query.order_by(User.username).all()]
-    all_projects = [{"id": p.id, "name": p.name} for p in Project.query.order_by(Project.name).all()]
-    first_project = Project.query.order_by(Project.name).first()
-    first_project_name = first_project.name if first_project else ""
-    return render_template("admin.html", all_users=all_users, all_projects=all_projects, first_project_name=first_project_name) 
+    return render_template("admin.html", all_users=all_users(), all_projects=all_projects(), first_project_name=first_project_name())
 
 
 @app.route("/edit_user_role", methods=["POST"])
@@ -362,6 +1349,7 @@ def edit_user_role():
 
     user.role = new_role
     db.session.commit()
+    app_cache.invalidate("users")
     flash(f"Role for '{username}' updated to '{new_role}' successfully!", "success")
     return redirect(url_for("superadmin"))
 
@@ -380,7 +1368,11 @@ def edit_user_password():
         flash("User not found.", "danger")
         return redirect(request.referrer or url_for("upload_file"))
 
-    user.password = generate_password_hash(new_password)
+    try:
+        user.password = password_hasher.hash(new_password)
+    except HasherBusy:
+        flash("Server busy, please try again.", "warning")
+        return redirect(request.referrer or url_for("upload_file"))
     db.session.commit()
     flash(f"Password for '{username}' updated successfully!", "success")
     return redirect(request.referrer or url_for("upload_file"))
@@ -393,6 +1385,7 @@ def delete_user():
     if user:
         db.session.delete(user)
         db.session.commit()
+        app_cache.invalidate("users")
         flash(f"User '{username_to_delete}' deleted successfully!", "success")
     else:
         flash(f"User '{username_to_delete}' not found.", "danger")
@@ -409,19 +1402,11 @@ def add_project():
     new_project = Project(name=name)
     db.session.add(new_project)
     db.session.commit()
+    app_cache.invalidate("projects")
 
     # Create a dedicated table for this project
     table_name = safe_table_name(name)
-    create_sql = f"""
-        CREATE TABLE IF NOT EXISTS `{table_name}` (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            uploaded_by VARCHAR(100),
-            upload_time VARCHAR(20),
-            file_name VARCHAR(255)
-        )
-    """
-    db.session.execute(text(create_sql))
-    db.session.commit()
+    ensure_project_table(table_name)
 
     flash(f"Project '{name}' created with table '{table_name}'.", "success")
     return redirect(url_for("superadmin"))
@@ -448,11 +1433,18 @@ def edit_project():
     rename_sql = f"RENAME TABLE `{old_table}` TO `{new_table}`"
     db.session.execute(text(rename_sql))
 
+    # Keep the upload batch ledger pointing at the renamed table
+    UploadBatch.query.filter_by(table_name=old_table).update(
+        {"table_name": new_table, "project_name": new_name}, synchronize_session=False
+    )
+
     # ✅ Update all rows in excel_data where project_name = old_name
     update_sql = text("UPDATE excel_data SET project_name = :new_name WHERE project_name = :old_name")
     db.session.execute(update_sql, {"new_name": new_name, "old_name": old_name})
 
     db.session.commit()
+    schema_cache.invalidate(old_table, new_table)
+    app_cache.invalidate("projects")
     flash(f"Project '{old_name}' renamed to '{new_name}' and updated in excel_data.", "success")
     return redirect(url_for("superadmin"))
 
@@ -464,8 +1456,14 @@ def delete_project():
     if not proj:
         flash("Project not found.", "danger")
         return redirect(url_for("superadmin"))
+    project_name = proj.name
     db.session.delete(proj)
     db.session.commit()
+    app_cache.invalidate("projects")
+    # Drop the project's table and rows in the background rather than inside this request
+    if request.form.get("purge_data") == "1":
+        job = enqueue_cleanup("purge_project", project_name, session.get("username", ""))
+        flash(f"Project '{project_name}' deleted; its data is being purged (job {job.id}).", "success")
     return redirect(url_for("superadmin"))
 
 
@@ -502,20 +1500,28 @@ def add_visitor():
         "verified": False,
         "approved": None,
     }
+    visitor["email_status"] = "queued"
     mongo.db.visitors.insert_one(visitor)
+    record_visitor_rollup(None, visitor)
+    visitor_events.publish_local(visitor_delta(
+        "created", visitor["_id"], {k: v for k, v in visitor.items() if k in LIST_PROJECTION}
+    ))
 
-    # Send email notification
+    # Queue the approval email; the background sender records delivery on the visitor
     try:
         send_email_to_contact(visitor)
-        flash("Visitor saved and email sent successfully!", "success")
+        flash("Visitor saved and approval email queued.", "success")
     except Exception as e:
-        flash(f"Visitor saved but email failed: {str(e)}", "warning")
+        flash(f"Visitor saved but email could not be queued: {str(e)}", "warning")
 
-    flash("Visitor saved successfully!", "success")
     return redirect(url_for("vms"))
 
 
 def send_email_to_contact(visitor):
+    # Only the visitor-registration path builds mail; keep email.mime off worker boot
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
     contact_email = visitor.get("contact_email")
     contact_name = visitor.get("contact_person")
     visitor_id = str(visitor["_id"])
@@ -553,54 +1559,115 @@ def send_email_to_contact(visitor):
     message["Subject"] = subject
     message.attach(MIMEText(body, "html"))
 
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-        server.starttls()
-        server.login(SMTP_USERNAME, SMTP_PASSWORD)
-        server.sendmail(message["From"], contact_email, message.as_string())
+    return mail_queue.enqueue(message, contact_email, meta={"visitor_id": visitor_id})
 
 
 @app.route("/approve_visitor/<visitor_id>")
 def approve_visitor(visitor_id):
-    mongo.db.visitors.update_one(
-        {"_id": ObjectId(visitor_id)},
-        {"$set": {"approved": True}}
-    )
+    # A repeated click leaves approved_at, and so the rollup day, as it was
+    if update_visitor(visitor_id, {"approved": True, "approved_at": datetime.now()}, BULK_PRECONDITIONS["approve"][0]):
+        visitor_events.publish_local(visitor_delta("approved", visitor_id, {"approved": True}))
     return "Visitor approved ✅. Security can now check-in the visitor."
 
 
 @app.route("/decline_visitor/<visitor_id>")
 def decline_visitor(visitor_id):
-    mongo.db.visitors.update_one(
-        {"_id": ObjectId(visitor_id)},
-        {"$set": {"approved": False}}
-    )
+    if update_visitor(visitor_id, {"approved": False, "approved_at": datetime.now()}, BULK_PRECONDITIONS["decline"][0]):
+        visitor_events.publish_local(visitor_delta("declined", visitor_id, {"approved": False}))
     return "Visitor declined ❌. They will not be allowed to check-in."
 
 
 @app.route("/get_users/<dept>")
 def get_users(dept):
-    users = db.session.execute(
-        text("SELECT username, email FROM contact_person WHERE dept = :dept"),
-        {"dept": dept}
-    ).mappings().all()
-
-    # Return list of objects: name + email
-    return jsonify([{"username": u["username"], "email": u["email"]} for u in users])
+    # Return list of objects: name + email; clients revalidate with If-None-Match
+    resp = jsonify(contacts_for_dept(dept))
+    resp.set_etag(hashlib.md5(resp.get_data()).hexdigest())
+    resp.headers["Cache-Control"] = "private, max-age=60, must-revalidate"
+    return resp.make_conditional(request)
 
 
 @app.route("/visitors")
 def visitors_list():
-    all_visitors = list(mongo.db.visitors.find())
     user_role = session.get('role')  # Get role directly from session
-    return render_template("visitors_list.html", visitors=all_visitors, user_role=user_role)
+    try:
+        visitors, next_cursor = fetch_visitor_page(
+            mongo.db.visitors, request.args, request.args.get("limit", DEFAULT_VISITOR_PAGE, type=int)
+        )
+    except ValueError as e:
+        flash(str(e), "danger")
+        visitors, next_cursor = [], None
+    filters = {k: v for k, v in request.args.items() if k not in ("cursor", "limit") and v}
+    return render_template("visitors_list.html", visitors=visitors, user_role=user_role,
+                           next_cursor=next_cursor, filters=filters, statuses=list(STATUS_FILTERS))
 
 
 @app.route("/api/visitors")
 def visitors_api():
-    visitors = list(mongo.db.visitors.find())
+    """
+    One page of visitors (list fields only). Filters: status, from, to, date_field,
+    contact_person, sort; pass the X-Next-Cursor header back as ?cursor= for the next page.
+    """
+    try:
+        visitors, next_cursor = fetch_visitor_page(
+            mongo.db.visitors, request.args, request.args.get("limit", DEFAULT_VISITOR_PAGE, type=int)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     for v in visitors:
         v["_id"] = str(v["_id"])
-    return jsonify(visitors)
+    response = jsonify(visitors)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+
+@app.route("/visitors/stream")
+def visitors_stream():
+    """Server-Sent Events with per-visitor deltas for the security desk screens."""
+    if "username" not in session:
+        return jsonify({"error": "Login required"}), 401
+    return Response(
+        stream_with_context(visitor_events.stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.route("/api/visitors/analytics")
+def visitor_analytics():
+    """
+    Registrations, decisions, visits and average dwell time from the daily rollup.
+    Query args: from/to (YYYY-MM-DD, default the last 30 days), group_by=location|contact_person,
+    per_day=0 for one row per group over the whole range.
+    """
+    if "username" not in session:
+        return jsonify({"error": "Login required"}), 401
+    try:
+        date_from, date_to = parse_range(request.args)
+        rows = traffic(mongo.db[ROLLUP_COLLECTION], date_from, date_to, request.args.get("group_by"),
+                       per_day=request.args.get("per_day", "1") != "0")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"from": date_from, "to": date_to, "rows": rows})
+
+
+@app.route("/api/visitors/on-site")
+def visitors_on_site():
+    """Who is on site now: open check-ins (index-served) with a per-location count."""
+    if "username" not in session:
+        return jsonify({"error": "Login required"}), 401
+    limit = min(max(request.args.get("limit", DEFAULT_ON_SITE_LIMIT, type=int), 1), DEFAULT_ON_SITE_LIMIT * 5)
+    result = on_site_now(mongo.db.visitors, limit)
+    for v in result["visitors"]:
+        v["_id"] = str(v["_id"])
+    return jsonify(result)
+
+
+def visitor_not_updated(visitor_id, reason):
+    """Response for a check-in/out whose precondition did not match: 404 if missing, else 409."""
+    if not mongo.db.visitors.count_documents({"_id": ObjectId(visitor_id)}, limit=1):
+        return jsonify({"success": False, "message": "Visitor not found"}), 404
+    return jsonify({"success": False, "message": reason}), 409
 
 
 @app.route("/checkin/<visitor_id>", methods=["POST"])
@@ -611,14 +1678,16 @@ def checkin(visitor_id):
     if not badge:
         return jsonify({"success": False, "message": "Badge number required"}), 400
 
-    mongo.db.visitors.update_one(
-        {"_id": ObjectId(visitor_id)},
-        {"$set": {
-            "check_in": datetime.now(),
-            "badge_number": badge,
-            "verified": True
-        }}
-    )
+    fields = {
+        "check_in": datetime.now(),
+        "badge_number": badge,
+        "verified": True
+    }
+    # Never overwrite an earlier check-in; same rule as the bulk endpoint
+    precondition, skipped = BULK_PRECONDITIONS["checkin"]
+    if not update_visitor(visitor_id, fields, precondition):
+        return visitor_not_updated(visitor_id, skipped)
+    visitor_events.publish_local(visitor_delta("checked_in", visitor_id, fields))
 
     return jsonify({"success": True, "message": "Visitor checked in successfully"})
 
@@ -628,16 +1697,209 @@ def checkout(visitor_id):
     data = request.get_json()
     remarks = data.get("remarks", "")
 
-    mongo.db.visitors.update_one(
-        {"_id": ObjectId(visitor_id)},
-        {"$set": {
-            "check_out": datetime.now(),
-            "remarks": remarks
-        }}
-    )
+    fields = {
+        "check_out": datetime.now(),
+        "remarks": remarks
+    }
+    precondition, skipped = BULK_PRECONDITIONS["checkout"]
+    if not update_visitor(visitor_id, fields, precondition):
+        return visitor_not_updated(visitor_id, skipped)
+    visitor_events.publish_local(visitor_delta("checked_out", visitor_id, fields))
 
     return jsonify({"success": True, "message": "Visitor checked out successfully"})
 
 
+@app.route("/visitors/bulk/<action>", methods=["POST"])
+def bulk_visitors(action):
+    """
+    Check in, check out, approve or decline a group of visitors with one bulk_write.
+    Body: {"visitors": [{"id", "badge"}]} for checkin, [{"id", "remarks"}] for checkout,
+    ids (or {"id"}) for approve/decline. Returns a result per id, in request order.
+    """
+    if action not in BULK_ACTIONS:
+        return jsonify({"success": False, "message": f"Unknown action '{action}'"}), 404
+    if "username" not in session:
+        return jsonify({"success": False, "message": "Login required"}), 401
+    try:
+        items = parse_bulk_items(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    now = datetime.now()
+    # MongoDB stores milliseconds; the matched re-read below looks for this exact timestamp
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    precondition, skipped = BULK_PRECONDITIONS[action]
+    results = [{"id": str(item["id"]), "success": False} for item in items]
+    pending = {}  # ObjectId -> (result index, fields)
+    for i, item in enumerate(items):
+        try:
+            oid = ObjectId(item["id"])
+            if oid in pending:
+                raise ValueError("Duplicate visitor id")
+            pending[oid] = (i, bulk_fields(action, item, now))
+        except (InvalidId, TypeError):
+            results[i]["message"] = "Invalid visitor id"
+        except ValueError as e:
+            results[i]["message"] = str(e)
+
+    # One read for the rollup's pre-images, one write for every update
+    before = {d["_id"]: d for d in mongo.db.visitors.find({"_id": {"$in": list(pending)}}, ROLLUP_PROJECTION)}
+    ops, applied = [], []
+    for oid, (i, fields) in pending.items():
+        if oid not in before:
+            results[i]["message"] = "Visitor not found"
+            continue
+        ops.append(UpdateOne({"_id": oid, **precondition}, {"$set": fields}))
+        applied.append(oid)
+
+    failed, matched = {}, len(ops)
+    if ops:
+        try:
+            matched = mongo.db.visitors.bulk_write(ops, ordered=False).matched_count
+        except BulkWriteError as e:
+            failed = {err["index"]: err.get("errmsg", "Update failed") for err in e.details.get("writeErrors", [])}
+            matched = e.details.get("nMatched", 0)
+    # Some filters matched nothing (state changed since the read): find the updates that landed
+    written = set(applied)
+    if matched < len(ops) - len(failed):
+        written = {d["_id"] for d in mongo.db.visitors.find(
+            {"_id": {"$in": applied}, BULK_STAMPS[action]: now}, {"_id": 1})}
+
+    changes = []
+    for n, oid in enumerate(applied):
+        i, fields = pending[oid]
+        if n in failed:
+            results[i]["message"] = failed[n]
+            continue
+        if oid not in written:
+            results[i]["message"] = skipped
+            continue
+        results[i].update(success=True, message="OK")
+        changes.append((before[oid], rollup_deltas(before[oid], fields, now)))
+        visitor_events.publish_local(visitor_delta(BULK_ACTIONS[action], oid, fields))
+    try:
+        apply_rollups(mongo.db[ROLLUP_COLLECTION], changes)
+    except Exception:
+        app.logger.exception("Could not update the visitor rollup")
+
+    return jsonify({
+        "success": all(r["success"] for r in results),
+        "updated": len(changes),
+        "results": results,
+    })
+
+
+# --- CLI ---
+@app.cli.command("init-db")
+def init_db():
+    """Create any missing application tables and add columns introduced since they were created."""
+    db.create_all()
+    insp = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {c["name"] for c in insp.get_columns(table.name)}
+        missing = [c for c in table.columns if c.name not in existing]
+        if missing:
+            alter_table(db.session, table.name,
+                        [f"ADD COLUMN `{c.name}` {c.type.compile(dialect=db.engine.dialect)}" for c in missing])
+            db.session.commit()
+            print(f"{table.name}: added {', '.join(c.name for c in missing)}")
+        existing_indexes = {ix["name"] for ix in insp.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(db.engine)
+                print(f"{table.name}: added index {index.name}")
+    print("Tables created.")
+
+
+@app.cli.command("add-project-indexes")
+def add_project_indexes():
+    """Add the grid/batch indexes to project tables created before they existed."""
+    for project in Project.query.order_by(Project.name).all():
+        table_name = safe_table_name(project.name)
+        if not schema_cache.has_table(db.engine, table_name):
+            continue
+        existing = {ix["name"] for ix in inspect(db.engine).get_indexes(table_name)}
+        missing = [ix for ix in PROJECT_INDEXES if ix.split("`")[1] not in existing]
+        if missing:
+            clauses = ", ".join(f"ADD {ix}" for ix in missing)
+            db.session.execute(text(f"ALTER TABLE `{table_name}` {clauses}"))
+            db.session.commit()
+            print(f"{table_name}: added {len(missing)} index(es)")
+
+
+@app.cli.command("backfill-upload-batches")
+def backfill_upload_batches():
+    """Build upload_batches entries for project data ingested before the ledger existed."""
+    for project in Project.query.order_by(Project.name).all():
+        table_name = safe_table_name(project.name)
+        if not schema_cache.has_table(db.engine, table_name):
+            continue
+        known = {(b.uploaded_by, b.upload_time, b.file_name)
+                 for b in UploadBatch.query.filter_by(table_name=table_name).all()}
+        rows = db.session.execute(text(f"""
+            SELECT uploaded_by, upload_time, file_name, COUNT(id) AS count
+            FROM `{table_name}`
+            GROUP BY uploaded_by, upload_time, file_name
+        """)).mappings().all()
+        added = 0
+        for row in rows:
+            if (row["uploaded_by"], row["upload_time"], row["file_name"]) in known:
+                continue
+            db.session.add(UploadBatch(
+                project_name=project.name,
+                table_name=table_name,
+                uploaded_by=row["uploaded_by"] or "",
+                file_name=row["file_name"] or "",
+                upload_time=row["upload_time"] or "",
+                row_count=row["count"],
+            ))
+            added += 1
+        db.session.commit()
+        print(f"{table_name}: {added} batch(es) backfilled")
+
+
+@app.cli.command("build-assets")
+def build_static_assets():
+    """Write fingerprinted, precompressed copies of static/ to static/dist and its manifest."""
+    manifest = build_assets(app.static_folder)
+    compressed = sum(1 for entry in manifest.values() if entry["encodings"])
+    resized = sum(1 for entry in manifest.values() if entry["srcset"])
+    print(f"{len(manifest)} asset(s) fingerprinted, {compressed} precompressed, {resized} with resized variants")
+
+
+@app.cli.command("build-search-index")
+def build_search_index():
+    """Add the full-text index to project tables and fill search_text for rows stored before it."""
+    for project in Project.query.order_by(Project.name).all():
+        table_name = safe_table_name(project.name)
+        if not schema_cache.has_table(db.engine, table_name):
+            continue
+        ensure_search_column(db.session, schema_cache, table_name)
+        data_cols = [c for c in schema_cache.columns(db.engine, table_name) if c not in PROJECT_META_COLS]
+        filled = backfill_search_text(db.engine, table_name, data_cols)
+        print(f"{table_name}: search_text filled for {filled} row(s)")
+
+
+@app.cli.command("rebuild-visitor-rollup")
+def rebuild_visitor_rollup():
+    """Recompute the visitor_daily analytics rollup from the visitors collection."""
+    count = rebuild_rollup(mongo.db.visitors, mongo.db[ROLLUP_COLLECTION])
+    print(f"{ROLLUP_COLLECTION}: {count} rollup document(s)")
+
+
+@app.cli.command("upload-worker")
+def upload_worker():
+    """Run queued upload, batch-delete and purge jobs (for UPLOAD_JOB_EXECUTOR=external)."""
+    print("Upload worker started.")
+    while True:
+        job_id = claim_next_job()
+        if job_id:
+            run_job(job_id)
+        else:
+            db.session.remove()
+            time.sleep(1)
+
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Development server only; production runs under gunicorn (see wsgi.py)
+    app.run(debug=app.config["APP_ENV"] != "production")
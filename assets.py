@@ -0,0 +1,209 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+from urllib.parse import quote, unquote
+
+
+# --- Settings ---
+DIST_DIR = "dist"  # under the static folder; rebuilt from scratch by build_assets
+MANIFEST_NAME = "manifest.json"
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+HASH_LENGTH = 12
+# Text assets get .gz (and .br when the optional brotli package is installed) next to them
+PRECOMPRESS_EXTS = {".css", ".js", ".svg", ".json", ".txt", ".map"}
+PRECOMPRESS_MIN_SIZE = 256
+# Landing tiles render at 60px and 120px wide (global.css); 1x and 2x of both
+RESPONSIVE_DIRS = ("images/",)
+RESPONSIVE_EXTS = {".png", ".jpg", ".jpeg"}
+RESPONSIVE_WIDTHS = (60, 120, 240)
+
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+# --- Build ---
+def _fingerprinted(rel_path: str, digest: str, suffix="") -> str:
+    stem, ext = os.path.splitext(rel_path)
+    return f"{DIST_DIR}/{stem}.{digest}{suffix}{ext}"
+
+
+def _write(static_dir, rel_path, data: bytes):
+    path = os.path.join(static_dir, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as fh:
+        fh.write(data)
+
+
+def _precompress(static_dir, rel_path, data: bytes) -> list:
+    """Write .gz/.br siblings when they are actually smaller; returns the encodings written."""
+    encodings = []
+    # mtime=0 keeps the .gz byte-identical across builds
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        _write(static_dir, rel_path + ".gz", gz)
+        encodings.append("gzip")
+    try:
+        import brotli
+    except ImportError:
+        return encodings
+    br = brotli.compress(data, quality=11)
+    if len(br) < len(data):
+        _write(static_dir, rel_path + ".br", br)
+        encodings.append("br")
+    return encodings
+
+
+def _resize_variants(static_dir, rel_path, source_path, digest) -> list:
+    """[(width, dist path)] of downscaled copies, plus the original's width; [] without Pillow."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return []
+    variants = []
+    with Image.open(source_path) as image:
+        for width in RESPONSIVE_WIDTHS:
+            if width >= image.width:
+                break
+            height = max(1, round(image.height * width / image.width))
+            out = _fingerprinted(rel_path, digest, f".{width}w")
+            path = os.path.join(static_dir, out)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            resized = image.resize((width, height), Image.LANCZOS)
+            resized.save(path, optimize=True, **({"quality": 85} if image.format == "JPEG" else {}))
+            variants.append((width, out))
+        variants.append((image.width, _fingerprinted(rel_path, digest)))
+    return variants
+
+
+def _rewrite_css_urls(css: str, css_path: str, manifest: dict) -> str:
+    """Point url(...) references at the fingerprinted files (built before any stylesheet)."""
+    def replace(match):
+        url = match.group(2)
+        if url.startswith(("data:", "http:", "https:", "//", "#")):
+            return match.group(0)
+        path = unquote(url.split("?")[0].split("#")[0])
+        if path.startswith("/static/"):
+            rel = path[len("/static/"):]
+        else:
+            rel = os.path.normpath(os.path.join(os.path.dirname(css_path), path)).replace(os.sep, "/")
+        entry = manifest.get(rel)
+        return f'url("/static/{quote(entry["path"])}")' if entry else match.group(0)
+    return _CSS_URL.sub(replace, css)
+
+
+def build_assets(static_dir) -> dict:
+    """
+    Copy every static file to dist/ under a content-hashed name, with precompressed
+    siblings for text assets and resized variants for images, and write the manifest
+    ({source path: {"path", "encodings", "srcset"}}). Stylesheets go last so their
+    url(...) references can be rewritten to the fingerprinted images first.
+    """
+    dist = os.path.join(static_dir, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+    sources = []
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != dist)
+        for name in sorted(files):
+            rel = os.path.relpath(os.path.join(root, name), static_dir).replace(os.sep, "/")
+            sources.append(rel)
+    sources.sort(key=lambda rel: rel.endswith(".css"))
+
+    manifest = {}
+    for rel in sources:
+        source_path = os.path.join(static_dir, rel)
+        ext = os.path.splitext(rel)[1].lower()
+        with open(source_path, "rb") as fh:
+            data = fh.read()
+        if ext == ".css":
+            data = _rewrite_css_urls(data.decode("utf-8"), rel, manifest).encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+        out = _fingerprinted(rel, digest)
+        _write(static_dir, out, data)
+        entry = {"path": out, "encodings": [], "srcset": []}
+        if ext in PRECOMPRESS_EXTS and len(data) >= PRECOMPRESS_MIN_SIZE:
+            entry["encodings"] = _precompress(static_dir, out, data)
+        if ext in RESPONSIVE_EXTS and rel.startswith(RESPONSIVE_DIRS):
+            entry["srcset"] = _resize_variants(static_dir, rel, source_path, digest)
+        manifest[rel] = entry
+
+    with open(os.path.join(dist, MANIFEST_NAME), "w") as fh:
+        json.dump(manifest, fh, indent=1, sort_keys=True)
+    return manifest
+
+
+# --- Serving ---
+class StaticAssets:
+    """
+    Serves the build_assets output: url_for('static', ...) resolves to the fingerprinted
+    file, which goes out with a year-long immutable Cache-Control and, when the client
+    accepts it, its precompressed .br/.gz. Without a manifest (nothing built, or disabled)
+    static files are served exactly as before.
+    """
+
+    def __init__(self, static_dir, enabled=True):
+        self.static_dir = static_dir
+        self.manifest = {}
+        self._encodings = {}  # dist path -> precompressed encodings
+        if enabled:
+            self.load()
+
+    def load(self):
+        try:
+            with open(os.path.join(self.static_dir, DIST_DIR, MANIFEST_NAME)) as fh:
+                self.manifest = json.load(fh)
+        except FileNotFoundError:
+            self.manifest = {}
+        self._encodings = {}
+        for entry in self.manifest.values():
+            self._encodings[entry["path"]] = entry["encodings"]
+            for _, variant in entry["srcset"]:
+                self._encodings.setdefault(variant, [])
+
+    def path(self, filename: str) -> str:
+        entry = self.manifest.get(filename)
+        return entry["path"] if entry else filename
+
+    def srcset(self, filename: str, url_for) -> str:
+        """`srcset` value for an image with resized variants; "" when it has none."""
+        entry = self.manifest.get(filename)
+        if not entry or len(entry["srcset"]) < 2:
+            return ""
+        return ", ".join(f"{url_for('static', filename=variant)} {width}w" for width, variant in entry["srcset"])
+
+    def is_fingerprinted(self, filename: str) -> bool:
+        return filename in self._encodings
+
+    # --- Flask ---
+    def init_app(self, app):
+        from flask import request, send_from_directory, url_for
+
+        default_view = app.view_functions["static"]
+
+        @app.url_defaults
+        def _fingerprint_static_urls(endpoint, values):
+            if endpoint == "static" and "filename" in values and self.manifest:
+                values["filename"] = self.path(values["filename"])
+
+        def send_static(filename):
+            if not self.is_fingerprinted(filename):
+                return default_view(filename=filename)
+            encoding = next((e for e in ("br", "gzip") if e in self._encodings[filename]
+                             and request.accept_encodings[e]), None)
+            response = send_from_directory(
+                self.static_dir, filename + {"br": ".br", "gzip": ".gz"}.get(encoding, ""),
+                mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+                max_age=IMMUTABLE_MAX_AGE,
+            )
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+            if self._encodings[filename]:
+                response.vary.add("Accept-Encoding")
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+            return response
+
+        app.view_functions["static"] = send_static
+        app.jinja_env.globals["static_srcset"] = lambda filename: self.srcset(filename, url_for)
@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+# --- Settings ---
+DEFAULT_HASH_METHOD = "scrypt:32768:8:1"   # werkzeug's default; pbkdf2 e.g. "pbkdf2:sha256:600000"
+DEFAULT_HASH_WORKERS = 2
+DEFAULT_HASH_QUEUE = 16
+DEFAULT_HASH_TIMEOUT = 10.0
+DEFAULT_MAX_ATTEMPTS = 10                  # failed logins per username per window
+DEFAULT_MAX_ATTEMPTS_PER_IP = 50
+DEFAULT_WINDOW = 300
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing queue is full; the caller should answer 503."""
+
+
+class PasswordHasher:
+    """
+    Password hashing on a small dedicated pool. scrypt and pbkdf2 release the GIL, so
+    `workers` caps how many cores hashing can take per process, and at most `queue`
+    more callers wait for a slot; beyond that HasherBusy is raised at once instead of
+    tying up another request thread.
+    """
+
+    def __init__(self, method=DEFAULT_HASH_METHOD, workers=DEFAULT_HASH_WORKERS,
+                 queue=DEFAULT_HASH_QUEUE, timeout=DEFAULT_HASH_TIMEOUT):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._prefix = None
+        self._dummy = None
+
+    def _pool(self):
+        # Created lazily and per process, so forked workers never share one
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hash")
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy("Too many password checks in progress")
+        try:
+            future = self._pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is freed when the hash is done, not when the caller stops waiting:
+        # a timed-out hash still occupies a worker and must still count against the cap
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            future.cancel()  # frees the slot at once if it never started
+            raise HasherBusy("Password check timed out")
+
+    def hash(self, password) -> str:
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored, password) -> bool:
+        """
+        Check a password against a stored hash. Unknown users and password-less (SSO)
+        accounts are checked against a dummy hash, so they take as long as real ones.
+        """
+        if not stored:
+            if self._dummy is None:
+                self._dummy = self.hash(os.urandom(16).hex())
+            self._run(check_password_hash, self._dummy, password)
+            return False
+        return self._run(check_password_hash, stored, password)
+
+    def needs_rehash(self, stored) -> bool:
+        """True when `stored` was made with other parameters than the current method."""
+        if not stored:
+            return False
+        if self._prefix is None:
+            # Let werkzeug fill in defaults (e.g. "pbkdf2" -> "pbkdf2:sha256:600000")
+            self._prefix = generate_password_hash("", self.method).split("$", 1)[0]
+        return stored.split("$", 1)[0] != self._prefix
+
+
+class LoginRateLimiter:
+    """
+    Failed-login counters per username and per client IP in fixed windows, kept in a
+    cache backend (see cache.make_backend) so a shared backend limits across workers.
+    """
+
+    def __init__(self, backend, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 max_attempts_per_ip=DEFAULT_MAX_ATTEMPTS_PER_IP, window=DEFAULT_WINDOW):
+        self.backend = backend
+        self.max_attempts = max_attempts
+        self.max_attempts_per_ip = max_attempts_per_ip
+        self.window = window
+
+    def _keys(self, username, ip):
+        bucket = int(time.time() // self.window)
+        return [(f"login:user:{username.lower()}:{bucket}", self.max_attempts),
+                (f"login:ip:{ip}:{bucket}", self.max_attempts_per_ip)]
+
+    def retry_after(self, username, ip) -> int:
+        """Seconds until another attempt is allowed; 0 when not limited."""
+        for key, limit in self._keys(username, ip):
+            if (self.backend.get(key) or 0) >= limit:
+                return int(self.window - time.time() % self.window) + 1
+        return 0
+
+    def failed(self, username, ip):
+        # get + set is not atomic; an occasional lost increment is acceptable here
+        for key, _ in self._keys(username, ip):
+            self.backend.set(key, (self.backend.get(key) or 0) + 1, self.window)
+
+    def succeeded(self, username, ip):
+        self.backend.delete(self._keys(username, ip)[0][0])
@@ -0,0 +1,116 @@
+"""
+Search latency on a large project table: the full-text index (search.search_rows)
+against the LIKE scan over every data column a search would need without it.
+
+Rows are synthetic (a few text columns drawn from a small vocabulary plus numbers and
+dates) and are written through ingest.bulk_insert with their search_text, the way the
+upload path writes them. By default the table lives in a throwaway SQLite file (FTS5);
+point --db-url at a local MySQL container for the FULLTEXT index.
+
+    python benchmarks/full_text_search.py --rows 1000000 --query invoice --query "berlin 2024"
+    python benchmarks/full_text_search.py --db-url mysql+pymysql://root:pw@127.0.0.1/bench --rows 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from ingest import bulk_insert  # noqa: E402
+from schema import SchemaCache  # noqa: E402
+from search import SEARCH_COL, ensure_search_column, search_rows, search_terms, with_search_documents  # noqa: E402
+
+TABLE = "bench_search"
+USER = "bench@example.com"
+DATA_COLS = ["customer", "city", "item", "note", "amount", "booked"]
+WORDS = {
+    "customer": ["acme", "globex", "initech", "umbrella", "hooli", "stark", "wayne", "wonka"],
+    "city": ["berlin", "paris", "madrid", "oslo", "vienna", "prague", "lisbon", "dublin"],
+    "item": ["invoice", "receipt", "credit note", "order", "quote", "refund"],
+    "note": ["urgent", "paid", "overdue", "pending review", "escalated", "archived", "", ""],
+}
+
+
+def make_rows(count, seed=11):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield (rng.choice(WORDS["customer"]) + f" {i % 5000}", rng.choice(WORDS["city"]),
+               rng.choice(WORDS["item"]), rng.choice(WORDS["note"]) or None,
+               round(rng.random() * 10000, 2), f"20{rng.randint(20, 25)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+               USER, "2025-01-01 00:00:00", f"batch_{i // 50000}.xlsx")
+
+
+def load(engine, rows, batch_size):
+    cache = SchemaCache(0)
+    sqlite = engine.dialect.name == "sqlite"
+    with Session(engine) as session:
+        for name in (f"{TABLE}_fts", TABLE):
+            session.execute(text(f"DROP TABLE IF EXISTS `{name}`"))
+        pk = "id INTEGER PRIMARY KEY AUTOINCREMENT" if sqlite else "id INT AUTO_INCREMENT PRIMARY KEY"
+        cols = ", ".join(f"`{c}` TEXT" for c in DATA_COLS)
+        session.execute(text(f"CREATE TABLE `{TABLE}` ({pk}, {cols}, uploaded_by VARCHAR(100), "
+                             f"upload_time VARCHAR(20), file_name VARCHAR(255))"))
+        session.commit()
+        ensure_search_column(session, cache, TABLE)
+        insert_cols = DATA_COLS + ["uploaded_by", "upload_time", "file_name", SEARCH_COL]
+        started = time.perf_counter()
+        bulk_insert(session, TABLE, insert_cols, with_search_documents(make_rows(rows), len(DATA_COLS)), batch_size)
+        session.commit()
+        return time.perf_counter() - started, cache.columns(engine, TABLE)
+
+
+def like_scan(session, terms, limit):
+    """
+    Every term somewhere in the row: what a search costs without the index. Unranked, so
+    it stops at the first `limit` hits in id order when a term is common.
+    """
+    where, params = ["`uploaded_by` = :user"], {"user": USER, "limit": limit}
+    for i, term in enumerate(terms):
+        where.append("(" + " OR ".join(f"COALESCE(`{c}`, '') LIKE :t{i}" for c in DATA_COLS) + ")")
+        params[f"t{i}"] = f"%{term}%"
+    sql = f"SELECT `id` FROM `{TABLE}` WHERE {' AND '.join(where)} ORDER BY `id` DESC LIMIT :limit"
+    return session.execute(text(sql), params).all()
+
+
+def timed(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", help="default: a temporary SQLite file")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--query", action="append", help="search text (repeatable)")
+    args = parser.parse_args()
+
+    engine = create_engine(args.db_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'search.db')}")
+    load_s, table_cols = load(engine, args.rows, args.batch_size)
+    print(f"{args.rows} rows loaded with search_text in {load_s:.1f}s ({args.rows / load_s:,.0f} rows/s)")
+
+    print(f"\n{'query':<24} {'matches':>8} {'index ms':>9} {'LIKE ms':>9} {'x':>7}")
+    with Session(engine) as session:
+        for query in args.query or ["invoice", "berlin overdue", "wonka 42", "zzz"]:
+            results = search_rows(session, TABLE, table_cols, USER, DATA_COLS, query, args.limit)
+            indexed = timed(lambda: search_rows(session, TABLE, table_cols, USER, DATA_COLS, query, args.limit),
+                            args.iterations)
+            scanned = timed(lambda: like_scan(session, search_terms(query), args.limit), args.iterations)
+            print(f"{query:<24} {len(results['rows']):>8} {indexed:>9.1f} {scanned:>9.1f} "
+                  f"{scanned / indexed if indexed else 0:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
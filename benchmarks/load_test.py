@@ -0,0 +1,134 @@
+"""
+Throughput of the production profile as the gunicorn worker count grows.
+
+For each worker count, starts `gunicorn -c gunicorn.conf.py wsgi:application`, logs in,
+drives the given paths from a pool of client threads for a fixed time and reports
+requests/sec and latency percentiles. Needs gunicorn, a reachable MySQL/MongoDB
+(config.py) and a user that can log in.
+
+    python benchmarks/load_test.py --workers 1,2,4,8 --threads 8 --concurrency 64 \\
+        --user admin --password secret --path /data --path /api/visitors
+
+Use --url to load an already running server instead (the worker sweep is skipped).
+"""
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url + "/login", timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start within {timeout}s")
+
+
+def run_load(url, paths, concurrency, duration, user=None, password=None):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(n):
+        http = requests.Session()
+        if user:
+            http.post(url + "/login", data={"username": user, "password": password})
+        i = n
+        while time.monotonic() < stop_at:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                ok = http.get(url + path, timeout=30).status_code < 400
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.monotonic() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / wall,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": (statistics.mean(latencies) if latencies else 0) * 1000,
+    }
+
+
+def start_server(workers, threads, port):
+    env = dict(os.environ, APP_ENV="production", GUNICORN_WORKERS=str(workers),
+               GUNICORN_THREADS=str(threads), GUNICORN_BIND=f"127.0.0.1:{port}",
+               GUNICORN_ACCESSLOG="")
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:application"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated gunicorn worker counts")
+    parser.add_argument("--threads", type=int, default=8, help="gthread threads per worker")
+    parser.add_argument("--concurrency", type=int, default=32, help="client threads")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per run")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds of unmeasured load per run")
+    parser.add_argument("--path", action="append", dest="paths", help="path to request (repeatable)")
+    parser.add_argument("--user")
+    parser.add_argument("--password")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--url", help="benchmark a running server instead of starting gunicorn")
+    args = parser.parse_args()
+    paths = args.paths or ["/login"]
+
+    runs = [(None, args.url)] if args.url else [
+        (int(w), f"http://127.0.0.1:{args.port}") for w in args.workers.split(",")
+    ]
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for workers, url in runs:
+        proc = start_server(workers, args.threads, args.port) if workers else None
+        try:
+            wait_until_up(url)
+            if args.warmup:
+                run_load(url, paths, args.concurrency, args.warmup, args.user, args.password)
+            r = run_load(url, paths, args.concurrency, args.duration, args.user, args.password)
+        finally:
+            if proc:
+                proc.send_signal(signal.SIGTERM)
+                proc.wait(timeout=30)
+        print(f"{workers or '-':>7} {r['rps']:>9.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+              f"{r['p99_ms']:>8.1f} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
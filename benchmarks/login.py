@@ -0,0 +1,71 @@
+"""
+Logins per second per core for candidate password-hash parameters.
+
+For each method, verifies a stored hash in a loop on one thread (one core's worth,
+since scrypt/pbkdf2 hold a core while they run), then through auth.PasswordHasher
+with 1..N pool workers to show how far hashing scales before it takes the whole box.
+Use the numbers to size PASSWORD_HASH_METHOD and PASSWORD_HASH_WORKERS for the
+expected login burst.
+
+    python benchmarks/login.py --method scrypt:32768:8:1 --method pbkdf2:sha256:600000 --workers 1,2,4
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from auth import PasswordHasher, DEFAULT_HASH_METHOD  # noqa: E402
+from werkzeug.security import check_password_hash, generate_password_hash  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+
+
+def single_core_rate(stored, duration):
+    count, started = 0, time.perf_counter()
+    while time.perf_counter() - started < duration:
+        check_password_hash(stored, PASSWORD)
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def pooled_rate(method, stored, workers, clients, duration):
+    """Logins/s with `clients` concurrent callers going through a `workers`-sized PasswordHasher."""
+    hasher = PasswordHasher(method, workers=workers, queue=clients)
+    stop_at = time.monotonic() + duration
+
+    def client():
+        n = 0
+        while time.monotonic() < stop_at:
+            hasher.verify(stored, PASSWORD)
+            n += 1
+        return n
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        total = sum(pool.map(lambda _: client(), range(clients)))
+    return total / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--method", action="append", dest="methods", help="werkzeug hash method (repeatable)")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated PasswordHasher pool sizes")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent login attempts")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per measurement")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'method':<26} {'workers':>7} {'logins/s':>10} {'per core':>9} {'ms/login':>9}")
+    for method in args.methods or [DEFAULT_HASH_METHOD]:
+        stored = generate_password_hash(PASSWORD, method)
+        rate = single_core_rate(stored, args.duration)
+        print(f"{method:<26} {'1 core':>7} {rate:>10.1f} {rate:>9.1f} {1000 / rate:>9.1f}")
+        for workers in (int(w) for w in args.workers.split(",")):
+            rate = pooled_rate(method, stored, workers, args.clients, args.duration)
+            print(f"{method:<26} {workers:>7} {rate:>10.1f} {rate / min(workers, os.cpu_count() or 1):>9.1f} {'-':>9}")
+
+
+if __name__ == "__main__":
+    main()
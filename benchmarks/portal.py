@@ -0,0 +1,312 @@
+"""
+Micro-benchmarks for the portal's hot paths, run in-process against local stand-ins.
+
+By default SQLAlchemy points at a throwaway SQLite file and visitors live in mongomock,
+so nothing but the Python dependencies is needed. Point --db-url at a local MySQL
+container and --mongo-uri at a local mongod for numbers closer to production.
+
+Scenarios: upload pipeline stages (parse, DDL, insert) and the full POST /data,
+GET /data, GET /visitors, GET /api/visitors, POST /login and check-in/check-out.
+Each reports p50/p95/p99 latency, throughput and the process's peak RSS afterwards;
+everything is written to a JSON file that --compare diffs against an earlier run.
+
+    python benchmarks/portal.py --rows 20000 --cols 30 --iterations 20
+    python benchmarks/portal.py --compare benchmarks/results/<old commit>.json
+    python benchmarks/portal.py --db-url mysql+pymysql://root:pw@127.0.0.1/bench \\
+        --mongo-uri mongodb://127.0.0.1/bench
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BENCH_USER = "bench@example.com"
+BENCH_PASSWORD = "bench-password"
+BENCH_PROJECT = "Benchmark Project"
+REGRESSION_THRESHOLD = 0.10  # --compare flags p50/p95 slowdowns above 10%
+
+
+# --- Synthetic data ---
+def make_workbook(rows, cols, seed=42) -> bytes:
+    """xlsx bytes with a mix of numeric, date and text columns."""
+    from openpyxl import Workbook
+
+    rnd = random.Random(seed)
+    start = datetime.datetime(2024, 1, 1)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("data")
+    ws.append([f"Column {c}" for c in range(cols)])
+    for r in range(rows):
+        row = []
+        for c in range(cols):
+            kind = c % 4
+            if kind == 0:
+                row.append(rnd.randint(0, 100000))
+            elif kind == 1:
+                row.append(round(rnd.uniform(0, 1000), 2))
+            elif kind == 2:
+                row.append(start + datetime.timedelta(minutes=rnd.randint(0, 525600)))
+            else:
+                row.append(f"value {r}-{c} " + "x" * rnd.randint(0, 20))
+        ws.append(row)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def seed_visitors(collection, count, seed=42):
+    from bson.objectid import ObjectId
+
+    rnd = random.Random(seed)
+    now = datetime.datetime.now()
+    docs = []
+    for i in range(count):
+        registered = now - datetime.timedelta(minutes=rnd.randint(0, 60 * 24 * 90))
+        state = rnd.random()
+        docs.append({
+            # Registration time lives in the ObjectId, as for real visitors; the counter keeps ids unique
+            "_id": ObjectId(f"{int(registered.timestamp()):08x}{i:016x}"),
+            "name": f"Visitor {i}", "company": f"Company {i % 50}", "phone": "000",
+            "email": f"visitor{i}@example.com", "location": "HQ", "idType": "Passport",
+            "idNumber": str(i), "purpose": "Meeting", "items": [], "contact_person": f"host{i % 20}",
+            "approved": None if state < 0.2 else state > 0.3,
+            "check_in": registered + datetime.timedelta(hours=1) if state > 0.5 else None,
+            "check_out": registered + datetime.timedelta(hours=3) if state > 0.8 else None,
+        })
+    collection.delete_many({})
+    if docs:
+        collection.insert_many(docs)
+
+
+# --- Measurement ---
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def measure(fn, iterations, warmup=1, setup=None, units=1):
+    """Time fn() `iterations` times; `units` is the work per call (e.g. rows) for throughput."""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    timings = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    total = sum(timings)
+    return {
+        "iterations": iterations,
+        "p50_ms": percentile(timings, 50) * 1000,
+        "p95_ms": percentile(timings, 95) * 1000,
+        "p99_ms": percentile(timings, 99) * 1000,
+        "mean_ms": total / iterations * 1000,
+        "throughput_per_sec": iterations * units / total if total else 0.0,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# --- App under test ---
+def load_app(db_url, mongo_uri):
+    """Import app.py against the stand-ins; must run before anything else imports it."""
+    os.environ["DATABASE_URL"] = db_url
+    os.environ.setdefault("UPLOAD_JOB_EXECUTOR", "inline")
+    os.environ.setdefault("VISITOR_CHANGE_STREAMS", "0")
+    if mongo_uri:
+        os.environ["MONGO_URI"] = mongo_uri
+    else:
+        import flask_pymongo
+        import mongomock
+        os.environ["MONGO_URI"] = "mongodb://localhost/bench"
+        flask_pymongo.MongoClient = mongomock.MongoClient
+    import app as portal
+    return portal
+
+
+def run(args):
+    portal = load_app(args.db_url, args.mongo_uri)
+    app, db, mongo = portal.app, portal.db, portal.mongo
+    from sqlalchemy import text
+    from readers import iter_row_batches
+    from schema import add_missing_columns
+
+    workbook = make_workbook(args.rows, args.cols)
+    table_name = portal.safe_table_name(BENCH_PROJECT)
+    results = {}
+
+    with app.app_context():
+        db.create_all()
+        portal.User.query.filter_by(username=BENCH_USER).delete()
+        db.session.add(portal.User(username=BENCH_USER, password=portal.password_hasher.hash(BENCH_PASSWORD),
+                                   role="Super Admin"))
+        if not portal.Project.query.filter_by(name=BENCH_PROJECT).first():
+            db.session.add(portal.Project(name=BENCH_PROJECT))
+        db.session.commit()
+        seed_visitors(mongo.db.visitors, args.visitors)
+
+        def drop_tables():
+            db.session.execute(text(f"DROP TABLE IF EXISTS `{table_name}`"))
+            db.session.execute(text(f"DELETE FROM {portal.UploadBatch.__tablename__}"))
+            db.session.commit()
+            portal.schema_cache.invalidate(table_name)
+
+        # Upload stages, outside HTTP
+        def parse():
+            for _ in iter_row_batches(io.BytesIO(workbook), "bench.xlsx", portal.safe_colname,
+                                      app.config["INGEST_CHUNK_SIZE"]):
+                pass
+
+        columns = [portal.safe_colname(f"Column {c}") for c in range(args.cols)]
+
+        def ddl():
+            portal.ensure_project_table(table_name)
+            add_missing_columns(db.session, portal.schema_cache, table_name, columns,
+                                reserved=portal.PROJECT_META_COLS)
+
+        def ingest():
+            portal.ingest_upload(io.BytesIO(workbook), "bench.xlsx", table_name, BENCH_USER,
+                                 len(workbook), project_name=BENCH_PROJECT)
+
+        results["upload_parse"] = measure(parse, args.upload_iterations, units=args.rows)
+        results["upload_ddl"] = measure(ddl, args.upload_iterations, setup=drop_tables)
+        results["upload_ingest"] = measure(ingest, args.upload_iterations, setup=drop_tables, units=args.rows)
+
+    # HTTP paths through the test client
+    client = app.test_client()
+    login_form = {"username": BENCH_USER, "password": BENCH_PASSWORD}
+    results["login"] = measure(lambda: client.post("/login", data=login_form), args.iterations)
+    client.post("/login", data=login_form)
+
+    def post_upload():
+        resp = client.post("/data", data={"project_name": BENCH_PROJECT,
+                                          "file": (io.BytesIO(workbook), "bench.xlsx")},
+                           content_type="multipart/form-data", headers={"Accept": "application/json"})
+        assert resp.status_code < 400, resp.status_code
+
+    with app.app_context():
+        results["upload_request"] = measure(post_upload, args.upload_iterations, setup=drop_tables, units=args.rows)
+        for _ in range(3):
+            post_upload()
+
+    def get(path):
+        def call():
+            resp = client.get(path)
+            assert resp.status_code < 400, (path, resp.status_code)
+        return call
+
+    results["data_render"] = measure(get(f"/data?project_name={BENCH_PROJECT}"), args.iterations)
+    results["visitors_page"] = measure(get("/visitors"), args.iterations)
+    results["api_visitors"] = measure(get("/api/visitors"), args.iterations)
+
+    ids = [str(d["_id"]) for d in mongo.db.visitors.find({}, {"_id": 1}).limit(args.iterations + 1)]
+    turn = iter(ids * 2)
+
+    def check_in_out():
+        visitor_id = next(turn)
+        client.post(f"/checkin/{visitor_id}", json={"badge": "B-1"})
+        client.post(f"/checkout/{visitor_id}", json={"remarks": ""})
+
+    results["checkin_checkout"] = measure(check_in_out, args.iterations)
+    return results
+
+
+# --- Reporting ---
+def print_table(results):
+    print(f"{'scenario':<18} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'per sec':>11} {'peak RSS':>9}")
+    for name, r in results.items():
+        print(f"{name:<18} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+              f"{r['throughput_per_sec']:>11.1f} {r['peak_rss_mb']:>7.1f}MB")
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as fh:
+        baseline = json.load(fh)
+    print(f"\nvs {baseline.get('commit')} ({baseline_path})")
+    regressions = 0
+    for name, r in current.items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            continue
+        parts = []
+        for key in ("p50_ms", "p95_ms"):
+            change = (r[key] - old[key]) / old[key] if old[key] else 0.0
+            flag = " !" if change > REGRESSION_THRESHOLD else ""
+            regressions += bool(flag)
+            parts.append(f"{key[:3]} {change:+7.1%}{flag}")
+        print(f"{name:<18} " + "  ".join(parts))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000, help="rows per synthetic Excel file")
+    parser.add_argument("--cols", type=int, default=20, help="columns per synthetic Excel file")
+    parser.add_argument("--visitors", type=int, default=5000, help="visitor documents to seed")
+    parser.add_argument("--iterations", type=int, default=50, help="runs per request scenario")
+    parser.add_argument("--upload-iterations", type=int, default=5, help="runs per upload scenario")
+    parser.add_argument("--db-url", help="SQLAlchemy URL (default: a temporary SQLite file)")
+    parser.add_argument("--mongo-uri", help="MongoDB URI (default: mongomock)")
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier JSON results to diff against")
+    args = parser.parse_args()
+
+    tmpdir = None
+    if not args.db_url:
+        tmpdir = tempfile.mkdtemp(prefix="portal-bench-")
+        args.db_url = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+
+    from sqlalchemy.engine import make_url
+
+    results = run(args)
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {**{k: v for k, v in vars(args).items() if k not in ("output", "compare", "db_url", "mongo_uri")},
+                   "db_url": make_url(args.db_url).render_as_string(hide_password=True),
+                   "mongo": "mongomock" if not args.mongo_uri else args.mongo_uri.split("@")[-1]},
+        "results": results,
+    }
+    print_table(results)
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nresults written to {output}")
+
+    if args.compare and compare(results, args.compare):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Worker cold start: `import app` time (python -X importtime) and RSS once it is imported.
+
+Each run is a fresh interpreter, like a gunicorn worker booting without preload_app.
+Prints the median total import time, the slowest top-level imports and the median
+RSS, and checks that modules app.py should only load on first use (pandas, smtplib, ...)
+stay out of a booted worker. Exits 1 when a check fails, so CI can guard regressions:
+
+    python benchmarks/startup.py --runs 5
+    python benchmarks/startup.py --max-import-ms 900 --max-rss-mb 120
+
+No database or MongoDB is contacted: app.py only connects on first use, and the
+default DATABASE_URL is a temporary SQLite file.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use (uploads, exports, outbound mail, build-assets), never at worker boot
+LAZY_MODULES = ("pandas", "numpy", "openpyxl", "pyarrow", "smtplib", "email.mime.multipart", "authlib", "PIL")
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+_BOOT_SCRIPT = """
+import json, sys
+import app
+rss = 0
+try:
+    with open("/proc/self/status") as fh:
+        rss = next(int(l.split()[1]) for l in fh if l.startswith("VmRSS:")) * 1024
+except OSError:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+print(json.dumps({"rss": rss, "modules": sorted(sys.modules)}))
+"""
+
+
+def child_env(db_url):
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", db_url)
+    env.setdefault("VISITOR_CHANGE_STREAMS", "0")
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (ROOT, env.get("PYTHONPATH")) if p)
+    return env
+
+
+def import_profile(env):
+    """(total microseconds, {top-level module: cumulative microseconds}) for one `import app`."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], env=env, cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+    total, children = 0, {}
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME_LINE.match(line)
+        if not m:
+            continue
+        cumulative, indent, name = int(m.group(2)), len(m.group(3)), m.group(4)
+        if name == "app" and indent == 1:
+            total = cumulative
+        elif indent == 3:
+            children[name] = cumulative
+    return total, children
+
+
+def boot(env):
+    proc = subprocess.run([sys.executable, "-c", _BOOT_SCRIPT], env=env, cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to list")
+    parser.add_argument("--max-import-ms", type=float, help="fail above this median import time")
+    parser.add_argument("--max-rss-mb", type=float, help="fail above this median RSS after boot")
+    args = parser.parse_args()
+
+    env = child_env(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}")
+    totals, by_module, rss, loaded = [], {}, [], set()
+    for _ in range(args.runs):
+        total, children = import_profile(env)
+        totals.append(total / 1000)
+        for name, us in children.items():
+            by_module.setdefault(name, []).append(us / 1000)
+        result = boot(env)
+        rss.append(result["rss"] / 2 ** 20)
+        loaded.update(result["modules"])
+
+    import_ms, rss_mb = statistics.median(totals), statistics.median(rss)
+    print(f"import app: {import_ms:.0f} ms median over {args.runs} runs (min {min(totals):.0f}, max {max(totals):.0f})")
+    print(f"RSS after boot: {rss_mb:.1f} MB median")
+    print(f"\n{'top-level import':<40} {'ms':>8}")
+    slowest = sorted(by_module.items(), key=lambda kv: -statistics.median(kv[1]))[:args.top]
+    for name, values in slowest:
+        print(f"{name:<40} {statistics.median(values):>8.1f}")
+
+    failures = []
+    eager = [m for m in LAZY_MODULES if m in loaded]
+    if eager:
+        failures.append(f"loaded at boot but should be lazy: {', '.join(eager)}")
+    if args.max_import_ms and import_ms > args.max_import_ms:
+        failures.append(f"import time {import_ms:.0f} ms > {args.max_import_ms:.0f} ms")
+    if args.max_rss_mb and rss_mb > args.max_rss_mb:
+        failures.append(f"RSS {rss_mb:.1f} MB > {args.max_rss_mb:.1f} MB")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
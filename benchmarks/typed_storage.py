@@ -0,0 +1,121 @@
+"""
+Compare the all-TEXT project table layout with PROJECT_SCHEMA_MODE=typed.
+
+Loads the same synthetic rows into two MySQL tables, then reports on-disk size
+(data + indexes from information_schema) and the latency of a range filter and
+a sort over numeric/date columns.
+
+    BENCH_DATABASE_URL=mysql+pymysql://user:pw@localhost/bench python benchmarks/typed_storage.py --rows 200000
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ingest import bulk_insert  # noqa: E402
+from schema import infer_column_types  # noqa: E402
+
+COLUMNS = ["amount", "quantity", "order_date", "region", "notes"]
+
+
+def synthetic_rows(n, seed=42):
+    rnd = random.Random(seed)
+    start = datetime.datetime(2023, 1, 1)
+    regions = ["North", "South", "East", "West", "Central"]
+    for i in range(n):
+        yield (
+            round(rnd.uniform(1, 10000), 2),
+            rnd.randint(1, 500),
+            start + datetime.timedelta(minutes=rnd.randint(0, 60 * 24 * 365)),
+            rnd.choice(regions),
+            f"order {i} " + "x" * rnd.randint(0, 40),
+        )
+
+
+def create_table(session, name, typed, sample):
+    session.execute(text(f"DROP TABLE IF EXISTS `{name}`"))
+    types = infer_column_types(COLUMNS, sample) if typed else dict.fromkeys(COLUMNS, "TEXT")
+    cols = ", ".join(f"`{c}` {types[c]}" for c in COLUMNS)
+    upload_time = "DATETIME" if typed else "VARCHAR(20)"
+    session.execute(text(f"""
+        CREATE TABLE `{name}` (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            uploaded_by VARCHAR(100),
+            upload_time {upload_time},
+            file_name VARCHAR(255),
+            {cols},
+            INDEX `idx_uploaded_by_time` (`uploaded_by`, `upload_time`)
+        )
+    """))
+    session.commit()
+    return types
+
+
+def table_size(session, name):
+    session.execute(text(f"ANALYZE TABLE `{name}`"))
+    row = session.execute(text("""
+        SELECT data_length, index_length FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = :name
+    """), {"name": name}).one()
+    return row[0] + row[1]
+
+
+def time_query(session, sql, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        session.execute(text(sql)).all()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--url", default=os.environ.get("BENCH_DATABASE_URL"))
+    args = parser.parse_args()
+    if not args.url or not args.url.startswith("mysql"):
+        parser.error("a MySQL --url or BENCH_DATABASE_URL is required (sizes come from information_schema)")
+
+    engine = create_engine(args.url)
+    sample = list(synthetic_rows(1000))
+    queries = {
+        "range filter on amount": "SELECT id FROM `{t}` WHERE {amount} BETWEEN 100 AND 200",
+        "sort by order_date": "SELECT id FROM `{t}` ORDER BY {order_date} DESC LIMIT 100",
+        "date range count": "SELECT COUNT(*) FROM `{t}` WHERE {order_date} >= '2023-06-01' AND {order_date} < '2023-07-01'",
+    }
+    results = {}
+    with Session(engine) as session:
+        for layout, typed in (("text", False), ("typed", True)):
+            name = f"bench_{layout}_layout"
+            create_table(session, name, typed, sample)
+            meta = ("bench@example.com", "2024-01-01 00:00:00", "bench.xlsx")
+            rows = (row + meta for row in synthetic_rows(args.rows))
+            load = bulk_insert(session, name, COLUMNS + ["uploaded_by", "upload_time", "file_name"], rows)
+            session.commit()
+            exprs = ({"amount": "`amount`", "order_date": "`order_date`"} if typed else
+                     {"amount": "CAST(`amount` AS DECIMAL(12,2))", "order_date": "CAST(`order_date` AS DATETIME)"})
+            results[layout] = {
+                "size_mb": table_size(session, name) / 1024 / 1024,
+                "load_rows_per_sec": load.rows_per_sec,
+                **{q: time_query(session, sql.format(t=name, **exprs), args.repeat) for q, sql in queries.items()},
+            }
+            session.execute(text(f"DROP TABLE `{name}`"))
+            session.commit()
+
+    print(f"{'metric':<28}{'text':>14}{'typed':>14}")
+    for metric in results["text"]:
+        unit = "" if metric in ("size_mb", "load_rows_per_sec") else " ms"
+        print(f"{metric + unit:<28}{results['text'][metric]:>14.1f}{results['typed'][metric]:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
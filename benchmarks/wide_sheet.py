@@ -0,0 +1,147 @@
+"""
+CPU time and allocations per row for the upload normalization stage on wide sheets.
+
+Compares the previous per-cell pipeline (itertuples + a Python NaN check per value, a
+bind dict per row, an uncached regex header rename) with the current one
+(readers.frame_rows, tuples straight to executemany, memoized safe_colname).
+Inserts go to in-memory SQLite, so only the Python side of the insert is measured;
+app.py is loaded the way benchmarks/portal.py does it (SQLite, mongomock).
+
+    python benchmarks/wide_sheet.py --rows 20000 --cols 200 --cols 400
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from ingest import bulk_insert  # noqa: E402
+from portal import load_app  # noqa: E402
+from readers import frame_rows  # noqa: E402
+
+
+# --- The pipeline before vectorized normalization ---
+def old_clean_value(value):
+    if isinstance(value, float):
+        return None if math.isnan(value) else value
+    if type(value).__name__ in ("NaTType", "NAType"):
+        return None
+    return value
+
+
+def old_safe_colname(col):
+    name = col.strip().replace(" ", "_").replace("-", "_")
+    import re as _re
+    name = _re.sub(r"[^0-9a-zA-Z_]", "", name)
+    if not name:
+        name = "col"
+    if name[0].isdigit():
+        name = f"c_{name}"
+    return name
+
+
+def old_rows(df):
+    return [tuple(old_clean_value(v) for v in row) for row in df.itertuples(index=False, name=None)]
+
+
+def old_insert(session, table, columns, rows, batch_size=1000):
+    keys = [f"p{i}" for i in range(len(columns))]
+    stmt = text(f"INSERT INTO `{table}` ({', '.join(f'`{c}`' for c in columns)}) "
+                f"VALUES ({', '.join(':' + k for k in keys)})")
+    for i in range(0, len(rows), batch_size):
+        params = [{k: old_clean_value(v) for k, v in zip(keys, row)} for row in rows[i:i + batch_size]]
+        session.execute(stmt, params)
+
+
+# --- Current pipeline ---
+def new_rows(df):
+    return list(frame_rows(df))
+
+
+def new_insert(session, table, columns, rows, batch_size=1000):
+    bulk_insert(session, table, columns, rows, batch_size)
+
+
+def make_frame(rows, cols, seed=7):
+    """Mixed numeric/text columns with ~20% missing cells, like a sparse export."""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for c in range(cols):
+        if c % 3 == 0:
+            values = rng.random(rows) * 1000
+            values[rng.random(rows) < 0.2] = np.nan
+        else:
+            values = np.array([f"v{c}_{i % 97}" for i in range(rows)], dtype=object)
+            values[rng.random(rows) < 0.2] = np.nan
+        data[f"Column {c} - value"] = values
+    return pd.DataFrame(data)
+
+
+def measure(fn, reset=None):
+    """
+    (cpu seconds, peak traced bytes): CPU from an untraced call, since tracemalloc
+    slows allocation-heavy code several times over, then memory from a traced one.
+    """
+    started = time.process_time()
+    fn()
+    cpu = time.process_time() - started
+    if reset:
+        reset()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu, peak
+
+
+def run(safe_colname, rows, cols, chunks):
+    df = make_frame(rows, cols)
+    headers = list(df.columns)
+    engine = create_engine("sqlite://")
+    results = {}
+    for label, rename, to_rows, insert in (("before", old_safe_colname, old_rows, old_insert),
+                                           ("after", safe_colname, new_rows, new_insert)):
+        columns = [rename(h) for h in headers]
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS wide"))
+            conn.execute(text(f"CREATE TABLE wide ({', '.join(f'`{c}` TEXT' for c in columns)})"))
+
+        # Headers are renamed once per streamed chunk
+        results[(label, "rename")] = measure(lambda: [rename(h) for _ in range(chunks) for h in headers])
+        tuples = []
+        results[(label, "normalize")] = measure(lambda: tuples.extend(to_rows(df)), tuples.clear)
+        with Session(engine) as session:
+            results[(label, "insert")] = measure(lambda: insert(session, "wide", columns, tuples), session.rollback)
+            session.rollback()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--cols", type=int, action="append", help="sheet width (repeatable, default 200)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="rows per streamed chunk")
+    args = parser.parse_args()
+    # app.py's pool options need a file database; only safe_colname is used from it
+    portal = load_app(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'wide.db')}", None)
+
+    print(f"{'cols':>5} {'stage':<10} {'before us/row':>14} {'after us/row':>13} {'before B/row':>13} "
+          f"{'after B/row':>12} {'cpu x':>6}")
+    for cols in args.cols or [200]:
+        results = run(portal.safe_colname, args.rows, cols, max(1, args.rows // args.chunk_size))
+        for stage in ("rename", "normalize", "insert"):
+            (b_cpu, b_peak), (a_cpu, a_peak) = results[("before", stage)], results[("after", stage)]
+            print(f"{cols:>5} {stage:<10} {b_cpu / args.rows * 1e6:>14.1f} {a_cpu / args.rows * 1e6:>13.1f} "
+                  f"{b_peak / args.rows:>13.0f} {a_peak / args.rows:>12.0f} {b_cpu / a_cpu if a_cpu else 0:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
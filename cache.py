@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, has_request_context
+
+
+# --- Settings ---
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 1024
+
+_MISSING = object()
+
+
+class LRUBackend:
+    """In-process LRU with per-entry TTL; each worker process has its own copy."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + timeout if timeout else 0)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CachelibBackend:
+    """Adapter for a cachelib cache, e.g. FileSystemCache shared by all workers on a host."""
+
+    def __init__(self, cache):
+        self._cache = cache
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value, timeout):
+        self._cache.set(key, value, timeout=timeout or 0)
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+    def clear(self):
+        self._cache.clear()
+
+
+def make_backend(kind="lru", cache_dir=None, max_entries=DEFAULT_MAX_ENTRIES):
+    if kind == "lru":
+        return LRUBackend(max_entries)
+    if kind == "filesystem":
+        from cachelib import FileSystemCache
+        return CachelibBackend(FileSystemCache(cache_dir, threshold=max_entries))
+    raise ValueError(f"Unknown cache backend '{kind}', expected 'lru' or 'filesystem'")
+
+
+class AppCache:
+    """
+    TTL cache for rarely-changing lookups, grouped in namespaces ("projects", "users", ...).
+    invalidate(namespace) replaces the namespace version, which orphans every key in it
+    on any backend without having to enumerate keys. Values are also memoized on
+    `flask.g`, so one request never asks the backend twice for the same key.
+    """
+
+    def __init__(self, backend=None, default_ttl=DEFAULT_TTL):
+        self.backend = backend or LRUBackend()
+        self.default_ttl = default_ttl
+
+    def _version(self, namespace):
+        version = self.backend.get(f"ns:{namespace}")
+        if version is None:
+            # Unknown or evicted: start a fresh version so no older entry can be served
+            version = self._new_version(namespace)
+        return version
+
+    def _new_version(self, namespace):
+        version = time.time_ns()
+        self.backend.set(f"ns:{namespace}", version, 0)
+        return version
+
+    def _key(self, namespace, key):
+        return f"{namespace}:{self._version(namespace)}:{key}"
+
+    def get_or_set(self, namespace, key, fn, ttl=None):
+        """Return the cached value for (namespace, key), computing it with fn() on a miss."""
+        memo = g.setdefault("_app_cache", {}) if has_request_context() else {}
+        memo_key = (namespace, key)
+        if memo_key in memo:
+            return memo[memo_key]
+
+        full_key = self._key(namespace, key)
+        value = self.backend.get(full_key)
+        if value is None:
+            value = fn()
+            # Wrap so a legitimately empty/None result is still a cache hit
+            self.backend.set(full_key, (value,), ttl if ttl is not None else self.default_ttl)
+        else:
+            value = value[0]
+        memo[memo_key] = value
+        return value
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            # Versions never expire; orphaned keys age out through their own TTL
+            self._new_version(namespace)
+        if has_request_context():
+            memo = g.get("_app_cache")
+            if memo:
+                for memo_key in [k for k in memo if k[0] in namespaces]:
+                    del memo[memo_key]
+
+    def clear(self):
+        self.backend.clear()
@@ -0,0 +1,74 @@
+import gzip
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+# --- Settings ---
+DEFAULT_MIN_SIZE = 1024  # smaller bodies fit in a packet or two anyway
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_BROTLI_QUALITY = 4  # about gzip -6 speed, smaller output; 11 is for build-time only
+COMPRESSIBLE_MIMETYPES = {"text/html", "text/plain", "text/css", "text/csv", "text/javascript",
+                          "application/json", "application/javascript", "image/svg+xml"}
+
+
+def choose_encoding(accept_encodings):
+    """"br" when the client takes it and brotli is installed, else "gzip", else None."""
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress_body(data: bytes, encoding: str, gzip_level=DEFAULT_GZIP_LEVEL,
+                  brotli_quality=DEFAULT_BROTLI_QUALITY) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level)
+
+
+class ResponseCompressor:
+    """
+    Compresses buffered HTML/JSON/CSV responses above `min_size` on the way out.
+    Streamed responses (exports, the visitor event stream) and file sends are left
+    alone: they are already chunked, or precompressed by StaticAssets.
+    """
+
+    def __init__(self, enabled=True, min_size=DEFAULT_MIN_SIZE, gzip_level=DEFAULT_GZIP_LEVEL,
+                 brotli_quality=DEFAULT_BROTLI_QUALITY):
+        self.enabled = enabled
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def compress(self, response, accept_encodings):
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or "Content-Encoding" in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = choose_encoding(accept_encodings)
+        data = response.get_data()
+        if not encoding or len(data) < self.min_size:
+            return response
+        response.set_data(compress_body(data, encoding, self.gzip_level, self.brotli_quality))
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # Same resource, different bytes: a strong validator would no longer be correct
+            response.set_etag(etag, weak=True)
+        return response
+
+    # --- Flask ---
+    def init_app(self, app):
+        if not self.enabled:
+            return
+        from flask import request
+
+        @app.after_request
+        def _compress_response(response):
+            return self.compress(response, request.accept_encodings)
@@ -0,0 +1,106 @@
+import datetime
+import hashlib
+
+from sqlalchemy import bindparam, text
+
+
+# --- Settings ---
+ON_DUPLICATE_MODES = ("skip", "replace", "append")
+ROW_HASH_COL = "row_hash"
+ROW_HASH_INDEX = "idx_row_hash"
+LOOKUP_BATCH = 1000  # hashes per IN (...) lookup
+
+
+def file_digest(path) -> str:
+    """sha256 of a file's bytes, read in 1 MB blocks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        while True:
+            block = fh.read(1024 * 1024)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
+def _normalize(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    elif isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value).strip()
+
+
+def row_digest(columns, row) -> str:
+    """
+    Order-independent hash of one row's non-empty values: the same record hashes the
+    same whatever the column order, and whether 5 arrived as 5 or 5.0.
+    """
+    pairs = sorted((c, _normalize(v)) for c, v in zip(columns, row) if v is not None and v != "")
+    h = hashlib.blake2b(digest_size=16)
+    for col, value in pairs:
+        h.update(col.encode())
+        h.update(b"\x1f")
+        h.update(value.encode())
+        h.update(b"\x1e")
+    return h.hexdigest()
+
+
+def ensure_row_hash_column(session, cache, table_name):
+    """Add the row_hash column and its (uploaded_by, row_hash) index the first time row dedupe is used."""
+    from schema import alter_table
+
+    if ROW_HASH_COL in cache.columns(session.get_bind(), table_name):
+        return
+    sqlite = session.get_bind().dialect.name == "sqlite"
+    if sqlite:
+        alter_table(session, table_name, [f"ADD COLUMN `{ROW_HASH_COL}` CHAR(32)"])
+        session.execute(text(f"CREATE INDEX IF NOT EXISTS `{table_name}_{ROW_HASH_INDEX}` "
+                             f"ON `{table_name}` (`uploaded_by`, `{ROW_HASH_COL}`)"))
+    else:
+        alter_table(session, table_name, [f"ADD COLUMN `{ROW_HASH_COL}` CHAR(32)",
+                                          f"ADD INDEX `{ROW_HASH_INDEX}` (`uploaded_by`, `{ROW_HASH_COL}`)"])
+    session.commit()
+    cache.columns_added(table_name, [ROW_HASH_COL], {ROW_HASH_COL: "VARCHAR(32)"})
+
+
+def existing_row_hashes(session, table_name, uploaded_by, hashes) -> set:
+    """Which of `hashes` this user already has in the table; index lookups, no scan."""
+    found = set()
+    hashes = list(hashes)
+    stmt = text(
+        f"SELECT `{ROW_HASH_COL}` FROM `{table_name}` "
+        f"WHERE `uploaded_by` = :user AND `{ROW_HASH_COL}` IN :hashes"
+    ).bindparams(bindparam("hashes", expanding=True))
+    for i in range(0, len(hashes), LOOKUP_BATCH):
+        batch = hashes[i:i + LOOKUP_BATCH]
+        found.update(r[0] for r in session.execute(stmt, {"user": uploaded_by, "hashes": batch}))
+    return found
+
+
+def new_rows(session, table_name, uploaded_by, columns, rows, seen):
+    """
+    Drop rows already stored for this user, and repeats within the upload (`seen` is
+    shared across chunks). Returns the remaining rows with their hash appended.
+    """
+    hashed = []
+    for row in rows:
+        digest = row_digest(columns, row)
+        if digest not in seen:
+            seen.add(digest)
+            hashed.append(row + (digest,))
+    if not hashed:
+        return []
+    stored = existing_row_hashes(session, table_name, uploaded_by, (r[-1] for r in hashed))
+    return [r for r in hashed if r[-1] not in stored] if stored else hashed
+
+
+def delete_batch(session, table_name, uploaded_by, file_name, upload_time) -> int:
+    """Delete one upload batch's rows (uses idx_batch); the caller owns the transaction."""
+    return session.execute(
+        text(f"DELETE FROM `{table_name}` WHERE `file_name` = :file_name "
+             f"AND `upload_time` = :upload_time AND `uploaded_by` = :user"),
+        {"file_name": file_name, "upload_time": upload_time, "user": uploaded_by},
+    ).rowcount
@@ -0,0 +1,145 @@
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+
+from bson.objectid import ObjectId
+
+
+logger = logging.getLogger(__name__)
+
+# --- Settings ---
+HEARTBEAT_SECONDS = 15
+SUBSCRIBER_BUFFER = 100
+
+
+def _jsonable(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
+
+
+def visitor_delta(kind, visitor_id, fields=None) -> dict:
+    """Small per-visitor change message: {"type", "id", "fields"}."""
+    return {
+        "type": kind,
+        "id": str(visitor_id),
+        "fields": {k: _jsonable(v) for k, v in (fields or {}).items() if k != "_id"},
+    }
+
+
+def delta_from_change(change):
+    """Map a MongoDB change stream event on `visitors` to a visitor delta (None to skip)."""
+    op = change.get("operationType")
+    visitor_id = change.get("documentKey", {}).get("_id")
+    if op == "insert":
+        return visitor_delta("created", visitor_id, change.get("fullDocument"))
+    if op != "update":
+        return None
+    fields = change.get("updateDescription", {}).get("updatedFields", {})
+    if fields.get("check_out"):
+        kind = "checked_out"
+    elif fields.get("check_in"):
+        kind = "checked_in"
+    elif "approved" in fields:
+        kind = "approved" if fields["approved"] else "declined"
+    else:
+        kind = "updated"
+    return visitor_delta(kind, visitor_id, fields)
+
+
+class EventBroker:
+    """
+    In-process pub/sub for visitor deltas. Each subscriber gets a bounded queue;
+    a subscriber that falls too far behind loses its oldest events rather than
+    slowing publishers down.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.change_stream_active = False
+        self._watcher = None
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    q.put_nowait(event)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def publish_local(self, event):
+        """Publish from a route; skipped when a change stream already reports every write."""
+        if not self.change_stream_active:
+            self.publish(event)
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=SUBSCRIBER_BUFFER)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def stream(self, heartbeat=HEARTBEAT_SECONDS):
+        """Server-Sent Events generator: one `visitor` event per delta, comments as heartbeats."""
+        q = self.subscribe()
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = q.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: visitor\ndata: {json.dumps(event)}\n\n"
+        finally:
+            self.unsubscribe(q)
+
+    def watch_collection(self, collection):
+        """
+        Feed the broker from a MongoDB change stream in a daemon thread. Change streams
+        need a replica set; on a standalone server this turns itself off and routes keep
+        publishing in-process.
+        """
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._watcher = threading.Thread(target=self._watch, args=(collection,),
+                                         name="visitor-change-stream", daemon=True)
+        self._watcher.start()
+
+    def _watch(self, collection):
+        from pymongo.errors import OperationFailure, PyMongoError
+
+        resume_token = None
+        while True:
+            try:
+                with collection.watch(resume_after=resume_token) as stream:
+                    self.change_stream_active = True
+                    logger.info("Visitor change stream connected")
+                    for change in stream:
+                        resume_token = stream.resume_token
+                        delta = delta_from_change(change)
+                        if delta:
+                            self.publish(delta)
+            except (OperationFailure, NotImplementedError) as e:
+                # e.g. "The $changeStream stage is only supported on replica sets"
+                self.change_stream_active = False
+                logger.info("Change streams unavailable, using in-process events: %s", e)
+                return
+            except PyMongoError:
+                self.change_stream_active = False
+                logger.warning("Visitor change stream interrupted; retrying", exc_info=True)
+                time.sleep(5)
@@ -0,0 +1,155 @@
+import csv
+import functools
+import importlib.util
+import io
+import os
+import tempfile
+
+
+# --- Settings ---
+DEFAULT_EXPORT_CHUNK = 5000
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+ARROW_FORMATS = ("parquet", "arrow")  # need the optional pyarrow package
+
+
+class _DrainBuffer(io.RawIOBase):
+    """Write-only sink whose contents are handed out and dropped after every chunk."""
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+# --- Writers ---
+# Each writer takes the header and an iterator of row-tuple chunks and yields bytes.
+def iter_csv(columns, chunks):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def iter_xlsx(columns, chunks):
+    """
+    openpyxl write-only mode keeps one row in memory at a time, but a zip container
+    can only be finished at the end, so the workbook is spooled to a temp file first.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("data")
+    ws.append(columns)
+    for chunk in chunks:
+        for row in chunk:
+            ws.append(row)
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx", prefix="export_")
+    os.close(fd)
+    try:
+        wb.save(path)
+        with open(path, "rb") as fh:
+            while True:
+                data = fh.read(64 * 1024)
+                if not data:
+                    break
+                yield data
+    finally:
+        os.remove(path)
+
+
+def arrow_schema(columns, col_types):
+    import pyarrow as pa
+
+    mapping = {"BIGINT": pa.int64(), "DOUBLE": pa.float64(), "DATETIME": pa.timestamp("us")}
+    return pa.schema([(c, mapping.get(col_types.get(c), pa.string())) for c in columns])
+
+
+def _record_batch(schema, chunk):
+    import pyarrow as pa
+
+    arrays = []
+    for i, field in enumerate(schema):
+        values = [row[i] for row in chunk]
+        if pa.types.is_string(field.type):
+            values = [None if v is None else str(v) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def iter_arrow(columns, chunks, col_types):
+    """Arrow IPC stream: one record batch per chunk, flushed as soon as it is written."""
+    import pyarrow as pa
+
+    schema = arrow_schema(columns, col_types)
+    sink = _DrainBuffer()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        yield sink.drain()
+        for chunk in chunks:
+            writer.write_batch(_record_batch(schema, chunk))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def iter_parquet(columns, chunks, col_types):
+    """Parquet with one row group per chunk; the footer follows the last group."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema(columns, col_types)
+    sink = _DrainBuffer()
+    with pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema) as writer:
+        for chunk in chunks:
+            writer.write_batch(_record_batch(schema, chunk))
+            yield sink.drain()
+    yield sink.drain()
+
+
+@functools.lru_cache(maxsize=None)
+def available_formats() -> tuple:
+    """EXPORT_FORMATS this install can write; the /data menu offers only these."""
+    has_arrow = importlib.util.find_spec("pyarrow") is not None
+    return tuple(fmt for fmt in EXPORT_FORMATS if has_arrow or fmt not in ARROW_FORMATS)
+
+
+def iter_export(fmt, columns, chunks, col_types=None):
+    """Dispatch to the writer for `fmt`; raises ValueError for unknown/unavailable formats."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'")
+    if fmt == "csv":
+        return iter_csv(columns, chunks)
+    if fmt == "xlsx":
+        return iter_xlsx(columns, chunks)
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ValueError(f"Export format '{fmt}' needs the optional 'pyarrow' package")
+    if fmt == "arrow":
+        return iter_arrow(columns, chunks, col_types or {})
+    return iter_parquet(columns, chunks, col_types or {})
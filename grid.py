@@ -0,0 +1,115 @@
+import base64
+import json
+
+from sqlalchemy import text
+
+
+# --- Settings ---
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Always populated on ingest, so the cursor predicate needs no NULL handling for them
+INDEXED_SORT_COLS = {"id", "uploaded_by", "upload_time", "file_name"}
+
+
+# --- Utilities ---
+def encode_cursor(sort_value, row_id) -> str:
+    raw = json.dumps([sort_value, row_id], default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Return (sort_value, id) from an opaque cursor; raises ValueError when malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return sort_value, int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _seek_predicate(col: str, desc: bool, sort_value) -> str:
+    """
+    Rows after the cursor (sort_value, :c_id) in ORDER BY col, id. The column is compared
+    bare, so BIGINT/DOUBLE/DATETIME keep their own ordering and indexes stay usable.
+    NULLs sort lowest on both MySQL and SQLite: last when descending, first when ascending.
+    """
+    op = "<" if desc else ">"
+    col_sql = f"`{col}`"
+    if col in INDEXED_SORT_COLS:
+        return f"({col_sql} {op} :c_val OR ({col_sql} = :c_val AND `id` {op} :c_id))"
+    if sort_value is None:
+        tie = f"({col_sql} IS NULL AND `id` {op} :c_id)"
+        return tie if desc else f"({tie} OR {col_sql} IS NOT NULL)"
+    past = f"({col_sql} {op} :c_val OR ({col_sql} = :c_val AND `id` {op} :c_id))"
+    return f"({past} OR {col_sql} IS NULL)" if desc else past
+
+
+def build_page_query(table_name, table_cols, user, columns=None, sort="upload_time", desc=True,
+                     filters=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Build one keyset (seek) page over a project table:
+    WHERE uploaded_by = :user [AND filters] [AND (sort, id) past the cursor]
+    ORDER BY sort, id LIMIT n+1. The extra row tells the caller there is a next page.
+    Only names in `table_cols` are ever interpolated; unknown names raise ValueError.
+    """
+    known = set(table_cols)
+    if sort not in known:
+        raise ValueError(f"Unknown sort column '{sort}'")
+    columns = [c for c in (columns or table_cols) if c != "id"]
+    unknown = [c for c in columns if c not in known]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+
+    where = ["`uploaded_by` = :user"]
+    params = {"user": user, "limit": min(max(int(limit), 1), MAX_PAGE_SIZE) + 1}
+
+    for i, (col, value) in enumerate((filters or {}).items()):
+        if col not in known:
+            raise ValueError(f"Unknown filter column '{col}'")
+        where.append(f"`{col}` LIKE :f{i}")
+        params[f"f{i}"] = f"%{_escape_like(str(value))}%"
+
+    direction = "DESC" if desc else "ASC"
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        where.append(_seek_predicate(sort, desc, sort_value))
+        params.update(c_val=sort_value, c_id=row_id)
+
+    select_cols = ["id", *columns]
+    if sort not in select_cols:
+        select_cols.append(sort)
+    select_sql = ", ".join(f"`{c}`" for c in select_cols)
+    sql = (f"SELECT {select_sql} FROM `{table_name}` WHERE {' AND '.join(where)} "
+           f"ORDER BY `{sort}` {direction}, `id` {direction} LIMIT :limit")
+    return text(sql), params, columns
+
+
+def fetch_page(session, table_name, table_cols, user, columns=None, sort="upload_time", desc=True,
+               filters=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Run build_page_query and shape the JSON payload (rows as lists in `columns` order)."""
+    stmt, params, columns = build_page_query(table_name, table_cols, user, columns, sort, desc,
+                                             filters, cursor, limit)
+    page_size = params["limit"] - 1
+    rows = session.execute(stmt, params).mappings().all()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = encode_cursor(last[sort], last["id"])
+    return {
+        "columns": columns,
+        "rows": [[_jsonable(r[c]) for c in columns] for r in rows],
+        "next_cursor": next_cursor,
+        "limit": page_size,
+    }
+
+
+def _jsonable(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
@@ -0,0 +1,40 @@
+# gunicorn settings for the production profile; every value can be overridden from the environment.
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+worker_class = "gthread"
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+# Requests are mostly waiting on MySQL/MongoDB, and each open /visitors/stream holds a thread
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+# Recycle workers now and then to cap slow memory growth. Upload jobs a recycled (or, after
+# graceful_timeout, killed) worker was running are requeued once their lease runs out and
+# picked up again by the next worker to fork (see resume_jobs in app.py).
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 200))
+# Import app.py once in the master: workers fork with the modules already loaded (faster boot,
+# pages shared copy-on-write). Connections and threads are only created after the fork.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-") or None  # empty string turns it off
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    # With preload_app the engine was created in the master; never share its sockets
+    if preload_app:
+        from app import app, db
+        with app.app_context():
+            db.engine.dispose(close=False)
+    # Pick up upload jobs left behind by workers that were recycled or killed
+    from app import app, resume_jobs
+    try:
+        with app.app_context():
+            resumed = resume_jobs()
+    except Exception:
+        server.log.exception("Worker %s could not resume upload jobs", worker.pid)
+        return
+    if resumed:
+        server.log.info("Worker %s resumed %d upload job(s)", worker.pid, resumed)
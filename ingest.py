@@ -0,0 +1,123 @@
+import functools
+import os
+import tempfile
+import time
+
+from sqlalchemy import text
+
+
+# --- Settings ---
+DEFAULT_BATCH_SIZE = 1000
+# Files at or above this size (bytes) go through LOAD DATA LOCAL INFILE; 0 disables it.
+DEFAULT_LOAD_DATA_THRESHOLD = 0
+
+
+class IngestResult:
+    """Row count and timing for one bulk insert."""
+
+    def __init__(self, rows=0, seconds=0.0, method="executemany"):
+        self.rows = rows
+        self.seconds = seconds
+        self.method = method
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else float(self.rows)
+
+    def add(self, other):
+        """Fold another chunk's result into this one."""
+        self.rows += other.rows
+        self.seconds += other.seconds
+        self.method = other.method
+        return self
+
+    def __repr__(self):
+        return f"<IngestResult rows={self.rows} seconds={self.seconds:.3f} method={self.method}>"
+
+
+# --- Utilities ---
+def _infile_field(value) -> str:
+    """Format one value for LOAD DATA's default tab-separated, backslash-escaped layout."""
+    if value is None:
+        return "\\N"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+_PLACEHOLDERS = {"qmark": "?", "format": "%s", "pyformat": "%s"}
+
+
+@functools.lru_cache(maxsize=256)
+def build_insert(table_name: str, columns: tuple, paramstyle: str = "format") -> str:
+    """
+    A positional INSERT for the given column order, in the DB driver's own paramstyle,
+    so row tuples go to cursor.executemany as they are: no per-row dict, no rebinding.
+    Cached, so streamed chunks with the same columns share one string.
+    """
+    cols = ", ".join(f"`{c}`" for c in columns)
+    placeholders = ", ".join([_PLACEHOLDERS[paramstyle]] * len(columns))
+    return f"INSERT INTO `{table_name}` ({cols}) VALUES ({placeholders})"
+
+
+def iter_batches(rows, batch_size: int):
+    """Group an iterable of row tuples into lists of at most batch_size rows."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def bulk_insert(session, table_name: str, columns, rows, batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Insert row tuples (in `columns` order, missing values already None) with one
+    statement per upload. Each batch is a single executemany call on the driver,
+    which PyMySQL rewrites into a multi-row INSERT ... VALUES. The caller owns the commit.
+    """
+    conn = session.connection()
+    stmt = build_insert(table_name, tuple(columns), conn.dialect.paramstyle)
+    result = IngestResult()
+    started = time.perf_counter()
+    for batch in iter_batches(rows, batch_size):
+        conn.exec_driver_sql(stmt, batch)
+        result.rows += len(batch)
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def load_data_infile(session, table_name: str, columns, rows):
+    """
+    Spool rows to a temporary tab-separated file and ingest it with LOAD DATA LOCAL INFILE.
+    Needs `local_infile` enabled on both the PyMySQL connection and the server.
+    """
+    result = IngestResult(method="load_data")
+    started = time.perf_counter()
+    fd, path = tempfile.mkstemp(suffix=".tsv", prefix="ingest_")
+    try:
+        with os.fdopen(fd, "w", newline="", encoding="utf-8") as fh:
+            for row in rows:
+                fh.write("\t".join(_infile_field(v) for v in row))
+                fh.write("\n")
+                result.rows += 1
+
+        cols = ", ".join(f"`{c}`" for c in columns)
+        session.execute(text(f"""
+            LOAD DATA LOCAL INFILE :path INTO TABLE `{table_name}`
+            CHARACTER SET utf8mb4
+            ({cols})
+        """), {"path": path})
+    finally:
+        os.remove(path)
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def ingest_rows(session, table_name: str, columns, rows, batch_size: int = DEFAULT_BATCH_SIZE,
+                use_load_data: bool = False):
+    """Pick the LOAD DATA path for very large files, batched executemany otherwise."""
+    if use_load_data:
+        return load_data_infile(session, table_name, columns, rows)
+    return bulk_insert(session, table_name, columns, rows, batch_size)
@@ -0,0 +1,90 @@
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+
+
+# --- Settings ---
+DEFAULT_WORKERS = 2
+# thread: in-process pool, process: local process pool,
+# inline: run on submit (tests), external: leave queued for `flask upload-worker`
+EXECUTOR_MODES = ("thread", "process", "inline", "external")
+# A running job refreshes its heartbeat this often; one silent for DEFAULT_LEASE is presumed dead
+DEFAULT_HEARTBEAT = 30
+DEFAULT_LEASE = 600
+DEFAULT_JOB_ATTEMPTS = 3
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+class JobQueue:
+    """
+    Local job runner for background uploads; no external broker needed.
+    Job state lives in the database, so the queue only has to run callables.
+    """
+
+    def __init__(self, mode="thread", max_workers=DEFAULT_WORKERS, initializer=None, start_method="spawn"):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown job executor '{mode}', expected one of {EXECUTOR_MODES}")
+        self.mode = mode
+        self.max_workers = max_workers
+        self.initializer = initializer
+        # spawn: workers never inherit the web worker's threads, locks or sockets
+        self.start_method = start_method
+        self._executor = None
+
+    def _get_executor(self):
+        # Created lazily so preforked servers start their pools after the fork
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(self.max_workers, mp_context=get_context(self.start_method),
+                                                     initializer=self.initializer)
+            else:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="upload-job")
+        return self._executor
+
+    def submit(self, fn, *args):
+        """Schedule fn(*args); returns a Future (None when an external worker picks it up)."""
+        if self.mode == "external":
+            return None
+        if self.mode == "inline":
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self._get_executor().submit(fn, *args)
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+class Heartbeat:
+    """Call beat() every `interval` seconds on a daemon thread while the with-block runs (0: never)."""
+
+    def __init__(self, beat, interval=DEFAULT_HEARTBEAT):
+        self.beat = beat
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.beat()
+
+    def __enter__(self):
+        if self.interval:
+            self._thread = threading.Thread(target=self._run, name="job-heartbeat", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return False
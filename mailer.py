@@ -0,0 +1,200 @@
+import logging
+import queue
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# --- Settings ---
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF = 2.0        # seconds before the first retry, doubled on every attempt
+DEFAULT_IDLE_TIMEOUT = 30.0  # close the SMTP connection after this long without mail
+
+
+class OutgoingMail:
+    """One queued message plus its delivery bookkeeping."""
+
+    def __init__(self, message, recipients, meta=None):
+        self.message = message
+        self.recipients = recipients if isinstance(recipients, (list, tuple)) else [recipients]
+        self.meta = meta or {}
+        self.attempts = 0
+        self.not_before = 0.0
+
+
+def _is_permanent(error) -> bool:
+    """A 5xx reply (for every refused recipient) fails the same way on retry; 4xx and disconnects may not."""
+    codes = [code for code, _ in getattr(error, "recipients", {}).values()] or [getattr(error, "smtp_code", 0)]
+    return all(code >= 500 for code in codes)
+
+
+class MailQueue:
+    """
+    Outbound mail with a single background sender. The sender keeps one
+    authenticated SMTP connection open while there is work, sends queued messages
+    in batches over it, and retries 4xx replies and dropped connections with
+    exponential backoff; a 5xx reply fails the message at once.
+    `on_status(mail, status, error)` is called with "sent", "retrying" or "failed".
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True,
+                 batch_size=DEFAULT_BATCH_SIZE, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 backoff=DEFAULT_BACKOFF, idle_timeout=DEFAULT_IDLE_TIMEOUT, on_status=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.on_status = on_status
+        self._queue = queue.Queue()
+        self._retry = []
+        self._outstanding = 0
+        self._conn = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    # --- Public API ---
+    def enqueue(self, message, recipients, meta=None) -> OutgoingMail:
+        mail = OutgoingMail(message, recipients, meta)
+        with self._lock:
+            self._outstanding += 1
+        self._queue.put(mail)
+        self._ensure_thread()
+        return mail
+
+    def pending(self) -> int:
+        """Messages not yet sent or given up on (queued, in flight or waiting to retry)."""
+        return self._outstanding
+
+    def flush(self, timeout=None) -> bool:
+        """Block until everything queued so far was sent or gave up; False on timeout."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self.pending():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stop(self, timeout=5.0):
+        self.flush(timeout)
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._close()
+
+    # --- Sender thread ---
+    def _ensure_thread(self):
+        # Started lazily so each forked worker gets its own sender
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="mail-sender", daemon=True)
+                self._thread.start()
+
+    def _connect(self):
+        import smtplib  # sender thread only; keeps it out of worker boot
+
+        if self._conn is not None:
+            try:
+                if self._conn.noop()[0] == 250:
+                    return self._conn
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close()
+        conn = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.use_tls:
+            conn.starttls()
+        if self.username:
+            conn.login(self.username, self.password)
+        self._conn = conn
+        return conn
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.quit()
+            except Exception:
+                # The server is gone; still release our end of the socket
+                self._conn.close()
+            self._conn = None
+
+    def _next_batch(self):
+        """Due retries first, then fresh mail; waits briefly when there is nothing to do."""
+        now = time.monotonic()
+        batch = [m for m in self._retry if m.not_before <= now][:self.batch_size]
+        for mail in batch:
+            self._retry.remove(mail)
+        try:
+            timeout = 0 if batch else (0.5 if self._retry else self.idle_timeout)
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get(timeout=timeout) if not batch else self._queue.get_nowait())
+                timeout = 0
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            if not batch:
+                if not self._retry:
+                    self._close()
+                continue
+            self._send_batch(batch)
+
+    def _send_batch(self, batch):
+        import smtplib
+
+        try:
+            conn = self._connect()
+        except (smtplib.SMTPException, OSError) as e:
+            for mail in batch:
+                self._failed(mail, e)
+            return
+        for mail in batch:
+            try:
+                conn.sendmail(mail.message["From"], mail.recipients, mail.message.as_string())
+                mail.attempts += 1
+                self._done(mail, "sent", None)
+            except (smtplib.SMTPException, OSError) as e:
+                self._failed(mail, e)
+                if isinstance(e, (smtplib.SMTPServerDisconnected, OSError)):
+                    # Reconnect for the rest of the batch, closing the broken connection first
+                    self._close()
+                    try:
+                        conn = self._connect()
+                    except (smtplib.SMTPException, OSError):
+                        pass
+
+    def _failed(self, mail, error):
+        mail.attempts += 1
+        if _is_permanent(error):
+            logger.error("Mail to %s rejected: %s", mail.recipients, error)
+            self._done(mail, "failed", str(error))
+            return
+        if mail.attempts >= self.max_attempts:
+            logger.error("Giving up on mail to %s after %d attempts: %s", mail.recipients, mail.attempts, error)
+            self._done(mail, "failed", str(error))
+            return
+        mail.not_before = time.monotonic() + self.backoff * 2 ** (mail.attempts - 1)
+        self._retry.append(mail)
+        self._notify(mail, "retrying", str(error))
+
+    def _done(self, mail, status, error):
+        with self._lock:
+            self._outstanding -= 1
+        self._notify(mail, status, error)
+
+    def _notify(self, mail, status, error):
+        if self.on_status:
+            try:
+                self.on_status(mail, status, error)
+            except Exception:
+                logger.exception("Mail status callback failed")
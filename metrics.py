@@ -0,0 +1,254 @@
+import contextvars
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+
+logger = logging.getLogger(__name__)
+
+# --- Settings ---
+DEFAULT_SLOW_QUERY_MS = 500
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STAGE_BUCKETS = REQUEST_BUCKETS + (30, 60, 300)
+
+_current = contextvars.ContextVar("request_stats", default=None)
+_token_re = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class RequestStats:
+    """Counters for one request (or one background job), reachable through a contextvar."""
+
+    __slots__ = ("route", "started", "sql_count", "sql_time", "mongo_count", "mongo_time", "stages")
+
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.mongo_count = 0
+        self.mongo_time = 0.0
+        self.stages = {}
+
+    def server_timing(self) -> str:
+        parts = [f'db;dur={self.sql_time * 1000:.1f};desc="{self.sql_count} queries"',
+                 f'mongo;dur={self.mongo_time * 1000:.1f};desc="{self.mongo_count} commands"']
+        parts += [f"{_token_re.sub('_', name)};dur={secs * 1000:.1f}" for name, secs in self.stages.items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+# --- Prometheus registry ---
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+class Registry:
+    """Minimal counters and histograms in the Prometheus text format, per worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}    # name -> {labels: value}
+        self._histograms = {}  # name -> (buckets, {labels: [bucket counts..., sum, count]})
+        self._help = {}
+
+    def counter(self, name, help_text):
+        self._help[name] = ("counter", help_text)
+        self._counters.setdefault(name, {})
+
+    def histogram(self, name, help_text, buckets):
+        self._help[name] = ("histogram", help_text)
+        self._histograms.setdefault(name, (buckets, {}))
+
+    def inc(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        buckets, series = self._histograms[name]
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = series.get(key)
+            if values is None:
+                values = series[key] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    values[i] += 1
+            values[-2] += value
+            values[-1] += 1
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in self._counters.items():
+                lines += [f"# HELP {name} {self._help[name][1]}", f"# TYPE {name} counter"]
+                lines += [f"{name}{_labels(k)} {v}" for k, v in series.items()]
+            for name, (buckets, series) in self._histograms.items():
+                lines += [f"# HELP {name} {self._help[name][1]}", f"# TYPE {name} histogram"]
+                for k, values in series.items():
+                    for bound, count in zip(buckets, values):
+                        lines.append(f"{name}_bucket{_labels(k + (('le', bound),))} {count}")
+                    lines.append(f"{name}_bucket{_labels(k + (('le', '+Inf'),))} {values[-1]}")
+                    lines.append(f"{name}_sum{_labels(k)} {values[-2]}")
+                    lines.append(f"{name}_count{_labels(k)} {values[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+class Instrumentation:
+    """
+    Per-request SQL/Mongo counting, named stages, Server-Timing and /metrics.
+    When disabled nothing is hooked: no engine listeners, no Mongo listener and no
+    request hooks, and stage() costs one attribute check.
+    """
+
+    def __init__(self, enabled=False, slow_query_ms=DEFAULT_SLOW_QUERY_MS):
+        self.enabled = enabled
+        self.slow_query = slow_query_ms / 1000
+        self.registry = Registry()
+        r = self.registry
+        r.counter("portal_requests_total", "HTTP requests by route, method and status.")
+        r.histogram("portal_request_duration_seconds", "HTTP request latency by route.", REQUEST_BUCKETS)
+        r.counter("portal_db_queries_total", "SQL statements executed, by route.")
+        r.counter("portal_db_query_seconds_total", "Time spent in SQL statements, by route.")
+        r.counter("portal_mongo_commands_total", "MongoDB commands executed, by route.")
+        r.counter("portal_mongo_command_seconds_total", "Time spent in MongoDB commands, by route.")
+        r.counter("portal_slow_queries_total", "Queries over the slow-query threshold, by kind and route.")
+        r.histogram("portal_stage_seconds", "Duration of named stages (upload parse, insert, ...).", STAGE_BUCKETS)
+
+    # --- Flask ---
+    def init_app(self, app):
+        if not self.enabled:
+            return
+        from flask import request
+
+        @app.before_request
+        def _start_request_stats():
+            rule = request.url_rule.rule if request.url_rule else "unmatched"
+            _current.set(RequestStats(rule))
+
+        @app.after_request
+        def _finish_request_stats(response):
+            stats = _current.get()
+            if stats is None:
+                return response
+            _current.set(None)
+            elapsed = time.perf_counter() - stats.started
+            r = self.registry
+            r.inc("portal_requests_total", route=stats.route, method=request.method, status=response.status_code)
+            r.observe("portal_request_duration_seconds", elapsed, route=stats.route)
+            r.inc("portal_db_queries_total", stats.sql_count, route=stats.route)
+            r.inc("portal_db_query_seconds_total", stats.sql_time, route=stats.route)
+            r.inc("portal_mongo_commands_total", stats.mongo_count, route=stats.route)
+            r.inc("portal_mongo_command_seconds_total", stats.mongo_time, route=stats.route)
+            response.headers["Server-Timing"] = stats.server_timing()
+            return response
+
+        @app.route("/metrics")
+        def metrics():
+            return self.registry.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+    # --- SQLAlchemy ---
+    def watch_engine(self, engine):
+        if not self.enabled:
+            return
+        from sqlalchemy import event
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            starts = conn.info.get("query_start")
+            if not starts:
+                return
+            elapsed = time.perf_counter() - starts.pop()
+            stats = _current.get()
+            if stats is not None:
+                stats.sql_count += 1
+                stats.sql_time += elapsed
+            if elapsed >= self.slow_query:
+                self._slow("sql", elapsed, " ".join(statement.split())[:500], stats)
+
+    # --- PyMongo ---
+    def mongo_listeners(self) -> list:
+        """event_listeners for the MongoClient; empty when disabled."""
+        return [_MongoListener(self)] if self.enabled else []
+
+    # --- Stages ---
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record_stage(name, time.perf_counter() - started)
+
+    def timed_iter(self, iterable, name):
+        """Yield from iterable, adding the time spent producing each item to stage `name`."""
+        if not self.enabled:
+            yield from iterable
+            return
+        it = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                self._record_stage(name, time.perf_counter() - started)
+                return
+            self._record_stage(name, time.perf_counter() - started)
+            yield item
+
+    def _record_stage(self, name, elapsed):
+        stats = _current.get()
+        if stats is not None:
+            stats.stages[name] = stats.stages.get(name, 0.0) + elapsed
+        self.registry.observe("portal_stage_seconds", elapsed, stage=name)
+
+    def _slow(self, kind, elapsed, detail, stats):
+        route = stats.route if stats else "background"
+        self.registry.inc("portal_slow_queries_total", kind=kind, route=route)
+        logger.warning("Slow %s (%.0f ms) on %s: %s", kind, elapsed * 1000, route, detail)
+
+
+class _MongoListener(monitoring.CommandListener):
+    """Times commands by request_id; stats are bound when the command starts."""
+
+    def __init__(self, instrumentation):
+        self.instrumentation = instrumentation
+        self._started = {}
+
+    def started(self, event):
+        self._started[(event.connection_id, event.request_id)] = (time.perf_counter(), _current.get())
+
+    def _finish(self, event):
+        started, stats = self._started.pop((event.connection_id, event.request_id), (None, None))
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if stats is not None:
+            stats.mongo_count += 1
+            stats.mongo_time += elapsed
+        if elapsed >= self.instrumentation.slow_query:
+            self.instrumentation._slow("mongo", elapsed, f"{event.database_name}.{event.command_name}", stats)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
@@ -0,0 +1,43 @@
+import time
+
+from sqlalchemy import bindparam, text
+
+
+# --- Settings ---
+DEFAULT_DELETE_CHUNK = 5000
+DEFAULT_DELETE_PAUSE = 0.05  # seconds between chunks, so readers and replicas keep up
+
+
+def delete_in_chunks(engine, table_name: str, where: str, params: dict,
+                     chunk_size=DEFAULT_DELETE_CHUNK, pause=DEFAULT_DELETE_PAUSE, progress=None) -> int:
+    """
+    DELETE FROM table WHERE <where>, a bounded primary-key chunk per short transaction,
+    so row locks are held for one chunk at a time instead of the whole cleanup.
+    `where` should be served by an index. `progress(deleted_so_far)` runs after every chunk.
+    """
+    select_ids = text(f"SELECT `id` FROM `{table_name}` WHERE {where} ORDER BY `id` LIMIT :chunk_size")
+    delete_ids = text(f"DELETE FROM `{table_name}` WHERE `id` IN :ids").bindparams(
+        bindparam("ids", expanding=True))
+    deleted = 0
+    while True:
+        with engine.begin() as conn:
+            ids = [r[0] for r in conn.execute(select_ids, {**params, "chunk_size": chunk_size})]
+            if not ids:
+                return deleted
+            deleted += conn.execute(delete_ids, {"ids": ids}).rowcount
+        if progress:
+            progress(deleted)
+        if len(ids) < chunk_size:
+            return deleted
+        if pause:
+            time.sleep(pause)
+
+
+def count_rows(engine, table_name: str) -> int:
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM `{table_name}`")).scalar()
+
+
+def drop_table(engine, table_name: str):
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS `{table_name}`"))
@@ -0,0 +1,282 @@
+import os
+import pickle
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+
+# --- Settings ---
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_PARSE_WORKERS = min(4, os.cpu_count() or 1)
+SPREADSHEET_EXTS = (".xlsx", ".xlsm", ".xls", ".csv")
+# Zip bomb guards: uncompressed bytes extracted from one archive, and entries it may list
+DEFAULT_MAX_ZIP_BYTES = 1024 * 1024 * 1024
+DEFAULT_MAX_ZIP_MEMBERS = 500
+
+
+# --- Utilities ---
+def header_names(raw_headers, rename, reserved=()):
+    """
+    Build column names the way pd.read_excel + the upload cleaning did:
+    strip, name blank headers "Unnamed: <i>", de-duplicate ("a", "a.1") and
+    finally map each through `rename` (safe_colname) and unique_names.
+    """
+    seen = {}
+    names = []
+    for i, raw in enumerate(raw_headers):
+        name = str(raw).strip() if raw is not None and str(raw).strip() else f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(rename(name))
+    return unique_names(names, reserved)
+
+
+def unique_names(names, reserved=()):
+    """
+    Suffix names that repeat after renaming ("a b" and "a_b"), or that clash with
+    `reserved` (a project table's meta columns), with _1, _2, ... Compared
+    case-insensitively, as MySQL compares column names.
+    """
+    taken = {r.lower() for r in reserved}
+    unique = []
+    for name in names:
+        candidate, n = name, 0
+        while candidate.lower() in taken:
+            n += 1
+            candidate = f"{name}_{n}"
+        taken.add(candidate.lower())
+        unique.append(candidate)
+    return unique
+
+
+def prune_chunk(columns, rows):
+    """
+    Drop all-empty rows and all-empty columns from one chunk.
+    Takes and returns rows as tuples, in the pruned column order.
+    """
+    rows = [r for r in rows if any(v is not None for v in r)]
+    keep = [i for i in range(len(columns)) if any(r[i] is not None for r in rows)]
+    if len(keep) == len(columns):
+        return list(columns), rows
+    return [columns[i] for i in keep], [tuple(r[i] for i in keep) for r in rows]
+
+
+def frame_rows(df):
+    """
+    Row tuples of a DataFrame in column order, NaN/NaT/NA already None. Each column is
+    converted once (vectorized) instead of cleaning every cell in Python, and without
+    the full copy `df.where(pd.notna(df), None)` would make.
+    """
+    columns = [df.iloc[:, i].to_numpy(dtype=object, na_value=None) for i in range(df.shape[1])]
+    return zip(*columns)
+
+
+def _chunks(columns, row_iter, chunk_size):
+    """`row_iter` yields tuples whose missing values are already None (openpyxl, frame_rows)."""
+    chunk = []
+    width = len(columns)
+    for row in row_iter:
+        if len(row) != width:
+            row = row[:width] + (None,) * (width - len(row))
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            cols, rows = prune_chunk(columns, chunk)
+            if rows:
+                yield cols, rows
+            chunk = []
+    if chunk:
+        cols, rows = prune_chunk(columns, chunk)
+        if rows:
+            yield cols, rows
+
+
+def iter_xlsx_batches(file, rename, chunk_size=DEFAULT_CHUNK_SIZE, sheet_name=None, reserved=()):
+    """Stream the first (or named) sheet of an .xlsx through openpyxl's read-only mode."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        raw_headers = next(rows, None)
+        if not raw_headers:
+            return
+        yield from _chunks(header_names(raw_headers, rename, reserved), rows, chunk_size)
+    finally:
+        wb.close()
+
+
+def iter_csv_batches(file, rename, chunk_size=DEFAULT_CHUNK_SIZE, reserved=()):
+    """Stream a CSV with pandas' chunked reader."""
+    import pandas as pd
+
+    for df in pd.read_csv(file, chunksize=chunk_size):
+        columns = header_names(df.columns, rename, reserved)
+        yield from _chunks(columns, frame_rows(df), chunk_size)
+
+
+def iter_xls_batches(file, rename, chunk_size=DEFAULT_CHUNK_SIZE, sheet_name=None, reserved=()):
+    """Legacy .xls has no streaming reader; load it once and hand it out in chunks."""
+    import pandas as pd
+
+    df = pd.read_excel(file, sheet_name=sheet_name or 0)
+    columns = header_names(df.columns, rename, reserved)
+    yield from _chunks(columns, frame_rows(df), chunk_size)
+
+
+def iter_row_batches(file, file_name: str, rename, chunk_size=DEFAULT_CHUNK_SIZE, sheet_name=None, reserved=()):
+    """
+    Yield (columns, rows) chunks from an uploaded spreadsheet without loading it whole.
+    Column names go through `rename` and are suffixed away from `reserved` names;
+    all-empty rows/columns are pruned per chunk, so `columns` can differ between
+    chunks. Workbooks default to their first sheet.
+    """
+    ext = os.path.splitext(file_name or "")[1].lower()
+    if ext == ".csv":
+        return iter_csv_batches(file, rename, chunk_size, reserved)
+    if ext == ".xls":
+        return iter_xls_batches(file, rename, chunk_size, sheet_name, reserved)
+    return iter_xlsx_batches(file, rename, chunk_size, sheet_name, reserved)
+
+
+# --- Multi-sheet / multi-file uploads ---
+def expand_sources(path, file_name, extract_dir, max_bytes=DEFAULT_MAX_ZIP_BYTES,
+                   max_members=DEFAULT_MAX_ZIP_MEMBERS):
+    """
+    List the spreadsheets in one uploaded file as (path, display_name): the file itself,
+    or every spreadsheet member of a zip archive, extracted under `extract_dir`.
+    Raises ValueError when an archive lists more than `max_members` entries or would
+    extract more than `max_bytes`, by its declared sizes or by the bytes actually written.
+    """
+    if os.path.splitext(file_name or "")[1].lower() != ".zip":
+        return [(path, file_name)]
+    too_big = f"{file_name}: archive expands to more than {max_bytes // (1024 * 1024)} MB"
+    sources, declared, written = [], 0, 0
+    with zipfile.ZipFile(path) as zf:
+        infos = zf.infolist()
+        if len(infos) > max_members:
+            raise ValueError(f"{file_name}: archive has {len(infos)} entries, at most {max_members} allowed")
+        for i, info in enumerate(infos):
+            member = info.filename
+            base = os.path.basename(member)
+            if info.is_dir() or member.startswith("__MACOSX/") or base.startswith("."):
+                continue
+            if os.path.splitext(base)[1].lower() not in SPREADSHEET_EXTS:
+                continue
+            declared += info.file_size
+            if declared > max_bytes:
+                raise ValueError(too_big)
+            # Never trust member paths; extract to a flat, numbered name
+            target = os.path.join(extract_dir, f"{i}_{base}")
+            with zf.open(info) as src, open(target, "wb") as dst:
+                while True:
+                    data = src.read(1024 * 1024)
+                    if not data:
+                        break
+                    # Declared sizes can lie; count what actually comes out
+                    written += len(data)
+                    if written > max_bytes:
+                        raise ValueError(too_big)
+                    dst.write(data)
+            sources.append((target, f"{file_name}/{member}"))
+    return sources
+
+
+def sheet_names(path, file_name) -> list:
+    """Sheet names of a workbook; [None] for CSV."""
+    ext = os.path.splitext(file_name or "")[1].lower()
+    if ext == ".csv":
+        return [None]
+    if ext == ".xls":
+        import pandas as pd
+        with pd.ExcelFile(path) as xls:
+            return list(xls.sheet_names)
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def spool_sheet(path, file_name, sheet_name, chunk_size, spool_path, infer_types=False):
+    """
+    Process-pool task: parse one sheet into a pickle spool file, one (columns, rows)
+    record per chunk, so the parent can insert it without holding it in memory.
+    Column names are returned as read (de-duplicated, not renamed).
+    """
+    started = time.perf_counter()
+    batches = iter_row_batches(path, file_name, str, chunk_size, sheet_name)
+    columns, types, rows = spool_batches(batches, spool_path, infer_types)
+    return {"file_name": file_name, "sheet": sheet_name, "columns": columns, "types": types,
+            "rows": rows, "spool": spool_path, "seconds": time.perf_counter() - started}
+
+
+def spool_batches(batches, spool_path, infer_types=False):
+    """
+    Write (columns, rows) chunks to a pickle spool, one record per chunk, collecting
+    what the schema needs before anything is inserted: the union of their columns
+    (first-seen order) and, with `infer_types`, each column's widened type.
+    Returns (columns, types, rows).
+    """
+    from schema import infer_column_types, widen_type
+
+    columns, types, rows = [], {}, 0
+    with open(spool_path, "wb") as out:
+        for cols, chunk in batches:
+            pickle.dump((cols, chunk), out, protocol=pickle.HIGHEST_PROTOCOL)
+            rows += len(chunk)
+            columns += [c for c in cols if c not in columns]
+            if infer_types:
+                for col, col_type in infer_column_types(cols, chunk).items():
+                    types[col] = widen_type(types[col], col_type) if col in types else col_type
+    return columns, types, rows
+
+
+def iter_spool(spool_path):
+    with open(spool_path, "rb") as fh:
+        while True:
+            try:
+                yield pickle.load(fh)
+            except EOFError:
+                return
+
+
+def parse_sheets(units, spool_dir, workers=DEFAULT_PARSE_WORKERS, chunk_size=DEFAULT_CHUNK_SIZE,
+                 infer_types=False, start_method="spawn"):
+    """
+    Spool every (path, file_name, sheet_name) unit in parallel on a process pool, which
+    sidesteps the GIL for openpyxl. Results come back in unit order; the first failing
+    sheet raises ValueError naming it. `start_method="spawn"` keeps workers clear of the
+    parent's threads and connections.
+    """
+    args = [(path, name, sheet, chunk_size, os.path.join(spool_dir, f"{i}.pkl"), infer_types)
+            for i, (path, name, sheet) in enumerate(units)]
+    if workers <= 1 or len(units) == 1:
+        results = []
+        for a in args:
+            try:
+                results.append(spool_sheet(*a))
+            except Exception as e:
+                raise ValueError(f"{sheet_label(a[1], a[2])}: {e}") from e
+        return results
+    with ProcessPoolExecutor(min(workers, len(units)), mp_context=get_context(start_method)) as pool:
+        futures = [pool.submit(spool_sheet, *a) for a in args]
+        results = []
+        for a, future in zip(args, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                for f in futures:
+                    f.cancel()
+                raise ValueError(f"{sheet_label(a[1], a[2])}: {e}") from e
+        return results
+
+
+def sheet_label(file_name, sheet_name):
+    """Display name of one parsed unit, e.g. "book.xlsx [March]"."""
+    return f"{file_name} [{sheet_name}]" if sheet_name else file_name
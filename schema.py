@@ -0,0 +1,236 @@
+import datetime
+import re
+import threading
+import time
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+
+# --- Settings ---
+# Other workers may change DDL too; bound how long a stale entry can live.
+DEFAULT_SCHEMA_TTL = 60
+
+
+class SchemaCache:
+    """
+    Per-process cache of table names and column lists, so page views do not
+    hit information_schema. Entries expire after `ttl` seconds and are dropped
+    explicitly whenever this process changes DDL.
+    """
+
+    def __init__(self, ttl=DEFAULT_SCHEMA_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._tables = None
+        self._tables_at = 0.0
+        self._columns = {}
+
+    def _fresh(self, loaded_at):
+        return time.monotonic() - loaded_at < self.ttl
+
+    def table_names(self, engine) -> set:
+        with self._lock:
+            if self._tables is not None and self._fresh(self._tables_at):
+                return self._tables
+        names = set(inspect(engine).get_table_names())
+        with self._lock:
+            self._tables, self._tables_at = names, time.monotonic()
+        return names
+
+    def has_table(self, engine, table_name: str) -> bool:
+        return table_name in self.table_names(engine)
+
+    def _load(self, engine, table_name: str):
+        with self._lock:
+            entry = self._columns.get(table_name)
+            if entry and self._fresh(entry[2]):
+                return entry
+        if not self.has_table(engine, table_name):
+            return [], {}, 0.0
+        reflected = inspect(engine).get_columns(table_name)
+        entry = ([c["name"] for c in reflected],
+                 {c["name"]: normalize_type(c["type"]) for c in reflected},
+                 time.monotonic())
+        with self._lock:
+            self._columns[table_name] = entry
+        return entry
+
+    def columns(self, engine, table_name: str) -> list:
+        """Column names in table order; [] when the table does not exist."""
+        return self._load(engine, table_name)[0]
+
+    def column_types(self, engine, table_name: str) -> dict:
+        """Column name -> normalized SQL type ("BIGINT", "VARCHAR(64)", "TEXT", ...)."""
+        return self._load(engine, table_name)[1]
+
+    def columns_added(self, table_name: str, columns, col_types=None):
+        """Record DDL this process just ran; `col_types` also covers modified columns."""
+        col_types = col_types or {}
+        with self._lock:
+            entry = self._columns.get(table_name)
+            if entry:
+                names = entry[0] + [c for c in columns if c not in entry[0]]
+                types = dict(entry[1])
+                types.update({c: col_types.get(c, "TEXT") for c in columns})
+                types.update(col_types)
+                self._columns[table_name] = (names, types, entry[2])
+
+    def invalidate(self, *table_names):
+        """Forget the given tables (and the table list); no names clears everything."""
+        with self._lock:
+            self._tables = None
+            if table_names:
+                for name in table_names:
+                    self._columns.pop(name, None)
+            else:
+                self._columns.clear()
+
+
+# --- Type inference ---
+VARCHAR_SIZES = (32, 64, 128, 255, 512, 1024)
+_TYPE_RE = re.compile(r"^\s*([A-Z]+)(?:\((\d+)\))?")
+_INT_TYPES = {"TINYINT", "SMALLINT", "MEDIUMINT", "INT", "INTEGER", "BIGINT"}
+_FLOAT_TYPES = {"FLOAT", "DOUBLE", "REAL", "DECIMAL", "NUMERIC"}
+
+
+def normalize_type(sql_type) -> str:
+    """Reduce a reflected/declared type to BIGINT, DOUBLE, DATETIME, VARCHAR(n) or TEXT."""
+    m = _TYPE_RE.match(str(sql_type).upper())
+    if not m:
+        return "TEXT"
+    name, size = m.group(1), m.group(2)
+    if name in _INT_TYPES:
+        return "BIGINT"
+    if name in _FLOAT_TYPES:
+        return "DOUBLE"
+    if name in ("DATETIME", "TIMESTAMP", "DATE"):
+        return "DATETIME"
+    if name in ("VARCHAR", "CHAR") and size:
+        return f"VARCHAR({size})"
+    return "TEXT"
+
+
+def _varchar_for(length: int) -> str:
+    for size in VARCHAR_SIZES:
+        if length <= size:
+            return f"VARCHAR({size})"
+    return "TEXT"
+
+
+def _value_type(value) -> str:
+    if isinstance(value, int):
+        return "BIGINT"
+    if isinstance(value, float):
+        return "DOUBLE"
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return "DATETIME"
+    return _varchar_for(len(str(value)))
+
+
+def widen_type(current, new) -> str:
+    """Smallest type that holds both; never narrows. None means "no type yet"."""
+    if current is None or current == new:
+        return new or current
+    if new is None:
+        return current
+    if "TEXT" in (current, new):
+        return "TEXT"
+    if {current, new} == {"BIGINT", "DOUBLE"}:
+        return "DOUBLE"
+    # Anything else becomes a string wide enough for both sides
+    sizes = [int(t[8:-1]) if t.startswith("VARCHAR") else 32 for t in (current, new)]
+    return _varchar_for(max(sizes))
+
+
+def infer_column_types(columns, rows) -> dict:
+    """Infer one SQL type per column from a chunk of row tuples (NULLs are ignored)."""
+    types = dict.fromkeys(columns)
+    for row in rows:
+        for col, value in zip(columns, row):
+            if value is not None:
+                types[col] = widen_type(types[col], _value_type(value))
+    return {c: t or "TEXT" for c, t in types.items()}
+
+
+def alter_table(session, table_name: str, clauses):
+    """
+    Run all clauses as one ALTER TABLE. SQLite (local benchmarks) takes a single
+    ADD COLUMN per statement, so there they run one by one.
+    """
+    if session.get_bind().dialect.name == "sqlite":
+        for clause in clauses:
+            session.execute(text(f"ALTER TABLE `{table_name}` {clause}"))
+    else:
+        session.execute(text(f"ALTER TABLE `{table_name}` {', '.join(clauses)}"))
+
+
+def sync_typed_columns(session, cache, table_name: str, columns, rows, reserved=()):
+    """
+    Typed-mode counterpart of add_missing_columns: infer types for the chunk, then
+    ADD new columns and MODIFY columns whose values no longer fit, in one ALTER.
+    Returns {column: type} for every column that changed.
+    """
+    return sync_column_types(session, cache, table_name, infer_column_types(columns, rows), reserved)
+
+
+def sync_column_types(session, cache, table_name: str, col_types, reserved=()):
+    """sync_typed_columns for already inferred (e.g. merged across sheets) {column: type}."""
+    engine = session.get_bind()
+    for attempt in (1, 2):
+        existing = cache.column_types(engine, table_name)
+        changes, clauses = {}, []
+        for col, col_type in col_types.items():
+            if col in reserved:
+                continue
+            if col not in existing:
+                changes[col] = col_type
+                clauses.append(f"ADD COLUMN `{col}` {col_type}")
+            else:
+                wider = widen_type(existing[col], col_type)
+                if wider != existing[col]:
+                    changes[col] = wider
+                    clauses.append(f"MODIFY COLUMN `{col}` {wider}")
+        if not clauses:
+            return {}
+        try:
+            alter_table(session, table_name, clauses)
+            session.commit()
+        except (OperationalError, ProgrammingError):
+            session.rollback()
+            cache.invalidate(table_name)
+            if attempt == 2:
+                raise
+            continue
+        cache.columns_added(table_name, [c for c in changes if c not in existing], changes)
+        return changes
+    return {}
+
+
+def add_missing_columns(session, cache, table_name: str, columns, reserved=(), col_type="TEXT"):
+    """
+    Add every column not yet on the table in ONE `ALTER TABLE ... ADD COLUMN a, ADD COLUMN b`,
+    so MySQL rebuilds the table once. If another worker got there first, refresh and retry.
+    Returns the list of columns that were added.
+    """
+    engine = session.get_bind()
+    for attempt in (1, 2):
+        existing = set(cache.columns(engine, table_name))
+        missing = []
+        for col in columns:
+            if col not in existing and col not in reserved and col not in missing:
+                missing.append(col)
+        if not missing:
+            return []
+        try:
+            alter_table(session, table_name, [f"ADD COLUMN `{c}` {col_type}" for c in missing])
+            session.commit()
+        except (OperationalError, ProgrammingError):
+            session.rollback()
+            cache.invalidate(table_name)
+            if attempt == 2:
+                raise
+            continue
+        cache.columns_added(table_name, missing, {c: normalize_type(col_type) for c in missing})
+        return missing
+    return []
@@ -0,0 +1,176 @@
+import datetime
+import re
+import time
+
+from sqlalchemy import text
+
+from grid import _jsonable
+
+
+# --- Settings ---
+SEARCH_COL = "search_text"
+SEARCH_INDEX = "idx_search_text"
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+# Ranked results page by offset; deep pages re-rank everything before them
+MAX_SEARCH_OFFSET = 1000
+MAX_SEARCH_TERMS = 8
+DEFAULT_BACKFILL_CHUNK = 2000
+
+_TERM = re.compile(r"\w+")
+
+
+def fts_table(table_name: str) -> str:
+    """The SQLite FTS5 table indexing a project table's search_text."""
+    return f"{table_name}_fts"
+
+
+# --- Documents ---
+def _text(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat(" ") if isinstance(value, datetime.datetime) else value.isoformat()
+    return str(value)
+
+
+def search_document(values) -> str:
+    """What gets indexed for one row: its non-empty data values, space separated."""
+    return " ".join(_text(v) for v in values if v is not None and v != "")
+
+
+def with_search_documents(rows, data_width: int):
+    """Append each row's search_document (built from its first `data_width` values)."""
+    for row in rows:
+        yield row + (search_document(row[:data_width]),)
+
+
+# --- Index maintenance ---
+def ensure_search_column(session, cache, table_name):
+    """
+    Add search_text and its full-text index; only `flask build-search-index` calls this,
+    since on MySQL adding the first FULLTEXT index rebuilds the whole table.
+    MySQL: a FULLTEXT index on the column, maintained by InnoDB.
+    SQLite (local benchmarks): an external-content FTS5 table kept in step by triggers.
+    Rows stored before this ran have no search_text until backfill_search_text fills it in.
+    """
+    from schema import alter_table
+
+    if SEARCH_COL in cache.columns(session.get_bind(), table_name):
+        return
+    if session.get_bind().dialect.name == "sqlite":
+        fts = fts_table(table_name)
+        alter_table(session, table_name, [f"ADD COLUMN `{SEARCH_COL}` TEXT"])
+        session.execute(text(f"CREATE VIRTUAL TABLE IF NOT EXISTS `{fts}` USING fts5("
+                             f"`{SEARCH_COL}`, content='{table_name}', content_rowid='id')"))
+        # Only rows with search_text are in the FTS table: a 'delete' for a row it never
+        # indexed (one stored before the index, not yet backfilled) corrupts it
+        insert = (f"INSERT INTO `{fts}` (rowid, `{SEARCH_COL}`) "
+                  f"SELECT new.id, new.`{SEARCH_COL}` WHERE new.`{SEARCH_COL}` IS NOT NULL;")
+        delete = (f"INSERT INTO `{fts}` (`{fts}`, rowid, `{SEARCH_COL}`) "
+                  f"SELECT 'delete', old.id, old.`{SEARCH_COL}` WHERE old.`{SEARCH_COL}` IS NOT NULL;")
+        for name, event, body in (("ai", "AFTER INSERT", insert), ("ad", "AFTER DELETE", delete),
+                                  ("au", f"AFTER UPDATE OF `{SEARCH_COL}`", delete + " " + insert)):
+            session.execute(text(f"CREATE TRIGGER IF NOT EXISTS `{fts}_{name}` {event} ON `{table_name}` "
+                                 f"BEGIN {body} END"))
+    else:
+        alter_table(session, table_name, [f"ADD COLUMN `{SEARCH_COL}` MEDIUMTEXT",
+                                          f"ADD FULLTEXT INDEX `{SEARCH_INDEX}` (`{SEARCH_COL}`)"])
+    session.commit()
+    cache.columns_added(table_name, [SEARCH_COL], {SEARCH_COL: "TEXT"})
+
+
+def drop_search_index(engine, table_name):
+    """Drop the FTS5 table left behind by a dropped project table (MySQL drops its index with the table)."""
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS `{fts_table(table_name)}`"))
+
+
+def backfill_search_text(engine, table_name, data_cols, chunk_size=DEFAULT_BACKFILL_CHUNK, progress=None) -> int:
+    """
+    Fill search_text for rows stored before the index existed, walking the primary key
+    one chunk per transaction. `progress(rows_so_far)` runs after every chunk.
+    """
+    select_sql = ", ".join(f"`{c}`" for c in ["id", *data_cols])
+    select_rows = text(f"SELECT {select_sql} FROM `{table_name}` "
+                       f"WHERE `id` > :after AND `{SEARCH_COL}` IS NULL ORDER BY `id` LIMIT :chunk_size")
+    update = text(f"UPDATE `{table_name}` SET `{SEARCH_COL}` = :doc WHERE `id` = :id")
+    done, after = 0, 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(select_rows, {"after": after, "chunk_size": chunk_size}).all()
+            if not rows:
+                return done
+            conn.execute(update, [{"id": r[0], "doc": search_document(r[1:])} for r in rows])
+        done += len(rows)
+        after = rows[-1][0]
+        if progress:
+            progress(done)
+
+
+# --- Queries ---
+def search_terms(query: str) -> list:
+    """Lower-cased words of the query; operators and punctuation never reach the index."""
+    return _TERM.findall((query or "").lower())[:MAX_SEARCH_TERMS]
+
+
+def match_expression(terms, dialect: str) -> str:
+    """Every term required, each as a prefix: `+inv* +2024*` (MySQL), `"inv"* "2024"*` (FTS5)."""
+    if dialect == "sqlite":
+        return " ".join(f'"{t}"*' for t in terms)
+    return " ".join(f"+{t}*" for t in terms)
+
+
+def build_search_query(table_name, table_cols, user, columns, terms, dialect, limit, offset):
+    """
+    Ranked full-text matches among the user's rows, best first, LIMIT n+1 so the caller
+    knows whether there is a next page. Only names in `table_cols` are interpolated.
+    """
+    unknown = [c for c in columns if c not in set(table_cols)]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    select_sql = ", ".join(f"t.`{c}`" for c in ["id", *columns])
+    params = {"q": match_expression(terms, dialect), "user": user, "limit": limit + 1, "offset": offset}
+    if dialect == "sqlite":
+        fts = fts_table(table_name)
+        sql = (f"SELECT {select_sql}, -bm25(`{fts}`) AS score FROM `{fts}` "
+               f"JOIN `{table_name}` t ON t.`id` = `{fts}`.rowid "
+               f"WHERE `{fts}` MATCH :q AND t.`uploaded_by` = :user "
+               f"ORDER BY score DESC, t.`id` DESC LIMIT :limit OFFSET :offset")
+    else:
+        match = f"MATCH(t.`{SEARCH_COL}`) AGAINST (:q IN BOOLEAN MODE)"
+        sql = (f"SELECT {select_sql}, {match} AS score FROM `{table_name}` t "
+               f"WHERE {match} AND t.`uploaded_by` = :user "
+               f"ORDER BY score DESC, t.`id` DESC LIMIT :limit OFFSET :offset")
+    return text(sql), params
+
+
+def search_rows(session, table_name, table_cols, user, columns, query,
+                limit=DEFAULT_SEARCH_LIMIT, offset=0):
+    """Run build_search_query and shape the JSON payload (rows as lists in `columns` order)."""
+    terms = search_terms(query)
+    if not terms:
+        raise ValueError("Enter at least one word to search for")
+    limit = min(max(int(limit), 1), MAX_SEARCH_LIMIT)
+    offset = max(int(offset), 0)
+    if offset > MAX_SEARCH_OFFSET:
+        raise ValueError(f"Search results are limited to the first {MAX_SEARCH_OFFSET} matches")
+    stmt, params = build_search_query(table_name, table_cols, user, columns, terms,
+                                      session.get_bind().dialect.name, limit, offset)
+    started = time.perf_counter()
+    rows = session.execute(stmt, params).mappings().all()
+    took_ms = round((time.perf_counter() - started) * 1000, 1)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "query": " ".join(terms),
+        "columns": columns,
+        "rows": [[_jsonable(r[c]) for c in columns] for r in rows],
+        "ids": [r["id"] for r in rows],
+        "scores": [round(float(r["score"]), 4) for r in rows],
+        "offset": offset,
+        "next_offset": offset + limit if has_more and offset + limit <= MAX_SEARCH_OFFSET else None,
+        "limit": limit,
+        "took_ms": took_ms,
+    }
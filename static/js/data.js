@@ -1,19 +1,120 @@
 $(document).ready(function() {
-    // Uploaded Table
-    $('#uploadedTable').DataTable({
-        fixedHeader: true,
-        scrollX: true,
-        scrollY: '270px',
-        scrollCollapse: true,
-        paging: true,
-        pageLength: 10,
-        lengthMenu: [[5, 10, 15, 20], [5, 10, 15, 20]],
-        order: [[2, "desc"]],
-        dom: '<"row align-items-center mb-3"<"col-sm-3"l><"col-sm-6 text-center"r><"col-sm-3"f>><"row"<"col-sm-12"t>><"row mt-3"<"col-sm-6"i><"col-sm-6 text-end"p>>'
+    // Uploaded Table: one keyset page at a time from /api/data/<project>,
+    // or ranked full-text matches from /api/search/<project> while a search is typed
+    const grid = {
+        $table: $('#uploadedTable'),
+        project: $('#uploadedTable').data('project'),
+        sort: 'upload_time',
+        order: 'desc',
+        filters: {},
+        search: '',
+        cursors: [null],   // cursor (offset when searching) for each visited page; the last entry is the current page
+        nextCursor: null
+    };
+
+    function loadGridPage() {
+        if (!grid.project) {
+            return;
+        }
+        const cursor = grid.cursors[grid.cursors.length - 1];
+        let url;
+        if (grid.search) {
+            const params = new URLSearchParams({
+                q: grid.search,
+                limit: Math.min($('#gridPageSize').val(), 100),
+                offset: cursor || 0
+            });
+            url = '/api/search/' + encodeURIComponent(grid.project) + '?' + params.toString();
+        } else {
+            const params = new URLSearchParams({
+                sort: grid.sort,
+                order: grid.order,
+                limit: $('#gridPageSize').val()
+            });
+            if (cursor) {
+                params.set('cursor', cursor);
+            }
+            Object.entries(grid.filters).forEach(([col, value]) => {
+                if (value) {
+                    params.set('f_' + col, value);
+                }
+            });
+            url = '/api/data/' + encodeURIComponent(grid.project) + '?' + params.toString();
+        }
+
+        fetch(url)
+        .then(res => res.json())
+        .then(page => {
+            const columns = grid.$table.find('th.grid-sort').map(function () { return $(this).data('col'); }).get();
+            const $body = grid.$table.find('tbody').empty();
+            if (page.error) {
+                $body.append($('<tr>').append($('<td>').attr('colspan', columns.length).text(page.error)));
+                return;
+            }
+            page.rows.forEach(row => {
+                const $tr = $('<tr>');
+                columns.forEach(col => {
+                    const idx = page.columns.indexOf(col);
+                    $tr.append($('<td>').text(idx >= 0 && row[idx] !== null ? row[idx] : ''));
+                });
+                $body.append($tr);
+            });
+            if (!page.rows.length) {
+                $body.append($('<tr>').append($('<td>').attr('colspan', columns.length).addClass('text-center text-muted').text('No records found')));
+            }
+            grid.nextCursor = grid.search ? page.next_offset : page.next_cursor;
+            $('#gridPrev').prop('disabled', grid.cursors.length <= 1);
+            $('#gridNext').prop('disabled', !grid.nextCursor);
+            $('#gridInfo').text('Page ' + grid.cursors.length + ' · ' + page.rows.length + ' rows' +
+                (grid.search ? ' matching "' + page.query + '" · ' + page.took_ms + ' ms' : ''));
+        });
+    }
+
+    function resetGrid() {
+        grid.cursors = [null];
+        loadGridPage();
+    }
+
+    $('#gridNext').on('click', function () {
+        if (grid.nextCursor) {
+            grid.cursors.push(grid.nextCursor);
+            loadGridPage();
+        }
+    });
+
+    $('#gridPrev').on('click', function () {
+        if (grid.cursors.length > 1) {
+            grid.cursors.pop();
+            loadGridPage();
+        }
+    });
+
+    $('#gridPageSize').on('change', resetGrid);
+
+    grid.$table.on('click', 'th.grid-sort', function () {
+        const col = $(this).data('col');
+        grid.order = (grid.sort === col && grid.order === 'asc') ? 'desc' : 'asc';
+        grid.sort = col;
+        grid.$table.find('.sort-indicator').text('');
+        $(this).find('.sort-indicator').text(grid.order === 'asc' ? '▲' : '▼');
+        resetGrid();
+    });
+
+    let filterTimer = null;
+    grid.$table.on('input', '.grid-filter', function () {
+        grid.filters[$(this).data('col')] = $(this).val().trim();
+        clearTimeout(filterTimer);
+        filterTimer = setTimeout(resetGrid, 300);
     });
 
-    $('.dataTables_wrapper .dataTables_length').parent().next('.text-center')
-        .html('<div class="fw-bold fs-5">📜 Your Uploaded Records</div>');
+    let searchTimer = null;
+    $('#gridSearch').on('input', function () {
+        grid.search = $(this).val().trim();
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(resetGrid, 300);
+    });
+
+    loadGridPage();
 
     // Grouped Table
     $('#groupedTable').DataTable({
@@ -37,6 +138,135 @@ $(document).ready(function() {
         width: '100%'
     });
 
+    // Background upload: submit the file, then poll the job until it finishes
+    $('#uploadForm').on('submit', function (e) {
+        e.preventDefault();
+        const form = this;
+        const $button = $(form).find('button[type="submit"]');
+        $button.prop('disabled', true);
+        showUploadStatus('Uploading file...', 'bg-primary');
+
+        fetch(form.action, {
+            method: 'POST',
+            body: new FormData(form),
+            headers: { 'Accept': 'application/json' }
+        })
+        .then(res => res.json().then(data => ({ ok: res.ok, data: data })))
+        .then(({ ok, data }) => {
+            if (!ok) {
+                throw new Error(data.error || 'Upload failed');
+            }
+            pollUploadJob(data.job_id, $button);
+        })
+        .catch(err => {
+            showUploadStatus('❌ ' + err.message, 'bg-danger');
+            $button.prop('disabled', false);
+        });
+    });
+
+    // Replace an earlier batch: the next upload swaps it out in one transaction
+    $(document).on('click', '.replace-batch', function (e) {
+        e.preventDefault();
+        $('#replaceFileName').val($(this).data('file-name'));
+        $('#replaceUploadTime').val($(this).data('upload-time'));
+        $('#replaceLabel').text($(this).data('file-name') + ' (' + $(this).data('upload-time') + ')');
+        $('#replaceNotice').removeClass('d-none');
+        $('#uploadForm input[type="file"]').trigger('focus');
+    });
+
+    $('#replaceCancel').on('click', function (e) {
+        e.preventDefault();
+        $('#replaceFileName, #replaceUploadTime').val('');
+        $('#replaceNotice').addClass('d-none');
+    });
+
+    // Delete a batch: runs as a background job, removing rows in chunks
+    $(document).on('click', '.delete-batch', function (e) {
+        e.preventDefault();
+        const $link = $(this);
+        const label = $link.data('file-name') + ' (' + $link.data('upload-time') + ')';
+        if (!confirm('Delete all rows uploaded from ' + label + '?')) {
+            return;
+        }
+        const body = new FormData();
+        body.append('project_name', $link.data('project'));
+        body.append('file_name', $link.data('file-name'));
+        body.append('upload_time', $link.data('upload-time'));
+        showUploadStatus('Deleting ' + label + '...', 'bg-warning');
+
+        fetch('/data/batches/delete', {
+            method: 'POST',
+            body: body,
+            headers: { 'Accept': 'application/json' }
+        })
+        .then(res => res.json().then(data => ({ ok: res.ok, data: data })))
+        .then(({ ok, data }) => {
+            if (!ok) {
+                throw new Error(data.error || 'Delete failed');
+            }
+            pollDeleteJob(data.job_id, label);
+        })
+        .catch(err => showUploadStatus('❌ ' + err.message, 'bg-danger'));
+    });
+
+    function pollDeleteJob(jobId, label) {
+        fetch('/data/jobs/' + jobId, { headers: { 'Accept': 'application/json' } })
+        .then(res => res.json())
+        .then(job => {
+            if (job.status === 'done') {
+                showUploadStatus('✅ ' + job.rows_processed + ' rows from ' + label + ' deleted.', 'bg-success');
+                setTimeout(() => window.location.reload(), 1000);
+            } else if (job.status === 'failed') {
+                showUploadStatus('❌ ' + (job.error || 'Delete failed'), 'bg-danger');
+            } else {
+                showUploadStatus('Deleting ' + label + ': ' + job.rows_processed + ' rows removed', 'bg-warning');
+                setTimeout(() => pollDeleteJob(jobId, label), 1000);
+            }
+        })
+        .catch(() => setTimeout(() => pollDeleteJob(jobId, label), 3000));
+    }
+
+    function showUploadStatus(message, barClass) {
+        $('#uploadStatus').removeClass('d-none');
+        $('#uploadProgressBar').attr('class', 'progress-bar progress-bar-striped progress-bar-animated w-100 ' + barClass);
+        $('#uploadStatusText').text(message);
+    }
+
+    function pollUploadJob(jobId, $button) {
+        fetch('/data/jobs/' + jobId, { headers: { 'Accept': 'application/json' } })
+        .then(res => res.json())
+        .then(job => {
+            if (job.status === 'done') {
+                showUploadStatus('✅ ' + job.rows_processed + ' rows from ' + job.file_name + ' saved.', 'bg-success');
+                const detailed = job.sheets.length > 1 || job.sheets.some(s => s.skipped || s.duplicates);
+                if (detailed) {
+                    // Per-sheet row counts for multi-sheet / multi-file uploads
+                    const $list = $('<ul class="small mb-0 mt-2"></ul>');
+                    job.sheets.forEach(s => {
+                        let line = s.file_name + (s.sheet ? ' [' + s.sheet + ']' : '') + ': ';
+                        line += s.skipped ? 'skipped, ' + s.skipped : s.rows + ' rows';
+                        if (s.duplicates) {
+                            line += ' (' + s.duplicates + ' duplicate rows skipped)';
+                        }
+                        $('<li></li>').text(line).appendTo($list);
+                    });
+                    $('#uploadStatusText').append($list);
+                }
+                setTimeout(() => window.location.reload(), detailed ? 5000 : 1000);
+            } else if (job.status === 'failed') {
+                showUploadStatus('❌ ' + (job.error || 'Upload failed'), 'bg-danger');
+                $button.prop('disabled', false);
+            } else {
+                showUploadStatus(
+                    (job.status === 'running' ? 'Processing' : 'Queued') + ': ' + job.rows_processed +
+                    ' rows (' + job.rows_per_sec + ' rows/s)', 'bg-primary'
+                );
+                setTimeout(() => pollUploadJob(jobId, $button), 1000);
+            }
+        })
+        .catch(() => setTimeout(() => pollUploadJob(jobId, $button), 3000));
+    }
+
     $('#projectDropdown').on('change', function () {
         const selectedProject = $(this).val();
         const currentUrl = new URL(window.location.href);
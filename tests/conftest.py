@@ -0,0 +1,44 @@
+"""
+Shared fixtures. `portal` imports app.py once per session against a throwaway SQLite
+database; config.py holds deployment secrets and is not in the repository, so tests
+that need the app supply its settings here. Nothing in those tests talks to MongoDB
+or SMTP.
+"""
+import os
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TEST_CONFIG = {
+    "MYSQL_HOST": "localhost", "MYSQL_USER": "test", "MYSQL_PASSWORD": "", "MYSQL_DB": "test", "MYSQL_PORT": 3306,
+    "GOOGLE_CLIENT_ID": "", "GOOGLE_CLIENT_SECRET": "", "MONGO_URI": "mongodb://127.0.0.1:1/test",
+    "SMTP_SERVER": "localhost", "SMTP_PORT": 25, "SMTP_USERNAME": "", "SMTP_PASSWORD": "", "SMTP_MAIL": "",
+}
+
+
+@pytest.fixture(scope="session")
+def portal(tmp_path_factory):
+    """The app module, with every table created; each test cleans up what it stores."""
+    base = tmp_path_factory.mktemp("portal")
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{base / 'portal.db'}",
+        "UPLOAD_DIR": str(base / "uploads"),
+        "CACHE_DIR": str(base / "cache"),
+        "UPLOAD_JOB_EXECUTOR": "inline",
+        "UPLOAD_PARSE_WORKERS": "1",
+        "VISITOR_CHANGE_STREAMS": "0",
+        "SEARCH_INDEX": "0",
+    })
+    if "config" not in sys.modules:
+        try:
+            import config  # noqa: F401
+        except ImportError:
+            sys.modules["config"] = types.SimpleNamespace(**TEST_CONFIG)
+    import app as portal
+    with portal.app.app_context():
+        portal.db.create_all()
+    return portal
@@ -0,0 +1,50 @@
+"""PasswordHasher slot accounting and LoginRateLimiter on a shared backend."""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from auth import HasherBusy, LoginRateLimiter, PasswordHasher  # noqa: E402
+from cache import make_backend  # noqa: E402
+
+
+def test_timed_out_hash_keeps_its_slot_until_done():
+    hasher = PasswordHasher(workers=1, queue=0, timeout=0.05)
+    release = threading.Event()
+    with pytest.raises(HasherBusy, match="timed out"):
+        hasher._run(release.wait)
+    # The slow hash is still running: no new check may start beside it
+    with pytest.raises(HasherBusy, match="in progress"):
+        hasher._run(lambda: True)
+    release.set()
+    hasher._executor.shutdown(wait=True)
+    hasher._executor = None
+    assert hasher._run(lambda: True) is True
+
+
+def test_queued_check_that_times_out_frees_its_slot():
+    hasher = PasswordHasher(workers=1, queue=1, timeout=0.05)
+    release = threading.Event()
+    with pytest.raises(HasherBusy, match="timed out"):
+        hasher._run(release.wait)
+    # Waits behind the running hash, times out and is cancelled before it ever starts;
+    # a leaked slot would make the next call fail with "in progress" instead
+    for _ in range(2):
+        with pytest.raises(HasherBusy, match="timed out"):
+            hasher._run(lambda: True)
+    release.set()
+
+
+def test_limits_are_shared_between_workers(tmp_path):
+    worker_a = LoginRateLimiter(make_backend("filesystem", str(tmp_path)), max_attempts=3)
+    worker_b = LoginRateLimiter(make_backend("filesystem", str(tmp_path)), max_attempts=3)
+    worker_a.failed("ann", "10.0.0.1")
+    worker_b.failed("ann", "10.0.0.2")
+    assert worker_a.retry_after("ann", "10.0.0.3") == 0
+    worker_a.failed("Ann", "10.0.0.4")
+    assert worker_b.retry_after("ann", "10.0.0.5") > 0
+
+    worker_b.succeeded("ann", "10.0.0.5")
+    assert worker_a.retry_after("ann", "10.0.0.1") == 0
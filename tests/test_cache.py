@@ -0,0 +1,44 @@
+"""AppCache namespace invalidation across workers sharing a filesystem backend."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cache import AppCache, make_backend  # noqa: E402
+
+
+def counter():
+    calls = []
+
+    def load():
+        calls.append(1)
+        return len(calls)
+    return load
+
+
+def test_invalidation_reaches_every_worker(tmp_path):
+    worker_a = AppCache(make_backend("filesystem", str(tmp_path)))
+    worker_b = AppCache(make_backend("filesystem", str(tmp_path)))
+    load = counter()
+    assert worker_a.get_or_set("projects", "all", load) == 1
+    assert worker_b.get_or_set("projects", "all", load) == 1  # shared entry, no reload
+
+    worker_a.invalidate("projects")
+    assert worker_b.get_or_set("projects", "all", load) == 2
+
+
+def test_lru_invalidation_stays_in_its_process():
+    worker_a, worker_b = AppCache(make_backend("lru")), AppCache(make_backend("lru"))
+    load = counter()
+    worker_a.get_or_set("users", "all", load)
+    worker_b.get_or_set("users", "all", load)
+    worker_a.invalidate("users")
+    assert worker_b.get_or_set("users", "all", load) == 2
+    assert worker_a.get_or_set("users", "all", load) == 3
+
+
+def test_empty_results_are_cached(tmp_path):
+    cache = AppCache(make_backend("filesystem", str(tmp_path)))
+    calls = []
+    assert cache.get_or_set("contacts", "it", lambda: calls.append(1) or None) is None
+    assert cache.get_or_set("contacts", "it", lambda: calls.append(1) or None) is None
+    assert len(calls) == 1
@@ -0,0 +1,62 @@
+"""Keyset paging over a project table with typed columns and NULLs (in-memory SQLite)."""
+import os
+import random
+import sys
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from grid import build_page_query, fetch_page  # noqa: E402
+
+TABLE_COLS = ["id", "uploaded_by", "upload_time", "file_name", "qty", "name"]
+
+
+@pytest.fixture(scope="module")
+def session():
+    engine = create_engine("sqlite://")
+    rng = random.Random(3)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY, uploaded_by VARCHAR(100), "
+                          "upload_time VARCHAR(20), file_name VARCHAR(255), qty BIGINT, name TEXT)"))
+        conn.execute(text("INSERT INTO t VALUES (:id, 'u', '2024-01-01 00:00:00', 'f.xlsx', :qty, :name)"), [
+            {"id": i, "qty": rng.choice([None, 9, 10, 100, -5, rng.randint(-50, 50)]),
+             "name": rng.choice([None, "", "a", "b", "10", "9"])}
+            for i in range(1, 200)
+        ])
+    with Session(engine) as session:
+        yield session
+
+
+def all_pages(session, sort, desc, limit=7):
+    rows, cursor = [], None
+    while True:
+        page = fetch_page(session, "t", TABLE_COLS, "u", columns=["qty", "name"],
+                          sort=sort, desc=desc, cursor=cursor, limit=limit)
+        rows += [tuple(r) for r in page["rows"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            return rows
+
+
+@pytest.mark.parametrize("sort", ["qty", "name"])
+@pytest.mark.parametrize("desc", [True, False])
+def test_pages_follow_column_type_with_nulls_lowest(session, sort, desc):
+    stored = session.execute(text("SELECT id, qty, name FROM t")).all()
+    pos = 1 if sort == "qty" else 2
+    expected = sorted(stored, key=lambda r: (r[pos] is not None, r[pos] if r[pos] is not None else 0, r[0]),
+                      reverse=desc)
+    assert all_pages(session, sort, desc) == [(r[1], r[2]) for r in expected]
+
+
+def test_numbers_sort_numerically(session):
+    qty = [q for q, _ in all_pages(session, "qty", desc=True) if q is not None]
+    assert qty == sorted(qty, reverse=True)
+    assert qty.index(100) < qty.index(9)
+
+
+def test_sort_column_is_compared_bare(session):
+    stmt, _, _ = build_page_query("t", TABLE_COLS, "u", sort="qty", cursor=None)
+    assert "COALESCE" not in str(stmt)
+    assert "ORDER BY `qty` DESC" in str(stmt)
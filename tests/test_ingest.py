@@ -0,0 +1,97 @@
+"""ingest_upload: all schema changes first, then rows and ledger entry in one transaction."""
+import io
+
+import pytest
+from sqlalchemy import text
+
+CSV = (b"a,b\n"
+       b"1,\n2,\n"       # chunk 1: b is empty, so the chunk has no b column
+       b"3,x\n4,y\n"     # chunk 2: b appears
+       b"5,z\n6,w\n")    # chunk 3
+
+
+@pytest.fixture
+def ingest(portal, monkeypatch):
+    monkeypatch.setitem(portal.app.config, "INGEST_CHUNK_SIZE", 2)
+    with portal.app.app_context():
+        yield portal
+        portal.db.session.rollback()
+        portal.db.session.execute(text("DROP TABLE IF EXISTS `ingest_test`"))
+        portal.UploadBatch.query.filter_by(table_name="ingest_test").delete()
+        portal.db.session.commit()
+        portal.schema_cache.invalidate("ingest_test")
+
+
+def stored(portal):
+    rows = portal.db.session.execute(text("SELECT `a`, `b` FROM `ingest_test` ORDER BY `id`")).all()
+    batches = portal.UploadBatch.query.filter_by(table_name="ingest_test").all()
+    return [tuple(r) for r in rows], batches
+
+
+def test_column_added_by_a_later_chunk(ingest):
+    result = ingest.ingest_upload(io.BytesIO(CSV), "late.csv", "ingest_test", "u@x", len(CSV))
+    rows, batches = stored(ingest)
+    assert result.rows == 6
+    assert rows == [("1", None), ("2", None), ("3", "x"), ("4", "y"), ("5", "z"), ("6", "w")]
+    assert [(b.file_name, b.row_count) for b in batches] == [("late.csv", 6)]
+
+
+def test_failed_insert_after_a_new_column_leaves_no_rows(ingest, monkeypatch):
+    real_ingest_rows, calls = ingest.ingest_rows, []
+
+    def failing_ingest_rows(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 3:
+            raise RuntimeError("connection lost")
+        return real_ingest_rows(*args, **kwargs)
+
+    monkeypatch.setattr(ingest, "ingest_rows", failing_ingest_rows)
+    with pytest.raises(RuntimeError):
+        ingest.ingest_upload(io.BytesIO(CSV), "late.csv", "ingest_test", "u@x", len(CSV))
+    ingest.db.session.rollback()
+
+    rows, batches = stored(ingest)
+    assert rows == []
+    assert batches == []
+
+
+def make_job(tmp_path, files, **options):
+    """A job directory as enqueue_upload stores it: "<index>_<original name>"."""
+    import json
+    from types import SimpleNamespace
+    job_dir = tmp_path / "job"
+    job_dir.mkdir(parents=True)
+    for stored, data in files.items():
+        (job_dir / stored).write_bytes(data)
+    return SimpleNamespace(file_path=str(job_dir), file_name="upload", table_name="ingest_test",
+                           uploaded_by="u@x", project_name="ingest_test", options=json.dumps(options))
+
+
+def test_same_named_files_are_kept_apart_in_upload_order(ingest, tmp_path):
+    job = make_job(tmp_path, {"10_a.csv": b"a\n3\n", "2_a.csv": b"a\n2\n", "1_b.csv": b"a\n1\n"})
+    _, report = ingest.ingest_job_files(job)
+    rows = ingest.db.session.execute(text("SELECT `file_name`, `a` FROM `ingest_test` ORDER BY `id`")).all()
+    batches = ingest.UploadBatch.query.filter_by(table_name="ingest_test").order_by(ingest.UploadBatch.id).all()
+    assert [r["file_name"] for r in report] == ["b.csv", "a.csv", "a.csv (2)"]
+    assert [tuple(r) for r in rows] == [("b.csv", "1"), ("a.csv", "2"), ("a.csv (2)", "3")]
+    assert [(b.file_name, b.byte_size) for b in batches] == [("b.csv", 4), ("a.csv", 4), ("a.csv (2)", 4)]
+    assert len({b.content_hash for b in batches}) == 3
+
+
+@pytest.mark.parametrize("on_duplicate", ["skip", "replace"])
+def test_duplicate_checks_tell_same_named_files_apart(ingest, tmp_path, on_duplicate):
+    first = make_job(tmp_path / "first", {"000_a.csv": b"a\n1\n"})
+    ingest.ingest_job_files(first)
+    # Same name twice: the first copy repeats the earlier upload, the second is new
+    job = make_job(tmp_path / "second", {"000_a.csv": b"a\n1\n", "001_a.csv": b"a\n2\n"},
+                   on_duplicate=on_duplicate)
+    _, report = ingest.ingest_job_files(job)
+    rows = ingest.db.session.execute(text("SELECT `a` FROM `ingest_test` ORDER BY `id`")).scalars().all()
+    hashes = {b.content_hash for b in ingest.UploadBatch.query.filter_by(table_name="ingest_test")}
+    if on_duplicate == "skip":
+        assert [r.get("skipped", "")[:16] for r in report] == ["already uploaded", ""]
+        assert rows == ["1", "2"]
+    else:
+        assert [r["rows"] for r in report] == [1, 1]
+        assert rows == ["1", "2"]  # the earlier batch went, both copies came in
+    assert len(hashes) == 2
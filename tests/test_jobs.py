@@ -0,0 +1,60 @@
+"""JobQueue modes and the running-job Heartbeat."""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from jobs import Heartbeat, JobQueue  # noqa: E402
+
+
+def test_heartbeat_beats_while_the_block_runs():
+    beats = []
+    with Heartbeat(lambda: beats.append(threading.current_thread().name), 0.05):
+        time.sleep(0.3)
+    count = len(beats)
+    time.sleep(0.15)
+    assert count >= 3
+    assert len(beats) == count  # stopped on exit
+    assert set(beats) == {"job-heartbeat"}
+
+
+def test_heartbeat_interval_zero_never_beats():
+    beats = []
+    with Heartbeat(lambda: beats.append(1), 0):
+        time.sleep(0.05)
+    assert beats == []
+
+
+def test_external_mode_leaves_jobs_queued():
+    assert JobQueue("external").submit(lambda: 1) is None
+
+
+def test_inline_mode_reports_exceptions_on_the_future():
+    future = JobQueue("inline").submit(lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        future.result()
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        JobQueue("celery")
+
+
+def test_finished_job_drops_the_cached_schema(portal):
+    from sqlalchemy import text
+    with portal.app.app_context():
+        portal.ensure_project_table("jobs_test")
+        assert "extra" not in portal.schema_cache.columns(portal.db.engine, "jobs_test")
+        # What a job on a process pool does: DDL this process's cache never hears about
+        with portal.db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE `jobs_test` ADD COLUMN `extra` TEXT"))
+        assert "extra" not in portal.schema_cache.columns(portal.db.engine, "jobs_test")
+
+        portal.submit_job(lambda job_id: None, "job", "jobs_test").result()
+        assert "extra" in portal.schema_cache.columns(portal.db.engine, "jobs_test")
+        with portal.db.engine.begin() as conn:
+            conn.execute(text("DROP TABLE `jobs_test`"))
+        portal.schema_cache.invalidate("jobs_test")
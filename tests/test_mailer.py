@@ -0,0 +1,151 @@
+"""MailQueue against a local aiosmtpd server."""
+import os
+import smtplib
+import socket
+import sys
+import time
+from email.mime.text import MIMEText
+
+import pytest
+from aiosmtpd.controller import Controller
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mailer import MailQueue  # noqa: E402
+
+
+class RecordingHandler:
+    """Accepts mail, remembering which SMTP session delivered it; can reject the first n."""
+
+    def __init__(self, reject_first=0, reply="451 4.3.0 Try again later"):
+        self.reject_first = reject_first
+        self.reply = reply
+        self.delivered = []  # (session id, recipients, delivered at)
+        self.rejected = []   # delivered-at of every rejected attempt
+
+    async def handle_DATA(self, server, session, envelope):
+        if len(self.rejected) < self.reject_first:
+            self.rejected.append(time.monotonic())
+            return self.reply
+        self.delivered.append((id(session), list(envelope.rcpt_tos), time.monotonic()))
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    servers = []
+
+    def start(handler):
+        controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+        controller.start()
+        servers.append(controller)
+        return controller
+
+    yield start
+    for controller in servers:
+        controller.stop()
+
+
+def make_queue(controller, **kwargs):
+    statuses = []
+    mail_queue = MailQueue(controller.hostname, controller.port, use_tls=False, idle_timeout=0.2,
+                           on_status=lambda mail, status, error: statuses.append((mail.meta.get("n"), status, error)),
+                           **kwargs)
+    return mail_queue, statuses
+
+
+def message(n):
+    msg = MIMEText(f"Visitor {n} approved")
+    msg["From"] = "desk@example.com"
+    msg["To"] = f"host{n}@example.com"
+    msg["Subject"] = "Visitor approved"
+    return msg
+
+
+def test_batches_share_one_connection(smtp_server):
+    handler = RecordingHandler()
+    mail_queue, statuses = make_queue(smtp_server(handler), batch_size=5)
+    for n in range(12):
+        mail_queue.enqueue(message(n), f"host{n}@example.com", {"n": n})
+    assert mail_queue.flush(timeout=10)
+    mail_queue.stop()
+
+    assert len(handler.delivered) == 12
+    assert len({session for session, _, _ in handler.delivered}) == 1
+    assert sorted(n for n, status, _ in statuses if status == "sent") == list(range(12))
+
+
+def test_transient_failure_is_retried_with_backoff(smtp_server):
+    handler = RecordingHandler(reject_first=2)
+    mail_queue, statuses = make_queue(smtp_server(handler), backoff=0.2, max_attempts=5)
+    mail_queue.enqueue(message(1), "host1@example.com", {"n": 1})
+    assert mail_queue.flush(timeout=10)
+    mail_queue.stop()
+
+    assert [status for _, status, _ in statuses] == ["retrying", "retrying", "sent"]
+    assert len(handler.delivered) == 1
+    # 0.2 s before the second attempt, 0.4 s before the third
+    first, second = handler.rejected
+    assert second - first >= 0.2
+    assert handler.delivered[0][2] - second >= 0.4
+
+
+def test_permanent_failure_is_not_retried(smtp_server):
+    handler = RecordingHandler(reject_first=100, reply="550 5.1.1 No such user")
+    mail_queue, statuses = make_queue(smtp_server(handler), backoff=0.01, max_attempts=3)
+    mail_queue.enqueue(message(1), "nobody@example.com", {"n": 1})
+    mail_queue.enqueue(message(2), "nobody@example.com", {"n": 2})
+    assert mail_queue.flush(timeout=10)
+    mail_queue.stop()
+
+    assert [(n, status) for n, status, _ in statuses] == [(1, "failed"), (2, "failed")]
+    assert "No such user" in statuses[0][2]
+    assert len(handler.rejected) == 2
+    assert mail_queue.pending() == 0
+
+
+def test_transient_failure_gives_up_after_max_attempts(smtp_server):
+    handler = RecordingHandler(reject_first=100)
+    mail_queue, statuses = make_queue(smtp_server(handler), backoff=0.01, max_attempts=3)
+    mail_queue.enqueue(message(1), "host1@example.com", {"n": 1})
+    assert mail_queue.flush(timeout=10)
+    mail_queue.stop()
+
+    assert [status for _, status, _ in statuses] == ["retrying", "retrying", "failed"]
+    assert len(handler.rejected) == 3
+
+
+def test_disconnect_closes_old_connection_before_reconnecting(smtp_server, monkeypatch):
+    handler = RecordingHandler()
+    controller = smtp_server(handler)
+    connections = []
+
+    class DroppingSMTP(smtplib.SMTP):
+        """The first connection's first send fails as if the server hung up."""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            connections.append(self)
+
+        def sendmail(self, *args, **kwargs):
+            if self is connections[0] and not getattr(self, "dropped", False):
+                self.dropped = True
+                raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+            return super().sendmail(*args, **kwargs)
+
+    monkeypatch.setattr(smtplib, "SMTP", DroppingSMTP)
+    mail_queue, statuses = make_queue(controller, backoff=0.01, batch_size=5)
+    for n in range(3):
+        mail_queue.enqueue(message(n), f"host{n}@example.com", {"n": n})
+    assert mail_queue.flush(timeout=10)
+    mail_queue.stop()
+
+    assert len(connections) == 2
+    assert connections[0].sock is None
+    assert len(handler.delivered) == 3
+    assert sorted(n for n, status, _ in statuses if status == "sent") == [0, 1, 2]
@@ -0,0 +1,71 @@
+"""Column naming for uploaded sheets."""
+import io
+import os
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from readers import expand_sources, header_names, iter_row_batches, unique_names  # noqa: E402
+
+META = {"id", "uploaded_by", "upload_time", "file_name"}
+
+
+def sanitize(name):
+    return name.replace(" ", "_").replace("-", "_")
+
+
+def test_meta_names_are_suffixed():
+    assert header_names(["file_name", "Amount", "ID"], sanitize, META) == ["file_name_1", "Amount", "ID_1"]
+
+
+def test_names_that_sanitize_to_a_meta_name_are_suffixed():
+    assert header_names(["Upload Time", "upload-time"], sanitize, META) == ["Upload_Time_1", "upload_time_2"]
+
+
+def test_names_equal_after_sanitizing_stay_apart():
+    assert header_names(["a b", "a_b", "A-B"], sanitize) == ["a_b", "a_b_1", "A_B_2"]
+
+
+def test_suffixed_names_never_repeat():
+    # Names are claimed in header order, so the sheet's own "id_1" moves on
+    assert unique_names(["id", "id_1"], {"id"}) == ["id_1", "id_1_1"]
+
+
+def test_csv_batches_use_the_same_names_in_every_chunk():
+    csv = io.BytesIO(b"file_name,Name\n" + b"".join(b"f%d,n%d\n" % (i, i) for i in range(5)))
+    chunks = list(iter_row_batches(csv, "people.csv", sanitize, chunk_size=2, reserved=META))
+    assert len(chunks) == 3
+    assert {tuple(columns) for columns, _ in chunks} == {("file_name_1", "Name")}
+
+
+def make_zip(tmp_path, members):
+    path = tmp_path / "upload.zip"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    extract_dir = tmp_path / "extract"
+    extract_dir.mkdir()
+    return str(path), str(extract_dir)
+
+
+def test_zip_spreadsheets_are_extracted(tmp_path):
+    path, extract_dir = make_zip(tmp_path, {"a.csv": "x\n1\n", "notes.txt": "skip", "sub/b.csv": "y\n2\n"})
+    sources = expand_sources(path, "upload.zip", extract_dir)
+    assert [name for _, name in sources] == ["upload.zip/a.csv", "upload.zip/sub/b.csv"]
+    assert open(sources[1][0]).read() == "y\n2\n"
+
+
+def test_zip_with_too_many_members_is_refused(tmp_path):
+    path, extract_dir = make_zip(tmp_path, {f"{i}.csv": "x\n1\n" for i in range(4)})
+    with pytest.raises(ValueError, match="4 entries"):
+        expand_sources(path, "upload.zip", extract_dir, max_members=3)
+
+
+def test_zip_bomb_is_refused_before_it_fills_the_disk(tmp_path):
+    # 5 MB of zeros compress to a few KB
+    path, extract_dir = make_zip(tmp_path, {"a.csv": "x\n1\n", "bomb.csv": "0" * 5 * 1024 * 1024})
+    with pytest.raises(ValueError, match="expands to more than 1 MB"):
+        expand_sources(path, "upload.zip", extract_dir, max_bytes=1024 * 1024)
+    assert sum(os.path.getsize(os.path.join(extract_dir, f)) for f in os.listdir(extract_dir)) < 1024 * 1024
@@ -0,0 +1,168 @@
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+
+# --- Settings ---
+DEFAULT_VISITOR_PAGE = 50
+MAX_VISITOR_PAGE = 500
+
+# Fields the list page and list API actually show
+LIST_PROJECTION = {
+    "name": 1, "company": 1, "phone": 1, "email": 1, "location": 1,
+    "idType": 1, "idNumber": 1, "purpose": 1, "otherPurpose": 1,
+    "items": 1, "otherItems": 1, "contact_person": 1, "notes": 1,
+    "check_in": 1, "check_out": 1, "badge_number": 1, "remarks": 1,
+    "verified": 1, "approved": 1,
+}
+
+STATUS_FILTERS = {
+    "pending": {"approved": None},
+    "approved": {"approved": True, "check_in": None},
+    "declined": {"approved": False},
+    "checked-in": {"check_in": {"$ne": None}, "check_out": None},
+    "checked-out": {"check_out": {"$ne": None}},
+}
+
+# Compound indexes behind the filters above, each ending in the sort key
+VISITOR_INDEXES = [
+    [("approved", ASCENDING), ("_id", DESCENDING)],
+    [("check_out", ASCENDING), ("check_in", ASCENDING), ("_id", DESCENDING)],
+    [("contact_person", ASCENDING), ("_id", DESCENDING)],
+    [("check_in", DESCENDING), ("_id", DESCENDING)],
+]
+
+
+def ensure_visitor_indexes(collection):
+    """create_index is idempotent, so this is safe to run on every startup."""
+    for keys in VISITOR_INDEXES:
+        collection.create_index(keys)
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
+def encode_visitor_cursor(doc, sort):
+    if sort == "check_in":
+        check_in = doc.get("check_in")
+        return f"{check_in.isoformat() if check_in else ''}|{doc['_id']}"
+    return str(doc["_id"])
+
+
+def build_visitor_query(args):
+    """
+    Turn request args into (filter, sort_spec, sort_name).
+    Supported: status, from/to (YYYY-MM-DD, on registration time or date_field=check_in),
+    contact_person, sort=registered|check_in, cursor.
+    """
+    clauses = []
+
+    status = args.get("status")
+    if status:
+        if status not in STATUS_FILTERS:
+            raise ValueError(f"Unknown status '{status}'")
+        clauses.append(STATUS_FILTERS[status])
+
+    if args.get("contact_person"):
+        clauses.append({"contact_person": args.get("contact_person")})
+
+    date_from, date_to = args.get("from"), args.get("to")
+    if date_from or date_to:
+        # Registration time is embedded in the ObjectId, so _id ranges need no extra field
+        by_check_in = args.get("date_field") == "check_in"
+        field = "check_in" if by_check_in else "_id"
+        bounds = {}
+        if date_from:
+            start = _parse_date(date_from)
+            bounds["$gte"] = start if by_check_in else ObjectId.from_datetime(start)
+        if date_to:
+            end = _parse_date(date_to) + timedelta(days=1)
+            bounds["$lt"] = end if by_check_in else ObjectId.from_datetime(end)
+        clauses.append({field: bounds})
+
+    sort = args.get("sort", "registered")
+    if sort not in ("registered", "check_in"):
+        raise ValueError(f"Unknown sort '{sort}'")
+
+    cursor = args.get("cursor")
+    if cursor:
+        try:
+            if sort == "check_in":
+                check_in, last_id = cursor.split("|", 1)
+                last_id = ObjectId(last_id)
+                check_in = datetime.fromisoformat(check_in) if check_in else None
+                # Missing check-ins sort last in descending order, after every dated one
+                clauses.append({"$or": [
+                    {"check_in": {"$lt": check_in}},
+                    {"check_in": check_in, "_id": {"$lt": last_id}},
+                    {"check_in": None},
+                ]} if check_in else {"check_in": None, "_id": {"$lt": last_id}})
+            else:
+                clauses.append({"_id": {"$lt": ObjectId(cursor)}})
+        except Exception:
+            raise ValueError("Invalid cursor")
+
+    if sort == "check_in":
+        sort_spec = [("check_in", DESCENDING), ("_id", DESCENDING)]
+    else:
+        sort_spec = [("_id", DESCENDING)]
+
+    query = {"$and": clauses} if len(clauses) > 1 else (clauses[0] if clauses else {})
+    return query, sort_spec, sort
+
+
+def fetch_visitor_page(collection, args, limit=DEFAULT_VISITOR_PAGE, projection=LIST_PROJECTION):
+    """One page of visitors plus the cursor for the next one (None on the last page)."""
+    query, sort_spec, sort = build_visitor_query(args)
+    limit = min(max(int(limit), 1), MAX_VISITOR_PAGE)
+    docs = list(collection.find(query, projection).sort(sort_spec).limit(limit + 1))
+    next_cursor = encode_visitor_cursor(docs[limit - 1], sort) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+
+# --- Bulk desk actions ---
+MAX_BULK_VISITORS = 500
+# action -> visitor_delta type published for each updated visitor
+BULK_ACTIONS = {"checkin": "checked_in", "checkout": "checked_out", "approve": "approved", "decline": "declined"}
+# The state a visitor must be in for each action; part of every UpdateOne filter, so a
+# concurrent request that already moved the visitor on turns the update into a no-op
+BULK_PRECONDITIONS = {
+    "checkin": ({"check_in": None}, "Visitor already checked in"),
+    "checkout": ({"check_in": {"$ne": None}, "check_out": None}, "Visitor is not checked in or already checked out"),
+    "approve": ({"approved": {"$ne": True}}, "Visitor already approved"),
+    "decline": ({"approved": {"$ne": False}}, "Visitor already declined"),
+}
+# The timestamp each action writes; re-reading it tells which updates matched
+BULK_STAMPS = {"checkin": "check_in", "checkout": "check_out", "approve": "approved_at", "decline": "approved_at"}
+
+
+def parse_bulk_items(payload):
+    """
+    Validate a bulk request body, {"visitors": [{"id", "badge" | "remarks"}, ...]}.
+    Plain id strings are accepted for approve/decline. Raises ValueError for the whole request.
+    """
+    items = payload.get("visitors") if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValueError('Expected a JSON body {"visitors": [...]}')
+    if len(items) > MAX_BULK_VISITORS:
+        raise ValueError(f"At most {MAX_BULK_VISITORS} visitors per request")
+    items = [{"id": item} if isinstance(item, str) else item for item in items]
+    if not all(isinstance(item, dict) and item.get("id") for item in items):
+        raise ValueError("Every visitor needs an id")
+    return items
+
+
+def bulk_fields(action, item, now):
+    """The $set for one bulk item, as the single-visitor routes write it; ValueError if invalid."""
+    if action == "checkin":
+        if not item.get("badge"):
+            raise ValueError("Badge number required")
+        return {"check_in": now, "badge_number": item["badge"], "verified": True}
+    if action == "checkout":
+        return {"check_out": now, "remarks": item.get("remarks", "")}
+    return {"approved": action == "approve", "approved_at": now}
@@ -0,0 +1,16 @@
+"""
+Production entry point:
+
+    APP_ENV=production gunicorn -c gunicorn.conf.py wsgi:application
+
+app.py is a module-level application, not a factory: APP_ENV is read once, while it
+is imported (engine pools and template reloading are set up then). Importing it
+through this module defaults APP_ENV to production; an APP_ENV already set wins.
+"""
+import os
+
+os.environ.setdefault("APP_ENV", "production")
+
+from app import app  # noqa: E402
+
+application = app